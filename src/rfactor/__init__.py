@@ -2,12 +2,15 @@ import sys
 
 from rfactor.rfactor import (
     compute_erosivity,
+    compute_erosivity_methods,
     maximum_intensity,
+    maximum_intensity_batched,
     maximum_intensity_interpolate,
     maximum_intensity_matlab_clone,
     rain_energy_brown_and_foster1987,
     rain_energy_mcgregor1995,
     rain_energy_verstraeten2006,
+    segment_energy_method,
 )
 
 if sys.version_info[:2] >= (3, 8):
@@ -29,10 +32,13 @@ finally:
 
 __all__ = [
     "compute_erosivity",
+    "compute_erosivity_methods",
     "maximum_intensity_matlab_clone",
     "maximum_intensity_interpolate",
     "maximum_intensity",
+    "maximum_intensity_batched",
     "rain_energy_brown_and_foster1987",
     "rain_energy_verstraeten2006",
     "rain_energy_mcgregor1995",
+    "segment_energy_method",
 ]
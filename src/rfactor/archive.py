@@ -0,0 +1,338 @@
+import gzip
+import tarfile
+import zipfile
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from pathlib import PurePosixPath
+
+try:
+    import zstandard
+
+    ZSTANDARD_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    ZSTANDARD_AVAILABLE = False
+
+# suffixes of compressed rain files, decompressed while reading
+COMPRESSION_SUFFIXES = (".gz", ".zst")
+# suffixes of archives (bundles) of rain files
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# streams of the files read by iter_rain_files, returned by open_rain_file
+_OPEN_STREAMS = {}
+
+
+def strip_compression_suffix(file_path):
+    """File name without the compression suffix, e.g. ``KMI_6414_2004.txt`` for
+    ``KMI_6414_2004.txt.gz``
+
+    Parameters
+    ----------
+    file_path : pathlib.PurePath
+        Path of a (compressed) rain file.
+
+    Returns
+    -------
+    file_name : str
+    """
+    name = file_path.name
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def _is_archive(file_path):
+    """File is an archive of rain files"""
+    return file_path.name.endswith(ARCHIVE_SUFFIXES)
+
+
+def split_archive_path(file_path):
+    """Split the path of an archive member into the archive and member name
+
+    Members of an archive are addressed as if the archive is a folder, e.g.
+    ``Path("network.zip") / "KMI_6414_2004.txt"``.
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a rain file or of a rain file in an archive.
+
+    Returns
+    -------
+    archive : pathlib.Path or None
+        Path of the archive, None when the file is not part of an archive.
+    member : str or None
+        Name of the file in the archive, None when the file is not part of an
+        archive.
+    """
+    for archive in file_path.parents:
+        if _is_archive(archive) and archive.is_file():
+            member = PurePosixPath(*file_path.relative_to(archive).parts)
+            return archive, str(member)
+    return None, None
+
+
+def archive_members(archive):
+    """Size of each file in a zip or tar archive
+
+    The members of an archive are read once for each version (modification time
+    and size) of the archive, later calls use the same index.
+
+    Parameters
+    ----------
+    archive : pathlib.Path
+        Path of a zip or tar archive.
+
+    Returns
+    -------
+    members : dict
+        Uncompressed size (bytes) of each file, by its (normalized) name in the
+        archive.
+    """
+    stat = archive.stat()
+    return _read_archive_members(str(archive), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=128)
+def _read_archive_members(archive, mtime_ns, size):
+    """Size of each file in an archive, cached on the archive version"""
+    if archive.endswith(".zip"):
+        with zipfile.ZipFile(archive) as bundle:
+            return {
+                str(PurePosixPath(info.filename)): info.file_size
+                for info in bundle.infolist()
+                if not info.is_dir()
+            }
+    with tarfile.open(archive) as bundle:
+        return {
+            str(PurePosixPath(info.name)): info.size
+            for info in bundle.getmembers()
+            if info.isfile()
+        }
+
+
+def _decompress(stream, file_name):
+    """Decompress a binary stream according to the file name suffix"""
+    if file_name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=stream)
+    if file_name.endswith(".zst"):
+        if not ZSTANDARD_AVAILABLE:
+            raise ImportError(
+                "Reading '.zst' files requires zstandard, install with "
+                "'rfactor[zstd]'."
+            )
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    return stream
+
+
+@contextmanager
+def open_rain_file(file_path):
+    """Open a (compressed or archived) rain file as binary stream
+
+    Compressed files (``.gz``, ``.zst``) are decompressed while reading. Files in
+    a zip or tar archive are addressed as if the archive is a folder, see
+    :func:`rfactor.archive.split_archive_path`, and read without extracting the
+    archive. Reading a member of a compressed tar archive (``.tar.gz``)
+    decompresses the archive up to the member, so zip or uncompressed tar
+    archives are faster for archives with many files.
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a rain file or of a rain file in an archive.
+
+    Yields
+    ------
+    stream : io.BufferedIOBase
+        Binary stream of the (decompressed) file content. The stream of a file
+        read by :func:`rfactor.archive.iter_rain_files` is the stream of the
+        iterator.
+    """
+    if file_path in _OPEN_STREAMS:
+        yield _OPEN_STREAMS[file_path]
+        return
+    with ExitStack() as stack:
+        archive, member = split_archive_path(file_path)
+        if archive is None:
+            stream = stack.enter_context(open(file_path, "rb"))
+        elif archive.name.endswith(".zip"):
+            bundle = stack.enter_context(zipfile.ZipFile(archive))
+            stream = stack.enter_context(bundle.open(member))
+        else:
+            bundle = stack.enter_context(tarfile.open(archive))
+            stream = stack.enter_context(bundle.extractfile(member))
+        stream = _decompress(stream, file_path.name)
+        yield stack.enter_context(stream)
+
+
+def _is_tar_member(file_path):
+    """Archive of a rain file in a tar archive, None for other files"""
+    archive, _ = split_archive_path(file_path)
+    if archive is None or archive.name.endswith(".zip"):
+        return None
+    return archive
+
+
+def group_by_archive(files):
+    """Group the rain files of each tar archive
+
+    Parameters
+    ----------
+    files : list of pathlib.Path
+        Paths of rain files or of rain files in an archive.
+
+    Returns
+    -------
+    groups : list of list of int
+        Position of the files in ``files`` for each tar archive, other files are
+        a group on their own.
+    """
+    groups = []
+    archives = {}
+    for idx, file_path in enumerate(files):
+        archive = _is_tar_member(file_path)
+        if archive is None:
+            groups.append([idx])
+        elif archive in archives:
+            archives[archive].append(idx)
+        else:
+            archives[archive] = [idx]
+            groups.append(archives[archive])
+    return groups
+
+
+def iter_rain_files(files):
+    """Open rain files one after the other, reading each tar archive once
+
+    Reading a member of a (compressed) tar archive with
+    :func:`rfactor.archive.open_rain_file` searches the archive from the start, so
+    the members of a tar archive are read in a single sequential pass instead.
+    While a file is yielded, :func:`rfactor.archive.open_rain_file` returns the
+    same stream, so load functions can be applied on the file path.
+
+    Parameters
+    ----------
+    files : list of pathlib.Path
+        Paths of rain files or of rain files in an archive.
+
+    Yields
+    ------
+    file_path : pathlib.Path
+        Path of the rain file, the members of a tar archive in the order of the
+        archive.
+    stream : io.BufferedIOBase
+        Binary stream of the (decompressed) file content.
+    """
+    for group in group_by_archive(files):
+        group = [files[idx] for idx in group]
+        archive = _is_tar_member(group[0])
+        if archive is None:
+            with open_rain_file(group[0]) as stream:
+                yield from _yield_open(group[0], stream)
+            continue
+
+        members = {split_archive_path(file_path)[1]: file_path for file_path in group}
+        with tarfile.open(archive) as bundle:
+            for info in bundle:
+                file_path = members.pop(str(PurePosixPath(info.name)), None)
+                if file_path is None or not info.isfile():
+                    continue
+                with _decompress(bundle.extractfile(info), info.name) as stream:
+                    yield from _yield_open(file_path, stream)
+                if not members:
+                    break
+        if members:
+            raise KeyError(f"Files {list(members)} not found in archive '{archive}'.")
+
+
+def _yield_open(file_path, stream):
+    """Yield an open stream, returned by open_rain_file while yielded"""
+    _OPEN_STREAMS[file_path] = stream
+    try:
+        yield file_path, stream
+    finally:
+        del _OPEN_STREAMS[file_path]
+
+
+def is_compressed(file_path):
+    """Rain file is compressed or part of an archive, i.e. can not be read (or
+    memory mapped) as a plain file
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a rain file or of a rain file in an archive.
+
+    Returns
+    -------
+    compressed : bool
+    """
+    return (
+        file_path.name.endswith(COMPRESSION_SUFFIXES)
+        or split_archive_path(file_path)[0] is not None
+    )
+
+
+def rain_file_stat(file_path):
+    """Size and modification time of a (compressed or archived) rain file
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a rain file or of a rain file in an archive.
+
+    Returns
+    -------
+    size : int
+        Size of the file in bytes, the uncompressed size for archive members.
+    mtime_ns : int
+        Modification time of the file or of the archive (nanoseconds).
+
+    Notes
+    -----
+    The size of archive members is taken from the index of the archive, see
+    :func:`rfactor.archive.archive_members`.
+    """
+    archive, member = split_archive_path(file_path)
+    if archive is None:
+        stat = file_path.stat()
+        return stat.st_size, stat.st_mtime_ns
+    return archive_members(archive)[member], archive.stat().st_mtime_ns
+
+
+def _is_rain_file(name, pattern):
+    """File name matches the pattern after removing the compression suffix"""
+    return PurePosixPath(strip_compression_suffix(PurePosixPath(name))).match(pattern)
+
+
+def find_rain_files(folder_path, pattern="*.txt"):
+    """Rain files of a folder, including compressed files and archive members
+
+    Parameters
+    ----------
+    folder_path : pathlib.Path
+        Folder with rain files.
+    pattern : str, default "*.txt"
+        Pattern of the file names (without compression suffix).
+
+    Returns
+    -------
+    files : list of pathlib.Path
+        Sorted paths of the rain files, archive members are addressed as files
+        in a folder with the name of the archive, see
+        :func:`rfactor.archive.split_archive_path`.
+    """
+    files = []
+    for file_path in folder_path.iterdir():
+        if not file_path.is_file():
+            continue
+        if _is_archive(file_path):
+            members = archive_members(file_path)
+            files += [
+                file_path.joinpath(*PurePosixPath(member).parts)
+                for member in members
+                if _is_rain_file(member, pattern)
+            ]
+        elif _is_rain_file(file_path.name, pattern):
+            files.append(file_path)
+    return sorted(files)
@@ -0,0 +1,420 @@
+import hashlib
+import json
+import os
+import time
+from functools import partial
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from rfactor.archive import (
+    ARCHIVE_SUFFIXES,
+    iter_rain_files,
+    open_rain_file,
+    rain_file_stat,
+)
+
+try:
+    import pyarrow  # noqa: F401
+
+    PYARROW_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    PYARROW_AVAILABLE = False
+
+# version of the cache layout, a new version invalidates existing cache entries
+CACHE_VERSION = 1
+MANIFEST = "manifest.json"
+FILE_FORMATS = {
+    "parquet": (".parquet", pd.read_parquet, "to_parquet"),
+    "feather": (".feather", pd.read_feather, "to_feather"),
+}
+
+
+def loader_key(load_fun, kwargs=None):
+    """Identifier of a load function and its keyword arguments
+
+    Parameters
+    ----------
+    load_fun : Callable
+        Load function, see :func:`rfactor.rain.load_rain_file`.
+    kwargs : dict, default None
+        Keyword arguments for ``load_fun``.
+
+    Returns
+    -------
+    key : str
+        Qualified name of the function with the (sorted) keyword arguments.
+    """
+    name = f"{load_fun.__module__}.{getattr(load_fun, '__qualname__', load_fun)}"
+    return f"{name}({json.dumps(kwargs or {}, sort_keys=True, default=repr)})"
+
+
+def _in_folder(file_path, folder_path):
+    """Rain file is in the folder or in an archive in the folder
+
+    The archive is identified by its name, as the archive of a removed file may
+    not exist anymore.
+    """
+    if file_path.parent == folder_path:
+        return True
+    if folder_path not in file_path.parents:
+        return False
+    child = file_path.relative_to(folder_path).parts[0]
+    return child.endswith(ARCHIVE_SUFFIXES)
+
+
+def file_hash(file_path):
+    """SHA-256 hash of the (decompressed) content of a rain file
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        Path of a rain file or of a rain file in an archive.
+
+    Returns
+    -------
+    sha256 : str
+    """
+    with open_rain_file(Path(file_path)) as stream:
+        return _stream_hash(stream)
+
+
+def _stream_hash(stream):
+    """SHA-256 hash of the content of a binary stream"""
+    digest = hashlib.sha256()
+    for block in iter(partial(stream.read, 2**20), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+class RainCache:
+    """On-disk cache of parsed rain files in a columnar format
+
+    The parsed and validated output of the load function of each rain file is
+    stored as Parquet (or Feather) files, partitioned in a folder per station and
+    year (``CACHE_DIR/STATION/YEAR/``). The cache entry of a rain file is keyed on
+    the file path, size, modification time and the load function with its
+    arguments, so a changed file or other loader arguments are parsed again. A
+    manifest (``manifest.json``) in the cache folder keeps track of the entries,
+    their size, last access and the size and modification time of the rain files.
+    The content hash of the rain files is only added when comparing the cache with
+    a folder, see :meth:`rfactor.cache.RainCache.changes`.
+
+    When the cache exceeds ``max_size`` bytes, the least recently used entries are
+    removed when saving the manifest, see :meth:`rfactor.cache.RainCache.save`.
+    The cache is not designed for concurrent writes of multiple processes.
+
+    Requires ``pyarrow``, install with ``rfactor[cache]``.
+
+    Parameters
+    ----------
+    cache_dir : pathlib.Path
+        Folder of the cache, created if it does not exist.
+    max_size : int, default None
+        Maximal size of the cached files in bytes, no limit if None.
+    file_format : {"parquet", "feather"}, default "parquet"
+        File format of the cached rain data.
+
+    Examples
+    --------
+    ::
+
+        cache = RainCache(Path("/PATH/TO/CACHE"), max_size=2 * 1024**3)
+        rain = load_rain_folder(folder, load_rain_file_matlab_legacy, cache=cache)
+
+        # parse the files of the folder again on the next call
+        cache.invalidate(folder)
+    """
+
+    def __init__(self, cache_dir, max_size=None, file_format="parquet"):
+        if not PYARROW_AVAILABLE:
+            raise ImportError(
+                "The rain cache requires pyarrow, install with 'rfactor[cache]'."
+            )
+        if file_format not in FILE_FORMATS:
+            raise ValueError(
+                f"File format '{file_format}' not supported, use one of "
+                f"{list(FILE_FORMATS)}."
+            )
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.file_format = file_format
+        self._entries = self._read_manifest()
+
+    @property
+    def size(self):
+        """Total size of the cached files in bytes"""
+        return sum(entry["nbytes"] for entry in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, file_path, load_fun, kwargs=None):
+        """Cache key of a rain file
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            Rain file.
+        load_fun : Callable
+            Load function, see :func:`rfactor.rain.load_rain_file`.
+        kwargs : dict, default None
+            Keyword arguments for ``load_fun``.
+
+        Returns
+        -------
+        key : str
+            Hash of the file path, size, modification time, load function and
+            arguments.
+        """
+        size, mtime_ns = rain_file_stat(Path(file_path))
+        return self._key(file_path, size, mtime_ns, load_fun, kwargs)
+
+    def _key(self, file_path, size, mtime_ns, load_fun, kwargs=None):
+        """Cache key of a rain file with the given size and modification time"""
+        identifier = [
+            CACHE_VERSION,
+            self.file_format,
+            str(Path(file_path).resolve()),
+            size,
+            mtime_ns,
+            loader_key(load_fun, kwargs),
+        ]
+        return hashlib.sha256(json.dumps(identifier).encode()).hexdigest()
+
+    def get(self, file_path, key):
+        """Cached rain data of a file
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            Rain file.
+        key : str
+            Cache key, see :meth:`rfactor.cache.RainCache.key`.
+
+        Returns
+        -------
+        rain : pandas.DataFrame or None
+            Output of the load function of the file, None when the file is not
+            cached with the given key.
+        """
+        entry = self._entries.get(str(Path(file_path).resolve()))
+        if entry is None or entry["key"] != key:
+            return None
+        _, read_fun, _ = FILE_FORMATS[self.file_format]
+        try:
+            parts = [read_fun(self.cache_dir / part) for part in entry["parts"]]
+        except FileNotFoundError:
+            self.invalidate(file_path)
+            return None
+        entry["last_access"] = time.time()
+        return pd.concat(parts, ignore_index=True)
+
+    def put(self, file_path, key, rain):
+        """Add the rain data of a file to the cache
+
+        The records are written per station and year, replacing the previous
+        cache entry of the file.
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            Rain file.
+        key : str
+            Cache key, see :meth:`rfactor.cache.RainCache.key`.
+        rain : pandas.DataFrame
+            Output of the load function of the file.
+        """
+        path = str(Path(file_path).resolve())
+        if path in self._entries:
+            self._remove(self._entries.pop(path))
+
+        extension, _, write_method = FILE_FORMATS[self.file_format]
+        groups = rain.groupby(
+            [rain["station"], rain["datetime"].dt.year], sort=False, dropna=False
+        )
+        if len(rain) == 0:
+            groups = [(("", ""), rain)]
+        parts = []
+        for (station, year), records in groups:
+            part = Path(quote(str(station), safe="")) / str(year) / f"{key}{extension}"
+            (self.cache_dir / part.parent).mkdir(parents=True, exist_ok=True)
+            getattr(records.reset_index(drop=True), write_method)(self.cache_dir / part)
+            parts.append(part.as_posix())
+        size, mtime_ns = rain_file_stat(Path(file_path))
+        self._entries[path] = {
+            "key": key,
+            "parts": parts,
+            "nbytes": sum((self.cache_dir / part).stat().st_size for part in parts),
+            "last_access": time.time(),
+            "size": size,
+            "mtime_ns": mtime_ns,
+        }
+
+    def add_file_hashes(self, files):
+        """Add the content hash of cached rain files to their cache entry
+
+        Parameters
+        ----------
+        files : list of pathlib.Path
+            Cached rain files, files without cache entry are ignored.
+        """
+        entries = {
+            file_path: self._entries.get(str(Path(file_path).resolve()))
+            for file_path in files
+        }
+        files = [
+            file_path
+            for file_path, entry in entries.items()
+            if entry is not None and "sha256" not in entry
+        ]
+        for file_path, sha256 in self._file_hashes(files).items():
+            self._entries[str(Path(file_path).resolve())]["sha256"] = sha256
+
+    @staticmethod
+    def _file_hashes(files):
+        """Content hash of rain files, reading each tar archive once"""
+        return {
+            file_path: _stream_hash(stream)
+            for file_path, stream in iter_rain_files(files)
+        }
+
+    def changes(self, folder_path, files, load_fun, kwargs=None):
+        """Rain files of a folder added, updated or removed since they were cached
+
+        A file is updated when its cache entry has another key, see
+        :meth:`rfactor.cache.RainCache.key`. Files with another modification time
+        but the same size and content hash (e.g. copied or restored files) keep
+        their cache entry. The content hash of unchanged files is added to their
+        cache entry when missing, see
+        :meth:`rfactor.cache.RainCache.add_file_hashes`. The cache entries of
+        removed files are removed, i.e. cached files in the folder or in an
+        archive in the folder which are not in ``files``. Files in subfolders are
+        not part of the folder, see :func:`rfactor.archive.find_rain_files`.
+
+        Parameters
+        ----------
+        folder_path : pathlib.Path
+            Folder with rain files.
+        files : list of pathlib.Path
+            Current rain files of the folder, see
+            :func:`rfactor.archive.find_rain_files`.
+        load_fun : Callable
+            Load function, see :func:`rfactor.rain.load_rain_file`.
+        kwargs : dict, default None
+            Keyword arguments for ``load_fun``.
+
+        Returns
+        -------
+        changes : dict of list of pathlib.Path
+            The *added*, *updated* and *removed* files.
+        """
+        changes = {"added": [], "updated": [], "removed": []}
+        cached, candidates, updated = [], {}, set()
+        for file_path in files:
+            entry = self._entries.get(str(Path(file_path).resolve()))
+            key = self.key(file_path, load_fun, kwargs)
+            if entry is None:
+                changes["added"].append(file_path)
+            elif entry["key"] == key:
+                cached.append(file_path)
+            elif self._same_loader_and_size(file_path, entry, load_fun, kwargs):
+                candidates[file_path] = key
+            else:
+                updated.add(file_path)
+
+        # files with another modification time, compare the content hash
+        for file_path, sha256 in self._file_hashes(list(candidates)).items():
+            entry = self._entries[str(Path(file_path).resolve())]
+            if sha256 == entry["sha256"]:
+                entry["key"] = candidates[file_path]
+                entry["mtime_ns"] = rain_file_stat(Path(file_path))[1]
+            else:
+                updated.add(file_path)
+        changes["updated"] = [file_path for file_path in files if file_path in updated]
+        self.add_file_hashes(cached)
+
+        folder_path = Path(folder_path).resolve()
+        current = {str(Path(file_path).resolve()) for file_path in files}
+        for path in list(self._entries):
+            if _in_folder(Path(path), folder_path) and path not in current:
+                changes["removed"].append(Path(path))
+                self._remove(self._entries.pop(path))
+        self.save()
+        return changes
+
+    def _same_loader_and_size(self, file_path, entry, load_fun, kwargs=None):
+        """Cache entry with a content hash, the same load function and file size"""
+        if "sha256" not in entry:
+            return False
+        size, _ = rain_file_stat(Path(file_path))
+        return size == entry["size"] and entry["key"] == self._key(
+            file_path, size, entry["mtime_ns"], load_fun, kwargs
+        )
+
+    def invalidate(self, path=None):
+        """Remove the cache entries of a file or of all files in a folder
+
+        Parameters
+        ----------
+        path : pathlib.Path, default None
+            Rain file or folder, all cache entries are removed if None.
+        """
+        if path is not None:
+            path = Path(path).resolve()
+        for file_path in list(self._entries):
+            if (
+                path is None
+                or path == Path(file_path)
+                or path in Path(file_path).parents
+            ):
+                self._remove(self._entries.pop(file_path))
+        self.save()
+
+    def save(self):
+        """Remove the least recently used entries above ``max_size`` and write
+        the manifest"""
+        if self.max_size is not None:
+            size = self.size
+            for file_path, entry in sorted(
+                self._entries.items(), key=lambda item: item[1]["last_access"]
+            ):
+                if size <= self.max_size:
+                    break
+                size -= entry["nbytes"]
+                self._remove(self._entries.pop(file_path))
+
+        manifest = self.cache_dir / MANIFEST
+        temporary = manifest.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps({"version": CACHE_VERSION, "files": self._entries}, indent=1)
+        )
+        os.replace(temporary, manifest)
+
+    def _read_manifest(self):
+        """Cache entries of the manifest, no entries for another cache version"""
+        manifest = self.cache_dir / MANIFEST
+        if not manifest.exists():
+            return {}
+        try:
+            content = json.loads(manifest.read_text())
+        except json.JSONDecodeError:
+            return {}
+        if content.get("version") != CACHE_VERSION:
+            return {}
+        return content["files"]
+
+    def _remove(self, entry):
+        """Remove the cached files of an entry"""
+        for part in entry["parts"]:
+            part = self.cache_dir / part
+            part.unlink(missing_ok=True)
+            for folder in (part.parent, part.parent.parent):
+                if (
+                    self.cache_dir in folder.parents
+                    and folder.exists()
+                    and not any(folder.iterdir())
+                ):
+                    folder.rmdir()
@@ -0,0 +1,235 @@
+import heapq
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from joblib import Parallel, cpu_count, delayed
+from tqdm import tqdm
+
+# minimal total cost (e.g. number of rain records) to distribute work over processes
+MIN_PARALLEL_COST = 100_000
+# number of batches per job to balance the load between the jobs
+BATCHES_PER_JOB = 4
+
+
+def effective_n_jobs(n_jobs=None):
+    """Number of jobs to run in parallel
+
+    The number of available CPUs takes into account the CPU affinity of the process
+    and the CPU quota of the container (cgroups), see :func:`joblib.cpu_count`.
+
+    Parameters
+    ----------
+    n_jobs : int, default None
+        Requested number of jobs. If None, all available CPUs but one are used.
+        Negative values are relative to the available CPUs as in joblib, i.e. -1
+        uses all available CPUs, -2 all but one,...
+
+    Returns
+    -------
+    n_jobs : int
+        Number of jobs, at least 1.
+    """
+    if n_jobs == 0:
+        raise ValueError("'n_jobs' == 0 has no meaning, use a positive number.")
+    if n_jobs is None:
+        n_jobs = cpu_count() - 1
+    elif n_jobs < 0:
+        n_jobs = cpu_count() + 1 + n_jobs
+    return int(max(n_jobs, 1))
+
+
+def balanced_batches(costs, n_batches):
+    """Pack tasks into batches of similar total cost
+
+    Tasks are assigned from the most to the least costly task, each time to the
+    batch with the lowest total cost (longest processing time first).
+
+    Parameters
+    ----------
+    costs : list of float
+        Cost (e.g. number of records) of each task.
+    n_batches : int
+        Maximal number of batches.
+
+    Returns
+    -------
+    batches : list of list of int
+        Task indices of each batch, ordered from the most to the least costly
+        batch.
+    """
+    n_batches = max(min(n_batches, len(costs)), 1)
+    heap = [(0.0, idx, []) for idx in range(n_batches)]
+    for task in np.argsort(-np.asarray(costs, dtype=float), kind="stable"):
+        load, idx, batch = heapq.heappop(heap)
+        batch.append(int(task))
+        heapq.heappush(heap, (load + costs[task], idx, batch))
+    batches = sorted(heap, key=lambda item: (-item[0], item[1]))
+    return [batch for _, _, batch in batches if batch]
+
+
+@contextmanager
+def shared_arrays(arrays, backend="loky"):
+    """Make arrays available to the workers without copying them for each task
+
+    For process based backends, each array is written once to a memory mapped file
+    in a temporary folder (``JOBLIB_TEMP_FOLDER`` if defined), unless the array is
+    memory mapped already. Joblib sends memory mapped arrays to the workers as a
+    reference to the file, so the workers read the data from the (shared) page
+    cache instead of receiving a pickled copy.
+    Threads share the memory of the parent process, so the arrays are used as such
+    for the "threading" backend.
+
+    Parameters
+    ----------
+    arrays : tuple of numpy.ndarray
+        Arrays to share with the workers.
+    backend : str, default "loky"
+        Joblib backend.
+
+    Yields
+    ------
+    arrays : tuple of numpy.ndarray
+        Read-only memory mapped arrays, or the input arrays for the "threading"
+        backend.
+    """
+    if backend == "threading" or len(arrays) == 0:
+        yield tuple(arrays)
+        return
+
+    with tempfile.TemporaryDirectory(
+        prefix="rfactor_",
+        dir=os.environ.get("JOBLIB_TEMP_FOLDER"),
+        ignore_cleanup_errors=True,
+    ) as folder:
+        mapped = []
+        for idx, array in enumerate(arrays):
+            if isinstance(array, np.memmap):
+                # already memory mapped, e.g. a rain store
+                mapped.append(array)
+                continue
+            file_path = Path(folder) / f"array_{idx}.npy"
+            np.save(file_path, np.ascontiguousarray(array))
+            mapped.append(np.load(file_path, mmap_mode="r"))
+        try:
+            yield tuple(mapped)
+        finally:
+            del mapped
+
+
+def _run_batch(func, tasks, shared=()):
+    """Apply function on each task of a batch"""
+    return [func(*shared, *task) for task in tasks]
+
+
+def _run_indexed_batch(func, indices, tasks, shared=()):
+    """Apply function on each task of a batch, returning the task indices as well"""
+    return indices, _run_batch(func, tasks, shared)
+
+
+def run_batched(
+    func, tasks, costs, n_jobs=None, backend="loky", shared=(), progress=None
+):
+    """Apply a function on each task, distributing the tasks in batches over jobs
+
+    Tasks are packed into batches of similar cost, which are dispatched from the
+    most to the least costly batch to avoid a single long batch at the end. When
+    a single job is available or the total cost is below ``MIN_PARALLEL_COST``,
+    the tasks are executed serially in the current process.
+
+    Large data should be passed as ``shared`` arrays, with the tasks only
+    describing the part of the arrays to process (e.g. an offset and length). The
+    shared arrays are transferred once to the workers, see
+    :func:`rfactor.parallel.shared_arrays`.
+
+    Parameters
+    ----------
+    func : Callable
+        Function to apply on each task.
+    tasks : list of tuple
+        Arguments of ``func`` for each task.
+    costs : list of float
+        Cost (e.g. number of records) of each task.
+    n_jobs : int, default None
+        Number of jobs, see :func:`rfactor.parallel.effective_n_jobs`.
+    backend : str, default "loky"
+        Joblib backend, e.g. "loky" (processes) or "threading".
+    shared : tuple of numpy.ndarray, default ()
+        Arrays passed as first arguments to ``func`` for each task, i.e.
+        ``func(*shared, *task)``.
+    progress : str, default None
+        Description of the progress bar of the finished tasks, no progress bar if
+        None.
+
+    Returns
+    -------
+    results : list
+        Output of ``func`` for each task, in the order of ``tasks``.
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    with tqdm(total=len(tasks), desc=progress, disable=progress is None) as bar:
+        if n_jobs == 1 or len(tasks) <= 1 or sum(costs) < MIN_PARALLEL_COST:
+            results = []
+            for task in tasks:
+                results.append(func(*shared, *task))
+                bar.update()
+            return results
+
+        batches = balanced_batches(costs, n_jobs * BATCHES_PER_JOB)
+        results = [None] * len(tasks)
+        with shared_arrays(shared, backend) as arrays:
+            batch_results = Parallel(
+                n_jobs=n_jobs, backend=backend, return_as="generator_unordered"
+            )(
+                delayed(_run_indexed_batch)(
+                    func, batch, [tasks[idx] for idx in batch], arrays
+                )
+                for batch in batches
+            )
+            for batch, batch_result in batch_results:
+                for idx, result in zip(batch, batch_result):
+                    results[idx] = result
+                bar.update(len(batch))
+    return results
+
+
+def run_lazy(func, tasks, n_jobs=None, backend="loky", progress=None):
+    """Apply a function on each task of an iterator, consuming the iterator lazily
+
+    Contrary to :func:`rfactor.parallel.run_batched`, the tasks are only created
+    when a job is available to process them, with at most two tasks per job
+    dispatched at the same time. Hence, only the tasks in progress are kept in
+    memory, e.g. the rainfall data of a single station/year per job.
+
+    Parameters
+    ----------
+    func : Callable
+        Function to apply on each task.
+    tasks : Iterable
+        Argument of ``func`` for each task.
+    n_jobs : int, default None
+        Number of jobs, see :func:`rfactor.parallel.effective_n_jobs`.
+    backend : str, default "loky"
+        Joblib backend, e.g. "loky" (processes) or "threading".
+    progress : str, default None
+        Description of the progress bar of the finished tasks, no progress bar if
+        None.
+
+    Returns
+    -------
+    results : list
+        Output of ``func`` for each task, in the order of ``tasks``.
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1:
+        results = (func(task) for task in tasks)
+    else:
+        results = Parallel(
+            n_jobs=n_jobs,
+            backend=backend,
+            return_as="generator",
+            pre_dispatch="2 * n_jobs",
+        )(delayed(func)(task) for task in tasks)
+    return list(tqdm(results, desc=progress, disable=progress is None))
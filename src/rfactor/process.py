@@ -1,6 +1,9 @@
 import numpy as np
 import pandas as pd
 
+from rfactor.cache import FILE_FORMATS, PYARROW_AVAILABLE
+from rfactor.parallel import run_batched
+
 # import for backward compatibility
 from rfactor.rain import (  # noqa
     _check_path,
@@ -9,6 +12,7 @@ from rfactor.rain import (  # noqa
     load_rain_file_matlab_legacy,
     load_rain_folder,
 )
+from rfactor.stream import RainfallStatistics
 
 
 def _days_since_start_year(series):
@@ -42,11 +46,13 @@ def _days_since_start_year(series):
     return days_since_start
 
 
-def compute_diagnostics(rain):
+def compute_diagnostics(rain, grid=None):
     """Compute diagnostics for input rainfall.
 
     This function computes coverage (per year, station) and missing rainfall for each
-    month (per year, station).
+    month (per year, station). The records are coded by station, year and month
+    and the diagnostics of all station/year combinations are counted in a single
+    pass.
 
     Parameters
     ----------
@@ -58,6 +64,11 @@ def compute_diagnostics(rain):
         - *station* (str): station name
         - *year* (int): year of the measurement
         - *tag* (str): tag identifier, formatted as ``STATION_YEAR``
+    grid : str, default None
+        Time step of dense rainfall time series (e.g. "10min"), i.e. time series
+        with a record for each time step, including the zero-values. If provided,
+        the coverage is the number of non-NULL records relative to the number of
+        time steps in the year.
 
     Returns
     -------
@@ -71,7 +82,9 @@ def compute_diagnostics(rain):
 
         Added with per month (id's 1 to 12):
 
-        - *months* (int):  1: no rain observed in month, 0: rain observed.
+        - *months* (float):  1: no rain observed in month, 0: rain observed,
+          NaN: no records for the station/year in a month with records for other
+          stations/years.
 
 
     Notes
@@ -82,37 +95,88 @@ def compute_diagnostics(rain):
 
         C = 100*[1-\\frac{\\text{number of NULL-data}}
         {\\text{length of non-zero timeseries}}]
+
+    or, for dense time series with a given ``grid``:
+
+    .. math::
+
+        C = 100*\\frac{\\text{number of non-NULL data}}
+        {\\text{number of time steps in the year}}
     """
-    # compute coverage
-    diagnostics = rain.groupby([rain["datetime"].dt.year, "station"]).aggregate(
-        {"rain_mm": lambda x: 1 - np.sum(np.isnan(x)) / len(x)}
+    years = rain["datetime"].dt.year
+    year_codes, unique_years = pd.factorize(years, sort=True)
+    station_codes, stations = pd.factorize(rain["station"], sort=True)
+    months = rain["datetime"].dt.month.to_numpy() - 1
+
+    # station/year combinations ordered by year and station
+    n_groups = len(unique_years) * len(stations)
+    groups = year_codes * len(stations) + station_codes
+    rain_mm = rain["rain_mm"].to_numpy(dtype=np.float64)
+    missing = np.isnan(rain_mm)
+    n_records = np.bincount(groups, minlength=n_groups)
+    n_missing = np.bincount(groups, weights=missing, minlength=n_groups)
+    group_months = groups * 12 + months
+    n_records_month = np.bincount(group_months, minlength=n_groups * 12).reshape(
+        n_groups, 12
+    )
+    rain_month = np.bincount(
+        group_months,
+        weights=np.where(missing, 0.0, rain_mm),
+        minlength=n_groups * 12,
+    ).reshape(n_groups, 12)
+
+    observed = np.flatnonzero(n_records)
+    year_idx, station_idx = np.divmod(observed, len(stations))
+    if grid is None:
+        coverage = 1 - n_missing[observed] / n_records[observed]
+    else:
+        year = (unique_years.to_numpy() - 1970).astype("datetime64[Y]")
+        start, end = year.astype("datetime64[ns]"), (year + 1).astype("datetime64[ns]")
+        time_steps = (end - start) / pd.Timedelta(grid).to_timedelta64()
+        coverage = (n_records - n_missing)[observed] / time_steps[year_idx]
+
+    diagnostics = pd.DataFrame(
+        {
+            "station": stations.take(station_idx),
+            "year": unique_years.take(year_idx),
+            "coverage": coverage,
+        }
     )
-    diagnostics = diagnostics.rename(columns={"rain_mm": "coverage"})
-
-    # no-rain for months
-    df = rain.groupby(
-        [rain["datetime"].dt.year, rain["datetime"].dt.month, "station"]
-    ).aggregate({"rain_mm": np.sum})
-    df.index.names = ["datetime", "month", "station"]
-    df["norain"] = 0
-    df.loc[df["rain_mm"] == 0, "norain"] = 1
-    df = df.pivot_table(
-        columns=["month"], index=["station", "datetime"], values=["norain"]
+    n_records_month = n_records_month[observed]
+    norain = np.where(n_records_month > 0, rain_month[observed] == 0, np.nan)
+    # months without records for any station/year are no-rain months
+    norain[:, n_records_month.sum(axis=0) == 0] = 1
+    return diagnostics.join(pd.DataFrame(norain, columns=range(1, 13)))
+
+
+# precision of the days since, cumulative erosivity and cumulative rain columns of
+# the legacy output format
+LEGACY_OUTPUT_FORMAT = "%.3f %.2f %.1f\n"
+OUTPUT_FORMATS = ("legacy", *FILE_FORMATS)
+
+
+def _legacy_output_text(days_since, erosivity_cum, all_event_rain_cum):
+    """Text of the legacy output format, formatting all values in a single call"""
+    values = np.column_stack([days_since, erosivity_cum, all_event_rain_cum])
+    return LEGACY_OUTPUT_FORMAT * len(values) % tuple(values.ravel().tolist())
+
+
+def _write_legacy_output(
+    days_since, erosivity_cum, all_event_rain_cum, file_path, offset, length
+):
+    """Write the segment ``offset:offset + length`` of the (shared) arrays to a
+    file in the legacy output format"""
+    segment = slice(offset, offset + length)
+    file_path.write_text(
+        _legacy_output_text(
+            days_since[segment], erosivity_cum[segment], all_event_rain_cum[segment]
+        )
     )
-    df = df["norain"].reset_index()
-    # check if months are in df reported
-    for month in range(1, 13, 1):
-        if month not in df.columns:
-            df[month] = 1
 
-    # couple
-    diagnostics = diagnostics.merge(df, how="left", on=["station", "datetime"])
-    diagnostics = diagnostics.rename(columns={"datetime": "year"})
 
-    return diagnostics
-
-
-def write_erosivity_data(df, folder_path):
+def write_erosivity_data(
+    df, folder_path, file_format="legacy", n_jobs=1, backend="loky"
+):
     """Write output erosivity to (legacy Matlab format) in folder.
 
     Written data are split-up for each year and station
@@ -123,6 +187,11 @@ def write_erosivity_data(df, folder_path):
     - *erosivity_cum* (float): Cumulative erosivity over events.
     - *all_event_rain_cum* (float): Cumulative rain over events.
 
+    With ``file_format`` "parquet" or "feather", the same columns (without
+    rounding) are written to a single file (``erosivity.parquet`` or
+    ``erosivity.feather``) in the folder, together with the *station*, *year* and
+    *datetime* columns (requires ``pyarrow``, install with ``rfactor[cache]``).
+
     Parameters
     ----------
     df : pandas.DataFrame
@@ -137,26 +206,75 @@ def write_erosivity_data(df, folder_path):
     folder_path : pathlib.Path
         Folder path to save data according to legacy Matlab format,
         see :func:`rfactor.process.load_rain_file`.
-
+    file_format : {"legacy", "parquet", "feather"}, default "legacy"
+        Output format, a text file for each station/year ("legacy") or a single
+        Parquet or Feather file.
+    n_jobs : int, default 1
+        Number of parallel jobs to write the files of the legacy output format, see
+        :func:`rfactor.parallel.run_batched`.
+    backend : str, default "loky"
+        Joblib backend used for the parallel jobs, e.g. "loky" (processes) or
+        "threading".
     """
     _check_path(folder_path)
+    if file_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"File format '{file_format}' not supported, use one of "
+            f"{list(OUTPUT_FORMATS)}."
+        )
 
     folder_path.mkdir(exist_ok=True, parents=True)
 
-    for (station, year), df_group in df.groupby(["station", df["datetime"].dt.year]):
-        df_group = df_group.assign(
-            days_since=_days_since_start_year(df_group["datetime"])
-        )
-        formats = {
-            "days_since": "{:.3f}",
-            "erosivity_cum": "{:.2f}",
-            "all_event_rain_cum": "{:.1f}",
-        }
-        for column, fformat in formats.items():
-            df_group[column] = df_group[column].map(lambda x: fformat.format(x))
-        df_group[["days_since", "erosivity_cum", "all_event_rain_cum"]].to_csv(
-            folder_path / f"{station}_{year}.csv", header=None, index=None, sep=" "
+    years = df["datetime"].dt.year
+    timestamps = df["datetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    year_start = (
+        (years.to_numpy() - 1970)
+        .astype("datetime64[Y]")
+        .astype("datetime64[ns]")
+        .view(np.int64)
+    )
+    # same float operations as rfactor.process._days_since_start_year
+    days_since = (timestamps - year_start) / 1e9 / 60.0 / 1440.0
+
+    if file_format != "legacy":
+        if not PYARROW_AVAILABLE:
+            raise ImportError(
+                f"Writing {file_format} files requires pyarrow, install with "
+                f"'rfactor[cache]'."
+            )
+        extension, _, write_method = FILE_FORMATS[file_format]
+        output = pd.DataFrame(
+            {
+                "station": df["station"].to_numpy(),
+                "year": years.to_numpy(),
+                "datetime": df["datetime"].to_numpy(),
+                "days_since": days_since,
+                "erosivity_cum": df["erosivity_cum"].to_numpy(),
+                "all_event_rain_cum": df["all_event_rain_cum"].to_numpy(),
+            }
         )
+        getattr(output, write_method)(folder_path / f"erosivity{extension}")
+        return
+
+    groups = df.groupby(["station", years], observed=True).indices
+    order = np.concatenate(list(groups.values())) if groups else np.zeros(0, dtype=int)
+    lengths = [len(positions) for positions in groups.values()]
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(int).tolist()
+    run_batched(
+        _write_legacy_output,
+        [
+            (folder_path / f"{station}_{year}.csv", offset, length)
+            for (station, year), offset, length in zip(groups, offsets, lengths)
+        ],
+        lengths,
+        n_jobs=n_jobs,
+        backend=backend,
+        shared=(
+            days_since[order],
+            df["erosivity_cum"].to_numpy(dtype=np.float64)[order],
+            df["all_event_rain_cum"].to_numpy(dtype=np.float64)[order],
+        ),
+    )
 
 
 def get_rfactor_station_year(erosivity, stations=None, years=None):
@@ -198,18 +316,454 @@ def get_rfactor_station_year(erosivity, stations=None, years=None):
             raise KeyError(f"Year(s): {unexisting_years} not part of data set.")
         erosivity = erosivity.loc[erosivity["year"].isin(years)]
 
-    erosivity = erosivity.groupby(["year", "station"]).aggregate("erosivity_cum").last()
+    erosivity = (
+        erosivity.groupby(["year", "station"], observed=True)
+        .aggregate("erosivity_cum")
+        .last()
+    )
     erosivity = erosivity.reset_index().sort_values(["station", "year"])
     erosivity.index = range(len(erosivity))
     return erosivity
 
 
-def compute_rainfall_statistics(df_rainfall, df_station_metadata=None):
+class ErosivityStore:
+    """Erosivity events indexed on station and year for repeated queries
+
+    The annual R-factor of each station/year combination (the cumulative
+    erosivity at the end of the year, see
+    :func:`rfactor.process.get_rfactor_station_year`) and the position of the
+    events of each station/year combination are derived once. Queries on subsets of
+    stations and years are answered from this index, without scanning the events.
+
+    Parameters
+    ----------
+    erosivity : pandas.DataFrame
+        Erosivity of the events, see :func:`rfactor.rfactor.compute_erosivity`.
+
+    Attributes
+    ----------
+    events : pandas.DataFrame
+        Erosivity of the events, ordered by station and year.
+    rfactor : pandas.DataFrame
+        R-factor of each station/year combination with the *year*, *station* and
+        *erosivity_cum* columns, ordered by station and year.
+    offsets : numpy.ndarray
+        Position of the first event of each station/year combination (row of
+        ``rfactor``) in ``events``.
+    lengths : numpy.ndarray
+        Number of events of each station/year combination.
+
+    Examples
+    --------
+    ::
+
+        store = ErosivityStore(compute_erosivity(rain))
+        rfactor_flanders = store.rfactor_station_year(stations_flanders, years)
+        store.station_statistics(stations_flanders)
+    """
+
+    def __init__(self, erosivity):
+        if not {"station", "year", "erosivity_cum"}.issubset(erosivity.columns):
+            raise KeyError(
+                "DataFrame should contain 'station', 'year' and 'erosivity_cum' "
+                "columns."
+            )
+        groups = erosivity.groupby(["station", "year"], observed=True).indices
+        order = (
+            np.concatenate(list(groups.values())) if groups else np.zeros(0, dtype=int)
+        )
+        self.lengths = np.array([len(positions) for positions in groups.values()])
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(int)
+        self.events = erosivity.iloc[order]
+
+        # the last event of each station/year, see get_rfactor_station_year
+        self.rfactor = (
+            self.events.groupby(["year", "station"], observed=True)
+            .aggregate("erosivity_cum")
+            .last()
+            .reset_index()
+            .sort_values(["station", "year"])
+        )
+        self.rfactor.index = range(len(self.rfactor))
+
+        stations = self.rfactor["station"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, stations[1:] != stations[:-1]])
+        stops = np.r_[starts[1:], len(stations)]
+        self._station_rows = {
+            station: (start, stop)
+            for station, start, stop in zip(stations[starts], starts, stops)
+        }
+        self._positions = {
+            key: idx
+            for idx, key in enumerate(zip(stations, self.rfactor["year"].to_numpy()))
+        }
+
+    def _rows(self, stations=None, years=None):
+        """Rows of ``rfactor`` of the stations and years"""
+        if stations is None:
+            rows = np.arange(len(self.rfactor))
+        else:
+            unexisting_stations = set(stations).difference(self._station_rows)
+            if unexisting_stations:
+                raise KeyError(
+                    f"Station name(s): {unexisting_stations} not part of data set."
+                )
+            rows = np.unique(
+                np.concatenate(
+                    [np.arange(*self._station_rows[station]) for station in stations]
+                    + [np.zeros(0, dtype=int)]
+                )
+            )
+        if years is not None:
+            year_values = self.rfactor["year"].to_numpy()[rows]
+            unexisting_years = set(years).difference(year_values.tolist())
+            if unexisting_years:
+                raise KeyError(f"Year(s): {unexisting_years} not part of data set.")
+            rows = rows[np.isin(year_values, list(years))]
+        return rows
+
+    def rfactor_station_year(self, stations=None, years=None):
+        """R-factor of each station/year combination of a subset of stations and
+        years, equal to :func:`rfactor.process.get_rfactor_station_year`
+
+        Parameters
+        ----------
+        stations: list, default None
+            List of stations to extract R for, all stations if None.
+        years: list, default None
+            List of years to extract R for, all years if None.
+
+        Returns
+        -------
+        rfactor : pandas.DataFrame
+            The *year*, *station* and *erosivity_cum* (R-factor) of each
+            station/year combination, ordered by station and year.
+        """
+        rfactor = self.rfactor.iloc[self._rows(stations, years)]
+        rfactor.index = range(len(rfactor))
+        return rfactor
+
+    def station_year_events(self, station, year):
+        """Erosivity of the events of a station/year combination
+
+        Parameters
+        ----------
+        station : str
+        year : int
+
+        Returns
+        -------
+        events : pandas.DataFrame
+            See :func:`rfactor.rfactor.compute_erosivity`.
+        """
+        if (station, year) not in self._positions:
+            raise KeyError(f"Station '{station}' and year {year} not part of data set.")
+        idx = self._positions[(station, year)]
+        return self.events.iloc[
+            self.offsets[idx] : self.offsets[idx] + self.lengths[idx]
+        ]
+
+    def station_statistics(self, stations=None, years=None):
+        """Multi-year mean and median R-factor of each station
+
+        Parameters
+        ----------
+        stations: list, default None
+            List of stations, all stations if None.
+        years: list, default None
+            List of years to take into account, all years if None.
+
+        Returns
+        -------
+        statistics : pandas.DataFrame
+            For each station:
+
+            - *station* (str): station
+            - *years* (int): number of years with an R-factor
+            - *mean* (float): mean of the annual R-factor
+            - *median* (float): median of the annual R-factor
+        """
+        rfactor = self.rfactor.iloc[self._rows(stations, years)]
+        statistics = (
+            rfactor.groupby("station", observed=True)["erosivity_cum"]
+            .agg(["count", "mean", "median"])
+            .rename(columns={"count": "years"})
+            .reset_index()
+        )
+        return statistics
+
+
+def _block_indices(rng, n_resamples, n_years, block_size):
+    """Index matrix of resampled years, drawn as blocks of consecutive years"""
+    n_blocks = -(-n_years // block_size)
+    starts = rng.integers(0, n_years - block_size + 1, size=(n_resamples, n_blocks))
+    indices = (starts[:, :, np.newaxis] + np.arange(block_size)).reshape(
+        n_resamples, -1
+    )
+    return indices[:, :n_years]
+
+
+def bootstrap_rfactor(
+    rfactor,
+    n_resamples=10000,
+    confidence=0.95,
+    networks=None,
+    block_size=1,
+    seed=None,
+):
+    """Bootstrap confidence intervals of the multi-year mean R-factor
+
+    The years of the annual R-factor table are resampled with replacement (in
+    blocks of ``block_size`` consecutive years). All resamples are drawn at once as
+    an index matrix and the same resampled years are used for all stations and
+    networks, which preserves the correlation between stations. Stations without
+    an R-factor for some years take the mean of the resampled years with an
+    R-factor.
+
+    The annual R-factor of a network is the mean of the annual R-factor of its
+    stations with an R-factor in that year.
+
+    Parameters
+    ----------
+    rfactor : pandas.DataFrame
+        Annual R-factor of each station/year, see
+        :func:`rfactor.process.get_rfactor_station_year`.
+    n_resamples : int, default 10000
+        Number of bootstrap resamples.
+    confidence : float, default 0.95
+        Confidence level of the percentile intervals.
+    networks : dict, default None
+        Mapping of the name of a network to a list of its stations. A single
+        network ``"all"`` with all stations is used if None, no networks are
+        used for an empty dict. The network names can not be station names.
+    block_size : int, default 1
+        Number of consecutive years (in the R-factor table) of a resampled block.
+    seed : int or numpy.random.Generator, default None
+        Seed of the random number generator, for reproducible intervals.
+
+    Returns
+    -------
+    intervals : pandas.DataFrame
+        For each station, followed by each network:
+
+        - *station* (str): station or network name
+        - *years* (int): number of years with an R-factor
+        - *mean* (float): mean of the annual R-factor
+        - *std_error* (float): bootstrap standard error of the mean
+        - *ci_lower* (float): lower bound of the percentile interval
+        - *ci_upper* (float): upper bound of the percentile interval
+
+    Examples
+    --------
+    ::
+
+        rfactor = get_rfactor_station_year(erosivity)
+        bootstrap_rfactor(rfactor, networks={"Flanders": stations}, seed=42)
+    """
+    if n_resamples < 1:
+        raise ValueError("The number of resamples should be at least 1.")
+    if not 0 < confidence < 1:
+        raise ValueError("The confidence level should be between 0 and 1.")
+
+    rfactor = rfactor.assign(station=rfactor["station"].astype(str))
+    annual = rfactor.pivot(index="year", columns="station", values="erosivity_cum")
+    annual = annual.astype(np.float64)
+    stations = annual.columns.tolist()
+    if networks is None:
+        networks = {"all": stations}
+    for name, network_stations in networks.items():
+        if name in stations:
+            raise ValueError(
+                f"Network name '{name}' is a station of the data set, use another "
+                f"network name."
+            )
+        unexisting_stations = set(network_stations).difference(stations)
+        if unexisting_stations:
+            raise KeyError(
+                f"Station name(s): {unexisting_stations} of network '{name}' not "
+                f"part of data set."
+            )
+        annual[name] = annual[list(network_stations)].mean(axis=1)
+
+    n_years = len(annual)
+    if not 1 <= block_size <= n_years:
+        raise ValueError(
+            f"The block size should be between 1 and the number of years ({n_years})."
+        )
+    values = annual.to_numpy()
+    valid = ~np.isnan(values)
+
+    rng = np.random.default_rng(seed)
+    indices = _block_indices(rng, n_resamples, n_years, block_size)
+    # number of times each year is drawn in each resample
+    counts = np.bincount(
+        (indices + n_years * np.arange(n_resamples)[:, np.newaxis]).ravel(),
+        minlength=n_resamples * n_years,
+    ).reshape(n_resamples, n_years)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (counts @ np.where(valid, values, 0.0)) / (counts @ valid)
+
+    lower, upper = np.nanpercentile(
+        means, [50 * (1 - confidence), 50 * (1 + confidence)], axis=0
+    )
+    intervals = pd.DataFrame(
+        {
+            "station": annual.columns.tolist(),
+            "years": valid.sum(axis=0),
+            "mean": np.nanmean(values, axis=0),
+            "std_error": np.nanstd(means, axis=0, ddof=1),
+            "ci_lower": lower,
+            "ci_upper": upper,
+        }
+    )
+    return intervals
+
+
+# start (month, day) of the periods of a year, the year starts with the first period
+PERIODS = {
+    "half-month": [(month, day) for month in range(1, 13) for day in (1, 16)],
+    "month": [(month, 1) for month in range(1, 13)],
+    "hydrological-year": [(10, 1)],
+    "growing-season": [(4, 1), (10, 1)],
+}
+
+
+def _period_bins(datetimes, starts):
+    """Year and period (1-based) of each datetime for the given period starts"""
+    starts = np.array(sorted(starts))
+    start_days = starts[:, 0] * 32 + starts[:, 1]
+    days = datetimes.month.to_numpy() * 32 + datetimes.day.to_numpy()
+    periods = np.searchsorted(start_days, days, side="right")
+    years = datetimes.year.to_numpy().astype(np.int64)
+    # before the first period start, i.e. the last period of the previous year
+    before = periods == 0
+    years[before] -= 1
+    periods[before] = len(starts)
+    return years, periods
+
+
+def compute_erosivity_distribution(
+    erosivity, periods="half-month", complete_years=True
+):
+    """Erosivity per period and the annual erosivity distribution
+
+    Each event is assigned to the period of the year in which it starts, e.g. to
+    derive the half-monthly erosivity (and its fraction of the annual erosivity) of
+    the original Matlab implementation for the C-factor weighting of WaTEM/SEDEM.
+    The erosivity of all station/year combinations is summed per period in a single
+    pass.
+
+    Parameters
+    ----------
+    erosivity : pandas.DataFrame
+        See :func:`rfactor.rfactor.compute_erosivity`
+    periods : str or list of tuple, default "half-month"
+        One of the predefined periods in :data:`rfactor.process.PERIODS`
+        (``"half-month"``, ``"month"``, ``"hydrological-year"`` starting on 1
+        October or ``"growing-season"`` from 1 April until 30 September and the
+        remainder of the year) or a list with the start ``(month, day)`` of each
+        period. The year starts with the first period (in calendar order) and is
+        labelled with the calendar year in which it starts.
+    complete_years : bool, default True
+        Only keep the years (of the periods) of which all calendar years are part
+        of the erosivity of the station. Years that do not start on 1 January
+        (e.g. hydrological years) overlap two calendar years, so the first and
+        last year of calendar year data only contain part of the periods and
+        would bias the distribution. Calendar years without events are considered
+        missing.
+
+    Returns
+    -------
+    distribution : pandas.DataFrame
+        For each station, year and period:
+
+        - *station* (str): station
+        - *year* (int): year (of the first period)
+        - *period* (int): period number, starting at 1
+        - *erosivity* (float): erosivity of the events starting in the period
+        - *fraction* (float): fraction of the annual erosivity
+    average : pandas.DataFrame
+        For each period, the average over all station/year combinations:
+
+        - *period* (int): period number, starting at 1
+        - *erosivity* (float): mean erosivity of the period
+        - *fraction* (float): fraction of the mean annual erosivity
+
+    Examples
+    --------
+    ::
+
+        erosivity = compute_erosivity(rain)
+        distribution, average = compute_erosivity_distribution(erosivity)
+
+        # winter half-year and summer half-year, starting on 1 October
+        compute_erosivity_distribution(erosivity, periods=[(10, 1), (4, 1)])
+    """
+    if isinstance(periods, str):
+        if periods not in PERIODS:
+            raise KeyError(
+                f"Period '{periods}' not supported, use one of {list(PERIODS)} "
+                f"or a list of (month, day) starts."
+            )
+        periods = PERIODS[periods]
+    if len(periods) == 0 or len(set(periods)) != len(periods):
+        raise ValueError("The (month, day) starts of the periods should be unique.")
+    for month, day in periods:
+        pd.Timestamp(year=2000, month=month, day=day)  # raises for invalid dates
+    n_periods = len(periods)
+
+    years, period = _period_bins(pd.DatetimeIndex(erosivity.index), periods)
+    calendar_years = erosivity["year"].to_numpy(dtype=np.int64)
+    station_codes, stations = pd.factorize(erosivity["station"], sort=True)
+    # the years of the periods start at most one year before the calendar year
+    first_year = years.min() if len(years) else 0
+    n_years = calendar_years.max() - first_year + 2 if len(years) else 1
+    keys, codes = np.unique(
+        station_codes * n_years + years - first_year, return_inverse=True
+    )
+    sums = np.bincount(
+        codes * n_periods + period - 1,
+        weights=erosivity["erosivity"].to_numpy(dtype=np.float64),
+        minlength=len(keys) * n_periods,
+    ).reshape(len(keys), n_periods)
+    if complete_years:
+        present = np.unique(station_codes * n_years + calendar_years - first_year)
+        complete = np.isin(keys, present)
+        if tuple(min(periods)) != (1, 1):
+            complete &= np.isin(keys + 1, present)
+        keys, sums = keys[complete], sums[complete]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = sums / sums.sum(axis=1, keepdims=True)
+
+    distribution = pd.DataFrame(
+        {
+            "station": np.repeat(np.asarray(stations)[keys // n_years], n_periods),
+            "year": np.repeat(keys % n_years + first_year, n_periods),
+            "period": np.tile(np.arange(1, n_periods + 1), len(keys)),
+            "erosivity": sums.ravel(),
+            "fraction": fractions.ravel(),
+        }
+    )
+    mean = sums.mean(axis=0) if len(sums) else np.full(n_periods, np.nan)
+    average = pd.DataFrame(
+        {
+            "period": np.arange(1, n_periods + 1),
+            "erosivity": mean,
+            "fraction": mean / mean.sum(),
+        }
+    )
+    return distribution, average
+
+
+def compute_rainfall_statistics(df_rainfall, df_station_metadata=None, exact=True):
     """Compute general statistics for rainfall timeseries.
 
     Statistics (number of records, min, max, median and years data) are
     computed for each measurement station
 
+    To compute the statistics while loading the rain files, see
+    :class:`rfactor.stream.RainfallStatistics`.
+
     Parameters
     ----------
     df_rainfall: pandas.DataFrame
@@ -221,6 +775,9 @@ def compute_rainfall_statistics(df_rainfall, df_station_metadata=None):
         - *station* (str): Name or code of the measurement station
         - *x* (float): X-coordinate of measurement station.
         - *y* (float): Y-coordinate of measurement station.
+    exact : bool, default True
+        Exact median or the median of a quantile sketch, see
+        :class:`rfactor.stream.RainfallStatistics`.
 
     Returns
     -------
@@ -235,47 +792,6 @@ def compute_rainfall_statistics(df_rainfall, df_station_metadata=None):
         - *max* (float): Maximal measured value for the station.
 
     """
-    df_rainfall = df_rainfall.sort_values(by="year")
-    df_statistics = (
-        df_rainfall[["year", "station", "rain_mm"]]
-        .groupby("station")
-        .aggregate(
-            {
-                "year": lambda x: sorted(set(x)),
-                "rain_mm": ["min", "max", "median", "count"],
-            }
-        )
-    ).reset_index()
-    df_statistics.columns = df_statistics.columns.map("".join)
-    rename_cols = {
-        "year<lambda>": "year",
-        "rain_mmamin": "min",
-        "rain_mmamax": "max",
-        "rain_mmmin": "min",
-        "rain_mmmax": "max",
-        "rain_mmmedian": "median",
-        "rain_mmcount": "records",
-    }
-    df_statistics = df_statistics.rename(columns=rename_cols)
-
-    if df_station_metadata is not None:
-        df_statistics = df_statistics.merge(
-            df_station_metadata, on="station", how="left"
-        )
-
-        df_statistics = df_statistics[
-            [
-                "year",
-                "station",
-                "x",
-                "y",
-                "records",
-                "min",
-                "median",
-                "max",
-            ]
-        ]
-    else:
-        df_statistics = df_statistics[["year", "records", "min", "median", "max"]]
-
-    return df_statistics
+    statistics = RainfallStatistics(exact=exact)
+    statistics.update(df_rainfall)
+    return statistics.to_frame(df_station_metadata)
@@ -1,9 +1,25 @@
+import json
+import mmap as mmap_module
+import os
 import re
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from pandas.tseries.api import guess_datetime_format
+
+from rfactor.archive import (
+    find_rain_files,
+    group_by_archive,
+    is_compressed,
+    iter_rain_files,
+    open_rain_file,
+    rain_file_stat,
+    strip_compression_suffix,
+)
+from rfactor.cache import RainCache
+from rfactor.parallel import run_batched
 
 
 class RainfallFilesIOMsg(str):
@@ -25,40 +41,57 @@ def _check_path(file_path):
             raise TypeError("'file_path' should be a pathlib.Path object")
 
 
-def load_rain_file(file_path, load_fun, **kwargs):
-    """Load file format of rainfall data with a given load function
+def compact_rain(rain, float32=False):
+    """Convert rainfall data to the compact schema
+
+    The compact schema stores the *station* and *tag* as categorical and the
+    *year* as int16, instead of a Python string and int for each record. The tag
+    string is only formatted once for each station/year combination. This reduces
+    the memory of the DataFrame from about 145 bytes per record (with Python string
+    columns) to 20 bytes per record, or 16 bytes with ``float32``.
 
     Parameters
     ----------
-    file_path : pathlib.Path
-        File path with rainfall data. Note that files in the folder should follow the
-        input data format defined in the ``load_fun``.
-
-    load_fun : Callable
-        Please check the required input/output format for the files of the used load
-        functions. The output of this function must comply with:
-
-            - *datetime* (datetime64[ns]): timestamp, timezone naive
-            - *station* (object): name of station, must be formatting accoring to a
-              string.
-            - *value* (float): in mm
-
-    kwargs:
-        Keyword arguments for load_fun
-
+    rain : pandas.DataFrame
+        DataFrame with rainfall time series, see
+        :func:`rfactor.rain.load_rain_file`. The *year* and *tag* columns are
+        (re)derived from the *datetime* and *station* columns.
+    float32 : bool, default False
+        Store the *rain_mm* as float32 instead of float64. Note that the erosivity
+        is computed in float64, but from the float32 rounded rain depths.
 
     Returns
     -------
     rain : pandas.DataFrame
-        DataFrame with rainfall time series. Contains at least the following columns:
+        DataFrame with rainfall time series, with the columns:
 
-        - *rain_mm* (float): Rain in mm
         - *datetime* (pandas.Timestamp): Time stamp
-        - *minutes_since* (float): Minutes since start of year.
-        - *station* (str): station name
-        - *year* (int): year of the measurement
-        - *tag* (str): tag identifier, formatted as ``STATION_YEAR``
+        - *station* (category): station name
+        - *rain_mm* (float): Rain in mm
+        - *year* (int16): year of the measurement
+        - *tag* (category): tag identifier, formatted as ``STATION_YEAR``
     """
+    station = rain["station"].astype("category")
+    year = rain["datetime"].dt.year.astype(np.int16)
+
+    groups = pd.DataFrame(
+        {"station": station.cat.codes.to_numpy(), "year": year.to_numpy()}
+    ).groupby(["station", "year"], sort=True)
+    tags = [
+        f"{station.cat.categories[code]}_{key_year}"
+        for code, key_year in groups.size().index
+    ]
+    tag = pd.Categorical.from_codes(groups.ngroup().to_numpy(), categories=tags)
+
+    rain = rain.assign(station=station, year=year, tag=tag)
+    if float32:
+        rain = rain.assign(rain_mm=rain["rain_mm"].astype(np.float32))
+    return rain
+
+
+def _load_rain_file(file_path, load_fun, **kwargs):
+    """Load and check file of rainfall data, see
+    :func:`rfactor.rain.load_rain_file`"""
     rain = load_fun(file_path, **kwargs)
 
     if not isinstance(rain, pd.core.frame.DataFrame):
@@ -89,37 +122,109 @@ def load_rain_file(file_path, load_fun, **kwargs):
             f"'rain_mm', not '{rain['rain_mm'].dtype}'"
         )
         raise IOError(RainfallFilesIOMsg(msg))
-    rain["year"] = rain["datetime"].dt.year
-    rain["tag"] = rain["station"].astype(str) + "_" + rain["year"].astype(str)
-
     return rain
 
 
-def load_rain_folder(folder_path, load_fun, **kwargs):
-    """Load all (legacy Matlab format) files of rainfall data in a folder
+def load_rain_file(file_path, load_fun, compact=False, float32=False, **kwargs):
+    """Load file format of rainfall data with a given load function
 
     Parameters
     ----------
-    folder_path : pathlib.Path
-        Folder path with rainfall data, see also :func:`rfactor.process.load_rain_file`.
-        Folder must contain txt files.
+    file_path : pathlib.Path
+        File path with rainfall data. Note that files in the folder should follow the
+        input data format defined in the ``load_fun``.
 
     load_fun : Callable
-        Please check the required input format for the files in the above listed
-        functions. The (custom) function must output:
+        Please check the required input/output format for the files of the used load
+        functions. The output of this function must comply with:
 
-        - *datetime* (datetime64[ns]): timestamp, timezone naive
-        - *station* (object): name of station, must be formatting accoring to a string.
-        - *value* (float): in mm
+            - *datetime* (datetime64[ns]): timestamp, timezone naive
+            - *station* (object): name of station, must be formatting accoring to a
+              string.
+            - *value* (float): in mm
+
+    compact : bool, default False
+        Return the rainfall data in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+
+    float32 : bool, default False
+        Store the rain as float32 in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
 
     kwargs:
         Keyword arguments for load_fun
 
+
     Returns
     -------
     rain : pandas.DataFrame
-        See definition in :func:`rfactor.process.load_rain_file`
+        DataFrame with rainfall time series. Contains at least the following columns:
+
+        - *rain_mm* (float): Rain in mm
+        - *datetime* (pandas.Timestamp): Time stamp
+        - *minutes_since* (float): Minutes since start of year.
+        - *station* (str): station name
+        - *year* (int): year of the measurement
+        - *tag* (str): tag identifier, formatted as ``STATION_YEAR``
     """
+    rain = _load_rain_file(file_path, load_fun, **kwargs)
+    if compact:
+        return compact_rain(rain, float32)
+    return _add_year_tag(rain)
+
+
+def _add_year_tag(rain):
+    """Add the year and tag (``STATION_YEAR``) columns of the rainfall data"""
+    rain["year"] = rain["datetime"].dt.year
+    rain["tag"] = rain["station"].astype(str) + "_" + rain["year"].astype(str)
+    return rain
+
+
+def _load_folder_file(file_path, load_fun, raw=False, kwargs=None):
+    """Load a file of a folder, see :func:`rfactor.rain.load_rain_folder`"""
+    if raw:
+        return _load_rain_file(file_path, load_fun, **kwargs)
+    return load_rain_file(file_path, load_fun, **kwargs)
+
+
+def _load_folder_group(files, load_fun, raw=False, kwargs=None):
+    """Load the files of a group, reading the files of a tar archive in a single
+    pass, see :func:`rfactor.archive.iter_rain_files`"""
+    loaded = {
+        file_path: _load_folder_file(file_path, load_fun, raw, kwargs)
+        for file_path, _ in iter_rain_files(files)
+    }
+    return [loaded[file_path] for file_path in files]
+
+
+def _concat_ordered(lst_df):
+    """Concatenate the rainfall data of files in station/datetime order
+
+    The files are ordered on station and first time stamp, only sorting the records
+    of a file when not yet ordered. When a file contains multiple stations or files
+    of a station overlap in time, all records are sorted instead.
+    """
+    lst_df = [df for df in lst_df if len(df)] or lst_df
+    starts = []
+    for idx, df in enumerate(lst_df):
+        if len(df) == 0 or (df["station"] != df["station"].iloc[0]).any():
+            return pd.concat(lst_df).sort_values(["station", "datetime"])
+        if not df["datetime"].is_monotonic_increasing:
+            lst_df[idx] = df = df.sort_values("datetime")
+        starts.append((str(df["station"].iloc[0]), df["datetime"].iloc[0], idx))
+
+    ordered = [lst_df[idx] for _, _, idx in sorted(starts)]
+    for previous, df in zip(ordered[:-1], ordered[1:]):
+        if (
+            previous["station"].iloc[0] == df["station"].iloc[0]
+            and previous["datetime"].iloc[-1] >= df["datetime"].iloc[0]
+        ):
+            return pd.concat(lst_df).sort_values(["station", "datetime"])
+    return pd.concat(ordered)
+
+
+def _rain_folder_files(folder_path):
+    """Sorted rain files of a folder, see :func:`rfactor.rain.load_rain_folder`"""
     _check_path(folder_path)
     if not folder_path.exists():
         msg = f"Input folder '{folder_path}' does not exists."
@@ -129,28 +234,337 @@ def load_rain_folder(folder_path, load_fun, **kwargs):
             "`folder_path` need to be the path " "to a directory instead of a file"
         )
 
-    lst_df = []
-    files = list(folder_path.glob("*.txt"))
+    files = find_rain_files(folder_path)
 
     if len(files) == 0:
         msg = f"Input folder '{folder_path}' does not contain any 'txt'-files."
         raise FileNotFoundError(msg)
+    return files
+
+
+def _rain_cache(cache):
+    """Rain cache of a cache or cache folder, see :class:`rfactor.cache.RainCache`"""
+    if cache is None or isinstance(cache, RainCache):
+        return cache
+    return RainCache(cache)
+
+
+def _load_folder_files(
+    files,
+    load_fun,
+    compact,
+    cache,
+    kwargs,
+    n_jobs=1,
+    backend="loky",
+    progress=None,
+    save=True,
+):
+    """Load rain files of a folder, reading the unchanged files from the cache and
+    saving the cache manifest if ``save``"""
+    lst_df = [None] * len(files)
+    if cache is not None:
+        keys = [cache.key(file_path, load_fun, kwargs) for file_path in files]
+        lst_df = [cache.get(file_path, key) for file_path, key in zip(files, keys)]
+
+    missing = [idx for idx, df in enumerate(lst_df) if df is None]
+    # the files of a tar archive are loaded together, reading the archive once
+    groups = [
+        [missing[idx] for idx in group]
+        for group in group_by_archive([files[idx] for idx in missing])
+    ]
+    loaded = run_batched(
+        partial(
+            _load_folder_group,
+            load_fun=load_fun,
+            raw=compact or cache is not None,
+            kwargs=kwargs,
+        ),
+        [([files[idx] for idx in group],) for group in groups],
+        [sum(rain_file_stat(files[idx])[0] for idx in group) for group in groups],
+        n_jobs=n_jobs,
+        backend=backend,
+        progress=progress,
+    )
+    missing = [idx for group in groups for idx in group]
+    loaded = [rain for group_rain in loaded for rain in group_rain]
+    for idx, rain in zip(missing, loaded):
+        if cache is not None:
+            cache.put(files[idx], keys[idx], rain)
+        lst_df[idx] = rain
+    if cache is not None:
+        if save:
+            cache.save()
+        if not compact:
+            lst_df = [_add_year_tag(rain) for rain in lst_df]
+    return lst_df
+
+
+def load_rain_folder(
+    folder_path,
+    load_fun,
+    compact=False,
+    float32=False,
+    n_jobs=1,
+    backend="loky",
+    cache=None,
+    statistics=None,
+    **kwargs,
+):
+    """Load all (legacy Matlab format) files of rainfall data in a folder
+
+    Parameters
+    ----------
+    folder_path : pathlib.Path
+        Folder path with rainfall data, see also :func:`rfactor.process.load_rain_file`.
+        Folder must contain txt files. Compressed files (e.g. ``.txt.gz``) and
+        files in zip or tar archives are loaded without extracting them, see
+        :func:`rfactor.archive.find_rain_files`.
+
+    load_fun : Callable
+        Please check the required input format for the files in the above listed
+        functions. The (custom) function must output:
+
+        - *datetime* (datetime64[ns]): timestamp, timezone naive
+        - *station* (object): name of station, must be formatting accoring to a string.
+        - *value* (float): in mm
+
+    compact : bool, default False
+        Return the rainfall data in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+
+    float32 : bool, default False
+        Store the rain as float32 in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+
+    n_jobs : int, default 1
+        Number of parallel jobs to load the files, see
+        :func:`rfactor.parallel.effective_n_jobs`. The files are distributed over
+        the jobs according to their size, see :func:`rfactor.parallel.run_batched`.
+
+    backend : str, default "loky"
+        Joblib backend used for the parallel jobs, e.g. "loky" (processes) or
+        "threading". The "loky" backend requires ``load_fun`` to be importable
+        (e.g. not a lambda or locally defined function).
+
+    cache : rfactor.cache.RainCache or pathlib.Path, default None
+        Cache of the parsed files, see :class:`rfactor.cache.RainCache`. Files
+        which are cached with the same size, modification time and load function
+        arguments are read from the cache, the other files are parsed and added
+        to the cache. A path is used as cache folder of a new cache.
+
+    statistics : rfactor.stream.RainfallStatistics, default None
+        Statistics updated with the rainfall data of each file, see
+        :class:`rfactor.stream.RainfallStatistics`.
+
+    kwargs:
+        Keyword arguments for load_fun
+
+    Returns
+    -------
+    rain : pandas.DataFrame
+        See definition in :func:`rfactor.process.load_rain_file`, ordered by
+        station and datetime.
+    """
+    files = _rain_folder_files(folder_path)
+    lst_df = _load_folder_files(
+        files,
+        load_fun,
+        compact,
+        _rain_cache(cache),
+        kwargs,
+        n_jobs=n_jobs,
+        backend=backend,
+        progress="Processing input files",
+    )
+    if statistics is not None:
+        for rain in lst_df:
+            statistics.update(rain)
 
-    for file_path in tqdm(files, desc="Processing input files"):
-        df = load_rain_file(file_path, load_fun, **kwargs)
-        lst_df.append(df)
-    all_rain = pd.concat(lst_df)
-    all_rain = all_rain.sort_values(["station", "datetime"])
+    all_rain = _concat_ordered(lst_df)
+    if compact:
+        all_rain = compact_rain(all_rain, float32)
     all_rain.index = range(len(all_rain))
 
     return all_rain
 
 
+def update_rain_folder(
+    folder_path,
+    load_fun,
+    cache,
+    compact=False,
+    float32=False,
+    n_jobs=1,
+    backend="loky",
+    **kwargs,
+):
+    """Load the rainfall data of a folder, only parsing new or changed files
+
+    The rain files are compared with the manifest of the cache, see
+    :meth:`rfactor.cache.RainCache.changes`. Only the added and updated files are
+    parsed, the rainfall data of the other files is read from the cache. Removed
+    files are removed from the cache. The returned changes allow to recompute the
+    erosivity of the changed station/year combinations only.
+
+    Parameters
+    ----------
+    folder_path : pathlib.Path
+        Folder path with rainfall data, see :func:`rfactor.rain.load_rain_folder`.
+    load_fun : Callable
+        Load function, see :func:`rfactor.rain.load_rain_folder`.
+    cache : rfactor.cache.RainCache or pathlib.Path
+        Cache with the previously loaded rainfall data, a path is used as cache
+        folder (requires ``pyarrow``, install with ``rfactor[cache]``).
+    compact : bool, default False
+        Return the rainfall data in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+    float32 : bool, default False
+        Store the rain as float32 in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+    n_jobs : int, default 1
+        Number of parallel jobs to parse the files, see
+        :func:`rfactor.rain.load_rain_folder`.
+    backend : str, default "loky"
+        Joblib backend used for the parallel jobs, see
+        :func:`rfactor.rain.load_rain_folder`.
+    kwargs:
+        Keyword arguments for load_fun
+
+    Returns
+    -------
+    rain : pandas.DataFrame
+        Rainfall data of the folder, see :func:`rfactor.rain.load_rain_folder`.
+    changes : dict of list of pathlib.Path
+        The *added*, *updated* and *removed* files since the previous call.
+
+    Examples
+    --------
+    ::
+
+        cache = RainCache(Path("/PATH/TO/CACHE"))
+        rain, changes = update_rain_folder(folder, load_rain_file_matlab_legacy, cache)
+        print(f"{len(changes['added'])} added, {len(changes['updated'])} updated")
+    """
+    files = _rain_folder_files(folder_path)
+    cache = _rain_cache(cache)
+    changes = cache.changes(folder_path, files, load_fun, kwargs)
+    lst_df = _load_folder_files(
+        files,
+        load_fun,
+        compact,
+        cache,
+        kwargs,
+        n_jobs=n_jobs,
+        backend=backend,
+        progress="Processing input files",
+        save=False,
+    )
+    cache.add_file_hashes(changes["added"] + changes["updated"])
+    cache.save()
+
+    all_rain = _concat_ordered(lst_df)
+    if compact:
+        all_rain = compact_rain(all_rain, float32)
+    all_rain.index = range(len(all_rain))
+    return all_rain, changes
+
+
+def iter_rain_folder(
+    folder_path,
+    load_fun,
+    compact=False,
+    float32=False,
+    cache=None,
+    statistics=None,
+    **kwargs,
+):
+    """Iterate over the rainfall data of a folder, one station/year at a time
+
+    The files are grouped on the station and year of the file name (format
+    ``STATION_YEAR.txt``, see :func:`rfactor.rain.load_rain_folder`) and the files
+    of each station/year are only loaded when the iterator reaches them. Hence,
+    only the rainfall data of a single station/year is kept in memory, e.g. to
+    compute the erosivity of large archives, see
+    :func:`rfactor.rfactor.compute_erosivity`.
+
+    Parameters
+    ----------
+    folder_path : pathlib.Path
+        Folder path with rainfall data, see
+        :func:`rfactor.rain.load_rain_folder`.
+    load_fun : Callable
+        Load function, see :func:`rfactor.rain.load_rain_folder`.
+    compact : bool, default False
+        Return the rainfall data in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+    float32 : bool, default False
+        Store the rain as float32 in the compact schema, see
+        :func:`rfactor.rain.compact_rain`.
+    cache : rfactor.cache.RainCache or pathlib.Path, default None
+        Cache of the parsed files, see :func:`rfactor.rain.load_rain_folder`.
+    statistics : rfactor.stream.RainfallStatistics, default None
+        Statistics updated with the rainfall data of each station/year when the
+        iterator reaches it, see :class:`rfactor.stream.RainfallStatistics`.
+    kwargs:
+        Keyword arguments for load_fun
+
+    Returns
+    -------
+    rain : Iterator of pandas.DataFrame
+        Rainfall data of each station/year, see
+        :func:`rfactor.rain.load_rain_folder`, ordered by station and year.
+
+    Examples
+    --------
+    ::
+
+        rain = iter_rain_folder(folder, load_rain_file_matlab_legacy)
+        erosivity = compute_erosivity(rain)
+    """
+    files = _rain_folder_files(folder_path)
+    groups = {}
+    for file_path in files:
+        station, year = _extract_metadata_from_file_path(file_path)
+        groups.setdefault((station, year), []).append(file_path)
+    return _iter_rain_groups(
+        [groups[key] for key in sorted(groups)],
+        load_fun,
+        compact,
+        float32,
+        _rain_cache(cache),
+        statistics,
+        kwargs,
+    )
+
+
+def _iter_rain_groups(groups, load_fun, compact, float32, cache, statistics, kwargs):
+    """Load the files of each group, see :func:`rfactor.rain.iter_rain_folder`
+
+    The cache manifest is saved once, when the iterator is exhausted or closed.
+    """
+    try:
+        for files in groups:
+            rain = _concat_ordered(
+                _load_folder_files(files, load_fun, compact, cache, kwargs, save=False)
+            )
+            if statistics is not None:
+                statistics.update(rain)
+            if compact:
+                rain = compact_rain(rain, float32)
+            rain.index = range(len(rain))
+            yield rain
+    finally:
+        if cache is not None:
+            cache.save()
+
+
 def _extract_metadata_from_file_path(file_path):
     """Get metadata from file name
 
     Expects to be 'STATION_NAME_YYYY.txt' as format with ``STATION_NAME`` the
-    measurement station and the ``YYYY`` as the year of the measurement.
+    measurement station and the ``YYYY`` as the year of the measurement. The
+    suffix of compressed files is ignored, e.g. 'STATION_NAME_YYYY.txt.gz'.
 
     Parameters
     ----------
@@ -162,16 +576,98 @@ def _extract_metadata_from_file_path(file_path):
     station: str
     year : str
     """
-    if not re.fullmatch(".*_[0-9]{4}$", file_path.stem):
+    stem = Path(strip_compression_suffix(file_path)).stem
+    if not re.fullmatch(".*_[0-9]{4}$", stem):
         raise ValueError(
             "Input file_path_format should " "match with 'STATION_NAME_YYYY.txt'"
         )
-    station = "_".join(file_path.stem.split("_")[:-1])
-    year = file_path.stem.split("_")[-1]
+    station = "_".join(stem.split("_")[:-1])
+    year = stem.split("_")[-1]
     return station, year
 
 
-def load_rain_file_matlab_legacy(file_path):
+# powers of ten exactly representable as int64
+_POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+
+def _parse_matlab_legacy(buffer):
+    """Parse the two numeric columns of a (legacy Matlab) rainfall file
+
+    Fast path for the regular format of the files, i.e. each line contains an
+    integer (minutes), a single space and a number with a decimal point and
+    decimals (rain) and ends with a newline. The numbers are parsed from the digits
+    of all lines at once. The rain is derived by dividing the integer of its digits by a
+    power of ten, which provides the correctly rounded value.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+        Content of the file.
+
+    Returns
+    -------
+    minutes_since : numpy.ndarray or None
+        Minutes since the start of the year (int64), None when the content does
+        not follow the regular format.
+    rain : numpy.ndarray or None
+        Rain (float64) in mm, None when the content does not follow the regular
+        format.
+    """
+    chars = np.frombuffer(buffer, dtype=np.uint8)
+    if len(chars) == 0:
+        return None, None
+    if chars[-1] != ord("\n"):
+        chars = np.append(chars, np.uint8(ord("\n")))
+    carriage_returns = np.flatnonzero(chars == ord("\r"))
+    if len(carriage_returns):
+        if np.any(chars[carriage_returns + 1] != ord("\n")):
+            return None, None
+        chars = np.delete(chars, carriage_returns)
+
+    # the separators (all characters before "0") of each line are a space, a
+    # decimal point and a newline
+    if chars.max() > ord("9"):
+        return None, None
+    separators = np.flatnonzero(chars < ord("0"))
+    if len(separators) % 3:
+        return None, None
+    separators = separators.reshape(-1, 3)
+    if np.any(chars[separators] != np.array([ord(" "), ord("."), ord("\n")])):
+        return None, None
+    spaces, dots, newlines = separators.T
+
+    # digits before the space and after the decimal point, with a limited number
+    # of digits
+    starts = np.concatenate(([0], newlines[:-1] + 1))
+    n_minutes = spaces - starts
+    n_rain = newlines - spaces - 2
+    if np.any(
+        (n_minutes < 1) | (n_minutes > 18) | (newlines - dots < 2) | (n_rain > 15)
+    ):
+        return None, None
+
+    decimals = newlines - 1 - dots
+    minutes = _parse_digits(chars, spaces, n_minutes)
+    # digits of the rain without the decimal point
+    rain = _parse_digits(chars, newlines, n_rain, dots)
+    return minutes, rain / 10.0**decimals
+
+
+def _parse_digits(chars, ends, n_digits, dots=None):
+    """Integer value of the digits before ``ends`` of each line, processing the
+    n-th last digit of all lines at once and skipping the decimal point ``dots``"""
+    values = np.zeros(len(ends), dtype=np.int64)
+    positions = ends - 1
+    for power in range(n_digits.max()):
+        if dots is not None:
+            positions = positions - (positions == dots)
+        digits = chars[positions].astype(np.int64) - ord("0")
+        values += np.where(power < n_digits, digits, 0) * _POWERS_OF_TEN[power]
+        positions = positions - 1
+    return values
+
+
+def load_rain_file_matlab_legacy(file_path, engine="numpy", mmap=False):
     """Load (legacy Matlab) file format of rainfall data of a **single station/year**.
 
     The input files are defined by text files (extension: ``.txt``) that hold
@@ -185,6 +681,16 @@ def load_rain_file_matlab_legacy(file_path):
     ----------
     file_path : pathlib.Path
         File path with rainfall data according to defined format, see notes.
+    engine : {"numpy", "pandas"}, default "numpy"
+        Parse the file with a fast numpy parser of the regular file format, see
+        :func:`rfactor.rain._parse_matlab_legacy`, or with
+        :func:`pandas.read_csv`. Files which do not follow the regular format are
+        parsed with :func:`pandas.read_csv` by both engines, so both engines
+        provide the same output and errors.
+    mmap : bool, default False
+        Memory map the file for the "numpy" engine instead of reading it. Not
+        used for compressed files and files in an archive, which are
+        decompressed in memory, see :func:`rfactor.archive.open_rain_file`.
 
     Returns
     -------
@@ -214,9 +720,29 @@ def load_rain_file_matlab_legacy(file_path):
         )
 
     station, year = _extract_metadata_from_file_path(file_path)
-    rain = pd.read_csv(
-        file_path, delimiter=" ", header=None, names=["minutes_since", "rain_mm"]
-    )
+    if engine == "numpy":
+        minutes, rain_mm = _read_matlab_legacy(file_path, mmap)
+        if minutes is not None:
+            # datetime as a single offset of the start of the year, with the same
+            # resolution as the pandas engine
+            start = pd.Timestamp(f"{year}-01-01")
+            unit = (start + pd.to_timedelta(minutes[:1], unit="min")).unit
+            timestamps = start.as_unit("ns").value + minutes * 60_000_000_000
+            rain = pd.DataFrame(
+                {
+                    "datetime": timestamps.view("datetime64[ns]"),
+                    "station": station,
+                    "rain_mm": rain_mm,
+                }
+            )
+            return rain.astype({"datetime": f"datetime64[{unit}]"})
+    elif engine != "pandas":
+        raise ValueError(f"Engine '{engine}' not supported, use 'numpy' or 'pandas'.")
+
+    with open_rain_file(file_path) as stream:
+        rain = pd.read_csv(
+            stream, delimiter=" ", header=None, names=["minutes_since", "rain_mm"]
+        )
     if np.sum(rain["minutes_since"].isnull()) > 0:
         msg = (
             "Timestamp (i.e. minutes from start of year) column contains "
@@ -238,8 +764,59 @@ def load_rain_file_matlab_legacy(file_path):
     return rain[["datetime", "station", "rain_mm"]]
 
 
+def _read_matlab_legacy(file_path, mmap=False):
+    """Read and parse a (legacy Matlab) rainfall file with the fast parser, see
+    :func:`rfactor.rain._parse_matlab_legacy`"""
+    if is_compressed(file_path):
+        with open_rain_file(file_path) as stream:
+            return _parse_matlab_legacy(stream.read())
+    if not mmap:
+        return _parse_matlab_legacy(file_path.read_bytes())
+    if file_path.stat().st_size == 0:
+        return None, None
+    with open(file_path, "rb") as rain_file:
+        with mmap_module.mmap(
+            rain_file.fileno(), 0, access=mmap_module.ACCESS_READ
+        ) as buffer:
+            minutes, rain = _parse_matlab_legacy(buffer)
+    return minutes, rain
+
+
+# interpolation methods depending on the adjacent non-NaN values only
+LOCAL_INTERPOLATION = ("pad", "linear", "index", "values", "nearest", "zero", "slinear")
+
+
+def _remove_long_gaps(rain, interval):
+    """Mask of the records outside runs of more than ``interval`` NaN-values
+
+    Parameters
+    ----------
+    rain : numpy.ndarray
+        Rain values.
+    interval : float
+        Maximal number of consecutive NaN-values.
+
+    Returns
+    -------
+    keep : numpy.ndarray
+        Boolean mask, False for the records in runs of NaN-values which are longer
+        than the interval.
+    """
+    is_nan = np.isnan(rain)
+    # run length encoding of the NaN/non-NaN runs
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(is_nan)) + 1))
+    lengths = np.diff(np.append(starts, len(rain)))
+    long_gap = is_nan[starts] & (lengths > interval)
+    return ~np.repeat(long_gap, lengths)
+
+
 def load_rain_file_flanders(
-    file_path, interpolate=None, interval=np.inf, threshold_outliers=None
+    file_path,
+    interpolate=None,
+    interval=np.inf,
+    threshold_outliers=None,
+    datetime_format=None,
+    chunksize=None,
 ):
     """Example load functions developed in context of Flanders.
 
@@ -269,6 +846,17 @@ def load_rain_file_flanders(
     threshold_outliers: int, default None
         Set rainfall values above this threshold to NaN.
 
+    datetime_format: str, default None
+        Format of the datetime column, e.g. ``"%Y-%m-%d %H:%M:%S"``. If None, the
+        format is derived from the first datetime value, as done by
+        :func:`pandas.to_datetime`, and applied to all values.
+
+    chunksize: int, default None
+        Read and process the file in chunks of ``chunksize`` records, only keeping
+        the non-zero rain records of each chunk in memory. Provides the same output
+        as reading the complete file, but only supports the interpolation methods
+        which depend on the adjacent non-NaN values, see ``LOCAL_INTERPOLATION``.
+
 
     Returns
     -------
@@ -295,13 +883,17 @@ def load_rain_file_flanders(
         2024-01-01 01:10:00
 
     """
-    df = pd.read_csv(
-        file_path,
-        sep="\t",
-        header=None,
-        names=["datetime", "rain_mm"],
-        na_values=["---", ""],
-    )
+    if chunksize is not None:
+        return _load_rain_file_flanders_chunks(
+            file_path,
+            interpolate,
+            interval,
+            threshold_outliers,
+            datetime_format,
+            chunksize,
+        )
+    with open_rain_file(file_path) as stream:
+        df = _read_flanders(stream)
 
     if not {"datetime", "rain_mm"}.issubset(df.columns):
         msg = (
@@ -310,33 +902,78 @@ def load_rain_file_flanders(
         )
         raise KeyError(msg)
 
-    df["datetime"] = pd.to_datetime(df["datetime"])
+    df, _ = _sanitize_flanders(df, file_path, threshold_outliers, datetime_format)
+
+    # Short-period Nan values are interpolated
+    if interpolate:
+        df = _interpolate_flanders(df, interpolate, interval)
+
+    return _remove_dry_flanders(df)
+
+
+def _read_flanders(stream, chunksize=None):
+    """Read a (chunked) Flanders rainfall file, see
+    :func:`rfactor.rain.load_rain_file_flanders`"""
+    return pd.read_csv(
+        stream,
+        sep="\t",
+        header=None,
+        names=["datetime", "rain_mm"],
+        na_values=["---", ""],
+        chunksize=chunksize,
+    )
+
+
+def _read_flanders_chunks(file_path, chunksize):
+    """Chunks of a Flanders rainfall file, see
+    :func:`rfactor.rain.load_rain_file_flanders`"""
+    with open_rain_file(file_path) as stream:
+        with _read_flanders(stream, chunksize) as reader:
+            yield from reader
+
+
+def _sanitize_flanders(df, file_path, threshold_outliers, datetime_format):
+    """Parse the datetime, add the station and set the rain outliers to NaN, see
+    :func:`rfactor.rain.load_rain_file_flanders`"""
+    if datetime_format is None:
+        first = next(
+            (value for value in df["datetime"] if isinstance(value, str)), None
+        )
+        if first is not None:
+            datetime_format = guess_datetime_format(first)
+    df["datetime"] = pd.to_datetime(df["datetime"], format=datetime_format)
     station, year = _extract_metadata_from_file_path(file_path)
     df["station"] = station
 
     # Sanitize rain outliers (negative values and values beyond threshold)
-    df.loc[df["rain_mm"] < 0, "rain_mm"] = np.nan
+    rain = df["rain_mm"].to_numpy(dtype=np.float64)
+    outliers = rain < 0
     if threshold_outliers:
-        df.loc[df["rain_mm"] > threshold_outliers, "rain_mm"] = np.nan
+        outliers |= rain > threshold_outliers
+    df["rain_mm"] = np.where(outliers, np.nan, rain)
+    return df, datetime_format
+
+
+def _interpolate_flanders(df, interpolate, interval):
+    """Remove the long NaN-gaps and interpolate the other NaN-values, see
+    :func:`rfactor.rain.load_rain_file_flanders`"""
+    # Remove consecutive NaN-values that are longer than the interval
+    df = df[_remove_long_gaps(df["rain_mm"].to_numpy(), interval)]
+    # Interpolate the remaining NaN-values
+    if interpolate == "pad":
+        # interpolation method 'pad' was removed from version pandas >3.0.0 but
+        # behaviour of 'pad' is the same as pandas.DataFrame.ffill
+        df["rain_mm"] = df["rain_mm"].ffill()
+    else:
+        df["rain_mm"] = df["rain_mm"].interpolate(
+            method=interpolate, limit_area="inside"
+        )
+    return df
 
-    # Short-period Nan values are interpolated
-    if interpolate:
-        # Remove consecutive NaN-values that are longer than the interval
-        is_nan = df["rain_mm"].isna()
-        group = (is_nan != is_nan.shift()).cumsum()
-        df_temp = df[is_nan].groupby(group[is_nan]).transform("size") > interval
-        indices_to_remove = df_temp[df_temp].index
-        df = df.drop(index=indices_to_remove)
-        # Interpolate the remaining NaN-values
-        if interpolate == "pad":
-            # interpolation method 'pad' was removed from version pandas >3.0.0 but
-            # behaviour of 'pad' is the same as pandas.DataFrame.ffill
-            df["rain_mm"] = df["rain_mm"].ffill()
-        else:
-            df["rain_mm"] = df["rain_mm"].interpolate(
-                method=interpolate, limit_area="inside"
-            )
 
+def _remove_dry_flanders(df):
+    """Remove the zero and NaN-values, see
+    :func:`rfactor.rain.load_rain_file_flanders`"""
     # remove 0 values
     df = df[df["rain_mm"] > 0]
     # remove NaN-values
@@ -344,3 +981,334 @@ def load_rain_file_flanders(
     df["rain_mm"] = df["rain_mm"].astype(np.float64)
 
     return df[["datetime", "station", "rain_mm"]]
+
+
+def _load_rain_file_flanders_chunks(
+    file_path, interpolate, interval, threshold_outliers, datetime_format, chunksize
+):
+    """Load a Flanders rainfall file in chunks, see
+    :func:`rfactor.rain.load_rain_file_flanders`
+
+    The records up to the last non-NaN record of a chunk are processed, the
+    trailing NaN-records are processed together with the next chunk. The last
+    processed non-NaN record is kept as well, as the interpolation of the
+    following NaN-values depends on it. The records of a NaN-gap which is
+    longer than ``interval`` are removed as soon as the gap exceeds the interval.
+    """
+    if interpolate and interpolate not in LOCAL_INTERPOLATION:
+        raise ValueError(
+            f"Interpolation method '{interpolate}' is not supported when reading "
+            f"in chunks, use one of {LOCAL_INTERPOLATION}."
+        )
+    parts = []
+    # last processed non-NaN record and the NaN-records following it
+    previous, pending, long_gap = None, None, False
+    for chunk in _read_flanders_chunks(file_path, chunksize):
+        chunk, datetime_format = _sanitize_flanders(
+            chunk, file_path, threshold_outliers, datetime_format
+        )
+        if not interpolate:
+            parts.append(_remove_dry_flanders(chunk))
+            continue
+
+        if long_gap:
+            # records of the removed gap are skipped
+            valid = np.flatnonzero(chunk["rain_mm"].notna())
+            if len(valid) == 0:
+                continue
+            chunk, long_gap = chunk.iloc[valid[0] :], False
+        block = pd.concat(
+            [df for df in (previous, pending, chunk) if df is not None and len(df)]
+        )
+        valid = np.flatnonzero(block["rain_mm"].notna())
+        if len(valid):
+            df = _interpolate_flanders(
+                block.iloc[: valid[-1] + 1], interpolate, interval
+            )
+            # the previous record is already processed
+            start = 0 if previous is None else 1
+            parts.append(_remove_dry_flanders(df.iloc[start:]))
+            previous = block.iloc[valid[-1] : valid[-1] + 1]
+            pending = block.iloc[valid[-1] + 1 :]
+        else:
+            pending = block
+        if len(pending) > interval:
+            pending, long_gap = None, True
+
+    if interpolate and pending is not None and len(pending):
+        block = pd.concat([df for df in (previous, pending) if df is not None])
+        df = _interpolate_flanders(block, interpolate, interval)
+        start = 0 if previous is None else 1
+        parts.append(_remove_dry_flanders(df.iloc[start:]))
+    return pd.concat(parts)
+
+
+# version of the binary rain store layout, see rfactor.rain.write_rain_store
+RAIN_STORE_VERSION = 1
+RAIN_STORE_DATA = "rain.bin"
+RAIN_STORE_INDEX = "index.json"
+NS_PER_MINUTE = 60_000_000_000
+
+
+def _year_start(year):
+    """Start of the year as int64 nanoseconds"""
+    return np.datetime64(f"{int(year):04d}-01-01", "ns").astype(np.int64)
+
+
+def _rain_store_blocks(rain):
+    """Minutes since the start of the year (int32) and rain (float32) of each
+    station/year combination of the rainfall data"""
+    if not {"station", "rain_mm", "datetime"}.issubset(rain.columns):
+        raise KeyError(
+            "DataFrame should contain 'datetime', 'rain_mm' and 'station' columns."
+        )
+    rain_mm = rain["rain_mm"].to_numpy(dtype=np.float32)
+    if not np.all(rain_mm != 0) or np.isnan(rain_mm).any():
+        raise ValueError(
+            "Can only store non-zero/non-NULL timeseries. Please remove/interpolate"
+            " zero and/or NULL-values in input 'rain_mm' column."
+        )
+    timestamps = rain["datetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    groups = rain.groupby(
+        [rain["station"], rain["datetime"].dt.year], sort=False, observed=True
+    ).indices
+    for (station, year), positions in groups.items():
+        minutes, remainder = np.divmod(
+            timestamps[positions] - _year_start(year), NS_PER_MINUTE
+        )
+        if remainder.any():
+            raise ValueError(
+                f"The rain store requires whole minutes, station '{station}' has "
+                f"records in {year} with a (sub)second component."
+            )
+        yield str(station), int(year), minutes.astype(np.int32), rain_mm[positions]
+
+
+def write_rain_store(rain, store_path):
+    """Write rainfall data to a memory mapped binary rain store
+
+    The rain store is a folder with a single binary file (``rain.bin``) and an
+    index (``index.json``). For each station/year combination, the binary file
+    contains a contiguous block with the minutes since the start of the year
+    (int32) of the records, followed by their rain (float32). The index contains
+    the *station*, *year*, *offset* (position of the block in the binary file, in
+    4-byte items) and *length* (number of records) of each block. This requires 8
+    bytes per record, so the rainfall data of a full network can be mapped in
+    memory instead of loaded, see :func:`rfactor.rain.load_rain_store`.
+
+    Parameters
+    ----------
+    rain : pandas.DataFrame or Iterable of pandas.DataFrame
+        Rainfall data with the *datetime*, *station* and *rain_mm* columns, e.g.
+        the output of a load function, see :func:`rfactor.rain.load_rain_folder`.
+        An iterable (e.g. :func:`rfactor.rain.iter_rain_folder`) is written part
+        by part, so the rainfall data does not need to fit in memory. Each
+        station/year combination should be part of a single part. The records are
+        stored in whole minutes and non-zero/non-NULL rain.
+    store_path : pathlib.Path
+        Folder of the rain store, created if it does not exist. An existing rain
+        store is overwritten.
+
+    Returns
+    -------
+    store : rfactor.rain.RainStore
+        The written rain store.
+
+    Notes
+    -----
+    The rain is stored as float32. The erosivity of the rain store is computed in
+    float64, but from the float32 rounded rain depths, see
+    :func:`rfactor.rain.compact_rain`.
+
+    Examples
+    --------
+    ::
+
+        write_rain_store(
+            iter_rain_folder(folder, load_rain_file_matlab_legacy), store_path
+        )
+        erosivity = compute_erosivity(load_rain_store(store_path))
+    """
+    if isinstance(rain, pd.DataFrame):
+        rain = [rain]
+    store_path = Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+
+    index = {"station": [], "year": [], "offset": [], "length": []}
+    keys, offset = set(), 0
+    with open(store_path / RAIN_STORE_DATA, "wb") as data:
+        for part in rain:
+            for station, year, minutes, rain_mm in _rain_store_blocks(part):
+                if (station, year) in keys:
+                    raise ValueError(
+                        f"Station '{station}' and year {year} are part of multiple "
+                        f"parts of the rainfall data."
+                    )
+                keys.add((station, year))
+                data.write(minutes.tobytes())
+                data.write(rain_mm.tobytes())
+                for key, value in zip(index, (station, year, offset, len(minutes))):
+                    index[key].append(value)
+                offset += 2 * len(minutes)
+
+    temporary = store_path / f"{RAIN_STORE_INDEX}.tmp"
+    temporary.write_text(json.dumps({"version": RAIN_STORE_VERSION, **index}))
+    os.replace(temporary, store_path / RAIN_STORE_INDEX)
+    return RainStore(store_path)
+
+
+def load_rain_store(store_path):
+    """Open a rain store, see :func:`rfactor.rain.write_rain_store`
+
+    The binary file is memory mapped, so the rainfall data is only read from disk
+    when accessed and shared with the parallel jobs of
+    :func:`rfactor.rfactor.compute_erosivity` without copying.
+
+    Parameters
+    ----------
+    store_path : pathlib.Path
+        Folder of the rain store.
+
+    Returns
+    -------
+    store : rfactor.rain.RainStore
+    """
+    return RainStore(store_path)
+
+
+def _store_block(data, offset, length):
+    """Minutes since the start of the year and rain of a block of a rain store,
+    as views of the (memory mapped) data"""
+    minutes = data[offset : offset + length]
+    rain_mm = data[offset + length : offset + 2 * length].view(np.float32)
+    return minutes, rain_mm
+
+
+def _store_timestamps(year, minutes):
+    """Timestamps (int64 nanoseconds) of the minutes since the start of the year"""
+    return _year_start(year) + minutes.astype(np.int64) * NS_PER_MINUTE
+
+
+class RainStore:
+    """Memory mapped binary rain store, see :func:`rfactor.rain.write_rain_store`
+
+    Parameters
+    ----------
+    store_path : pathlib.Path
+        Folder of the rain store.
+
+    Attributes
+    ----------
+    index : pandas.DataFrame
+        The *station*, *year*, *offset* and *length* of each station/year
+        combination, ordered by station and year.
+    data : numpy.memmap
+        The (read-only) memory mapped binary file of the rain store.
+
+    Examples
+    --------
+    ::
+
+        store = load_rain_store(store_path)
+        minutes, rain_mm = store.arrays("KMI_6414", 2004)
+        rain = store.get("KMI_6414", 2004)
+    """
+
+    def __init__(self, store_path):
+        self.store_path = Path(store_path)
+        content = json.loads((self.store_path / RAIN_STORE_INDEX).read_text())
+        if content.get("version") != RAIN_STORE_VERSION:
+            raise ValueError(
+                f"Rain store version {content.get('version')} not supported, write "
+                f"the rain store again."
+            )
+        index = pd.DataFrame(
+            {key: content[key] for key in ["station", "year", "offset", "length"]}
+        )
+        self.index = index.astype(
+            {"station": str, "year": np.int64, "offset": np.int64, "length": np.int64}
+        ).sort_values(["station", "year"], ignore_index=True)
+        self._offsets = self.index["offset"].to_numpy()
+        self._lengths = self.index["length"].to_numpy()
+        self._positions = {
+            key: idx
+            for idx, key in enumerate(zip(self.index["station"], self.index["year"]))
+        }
+        data_path = self.store_path / RAIN_STORE_DATA
+        if data_path.stat().st_size:
+            self.data = np.memmap(data_path, dtype=np.int32, mode="r")
+        else:
+            # empty files can not be memory mapped
+            self.data = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def arrays(self, station, year):
+        """Records of a station/year combination, without copying the data
+
+        Parameters
+        ----------
+        station : str
+        year : int
+
+        Returns
+        -------
+        minutes : numpy.ndarray
+            Minutes since the start of the year (int32) of the records.
+        rain_mm : numpy.ndarray
+            Rain (float32, mm) of the records.
+        """
+        if (station, year) not in self._positions:
+            raise KeyError(f"Station '{station}' and year {year} not in rain store.")
+        idx = self._positions[(station, year)]
+        return _store_block(self.data, self._offsets[idx], self._lengths[idx])
+
+    def get(self, station, year):
+        """Rainfall data of a station/year combination
+
+        Parameters
+        ----------
+        station : str
+        year : int
+
+        Returns
+        -------
+        rain : pandas.DataFrame
+            Rainfall data with the *datetime*, *station* and *rain_mm* (float32)
+            columns, see :func:`rfactor.rain.load_rain_file`.
+        """
+        minutes, rain_mm = self.arrays(station, year)
+        return pd.DataFrame(
+            {
+                "datetime": _store_timestamps(year, minutes).view("datetime64[ns]"),
+                "station": pd.Series(station, index=range(len(minutes)), dtype=str),
+                "rain_mm": np.array(rain_mm),
+            }
+        )
+
+    def to_frame(self):
+        """Rainfall data of all station/year combinations
+
+        Returns
+        -------
+        rain : pandas.DataFrame
+            Rainfall data with the *datetime*, *station* and *rain_mm* (float32)
+            columns, ordered by station and year.
+        """
+        parts = [
+            self.get(station, year)
+            for station, year in zip(self.index["station"], self.index["year"])
+        ]
+        if not parts:
+            return pd.DataFrame(
+                {
+                    "datetime": np.zeros(0, dtype="datetime64[ns]"),
+                    "station": pd.Series([], dtype=str),
+                    "rain_mm": np.zeros(0, dtype=np.float32),
+                }
+            )
+        return pd.concat(parts, ignore_index=True)
@@ -1,10 +1,13 @@
-import multiprocessing as mp
 import warnings
 from functools import partial
+from itertools import product
 
 import numpy as np
 import pandas as pd
-from joblib import Parallel, delayed
+
+from rfactor import jit
+from rfactor.parallel import run_batched, run_lazy
+from rfactor.rain import RainStore, _store_block, _store_timestamps
 
 TIME_BETWEEN_EVENTS = "6 hours"
 MIN_CUMUL_EVENT = 1.27
@@ -22,7 +25,49 @@ class RFactorTypeError(Exception):
     """Raise when input data data type of a data column is wrong."""
 
 
-def rain_energy_verstraeten2006(rain):
+def segment_energy_method(energy_method):
+    """Mark an energy method as segment reduction of all events at once
+
+    By default, the energy method of :func:`rfactor.rfactor.compute_erosivity` is
+    called for each event separately with the rain of the event records and returns
+    the energy of the event (scalar). An energy method marked with this decorator
+    is called once with the rain of all records and the position of the first
+    record of each event and returns the energy of each event, e.g.:
+
+    ::
+
+        @segment_energy_method
+        def rain_energy(rain, offsets):
+            return np.add.reduceat(0.29 * rain, offsets)
+
+    Parameters
+    ----------
+    energy_method : Callable
+        Function with signature ``energy_method(rain, offsets)`` with ``rain``
+        (numpy.ndarray) the rain (mm) of all records and ``offsets``
+        (numpy.ndarray) the position of the first record of each event, returning
+        a numpy.ndarray with the energy of each event.
+
+    Returns
+    -------
+    energy_method : Callable
+        Marked energy method.
+    """
+    energy_method.segment_reduction = True
+    return energy_method
+
+
+def _sum_events(values, offsets=None):
+    """Sum of all values or, if ``offsets`` is given, of the values of each event"""
+    if offsets is None:
+        return values.sum()
+    if len(offsets) == 0:
+        return np.zeros(0)
+    return np.add.reduceat(values, offsets)
+
+
+@segment_energy_method
+def rain_energy_verstraeten2006(rain, offsets=None):
     """Calculate rain energy per unit depth according to Salles/Verstraeten with 10
     minute interval data.
 
@@ -33,11 +78,15 @@ def rain_energy_verstraeten2006(rain):
     ----------
     rain : numpy.ndarray
         Rain (mm)
+    offsets : numpy.ndarray, default None
+        Position of the first record of each event in ``rain``. If given, the
+        energy is returned for each event, see
+        :func:`rfactor.rfactor.segment_energy_method`.
 
     Returns
     -------
-    energy : float
-        Energy per unit depth.
+    energy : float or numpy.ndarray
+        Energy per unit depth (of each event if ``offsets`` is given).
 
     Notes
     -----
@@ -71,10 +120,11 @@ def rain_energy_verstraeten2006(rain):
         erosion rates. Journal Geophysysical Research, 111, D22109.
     """
     rain_energy = 0.1112 * ((rain * 6.0) ** 0.31) * rain
-    return rain_energy.sum()
+    return _sum_events(rain_energy, offsets)
 
 
-def rain_energy_brown_and_foster1987(rain):
+@segment_energy_method
+def rain_energy_brown_and_foster1987(rain, offsets=None):
     """Calculate rain energy per unit depth according to Brown and Foster.
 
     Brown and Foster is applied considering a 10-minute interval input rainfall data
@@ -84,11 +134,15 @@ def rain_energy_brown_and_foster1987(rain):
     ----------
     rain : numpy.ndarray
         Rain (mm)
+    offsets : numpy.ndarray, default None
+        Position of the first record of each event in ``rain``. If given, the
+        energy is returned for each event, see
+        :func:`rfactor.rfactor.segment_energy_method`.
 
     Returns
     -------
-    energy : float
-        Energy per unit depth.
+    energy : float or numpy.ndarray
+        Energy per unit depth (of each event if ``offsets`` is given).
 
     Notes
     -----
@@ -121,10 +175,11 @@ def rain_energy_brown_and_foster1987(rain):
         https://www.ars.usda.gov/ARSUserFiles/64080530/RUSLE/AH_703.pdf
     """
     rain_energy = 0.29 * (1 - 0.72 * np.exp(-0.05 * rain * 6)) * rain
-    return rain_energy.sum()
+    return _sum_events(rain_energy, offsets)
 
 
-def rain_energy_mcgregor1995(rain):
+@segment_energy_method
+def rain_energy_mcgregor1995(rain, offsets=None):
     """Calculate rain energy per unit depth according to McGregor with 10
     minute interval data.
 
@@ -135,11 +190,15 @@ def rain_energy_mcgregor1995(rain):
     ----------
     rain : numpy.ndarray
         Rain (mm)
+    offsets : numpy.ndarray, default None
+        Position of the first record of each event in ``rain``. If given, the
+        energy is returned for each event, see
+        :func:`rfactor.rfactor.segment_energy_method`.
 
     Returns
     -------
-    energy : float
-        Energy per unit depth.
+    energy : float or numpy.ndarray
+        Energy per unit depth (of each event if ``offsets`` is given).
 
     Notes
     -----
@@ -167,7 +226,114 @@ def rain_energy_mcgregor1995(rain):
 
     """
     rain_energy = 0.29 * (1 - 0.72 * np.exp(-0.08 * rain * 6)) * rain
-    return rain_energy.sum()
+    return _sum_events(rain_energy, offsets)
+
+
+# built-in energy methods, providing the energy of a single event if no offsets
+_BUILTIN_ENERGY_METHODS = (
+    rain_energy_verstraeten2006,
+    rain_energy_brown_and_foster1987,
+    rain_energy_mcgregor1995,
+)
+
+
+def _minutes_since_start_year(df):
+    """Minutes since the start of the year for the Matlab intensity methods
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame with rainfall time series, see
+        :func:`rfactor.rfactor.maximum_intensity_matlab_clone`.
+
+    Returns
+    -------
+    minutes_since : numpy.ndarray
+        Minutes since the start of the year (float).
+    """
+    if np.isnan(df["rain_mm"]).any():
+        raise Exception(
+            "Matlab intensity method does not support Nan values in rain" "time series."
+        )
+
+    current_year = df["datetime"].dt.year.unique()
+    if not len(current_year) == 1:
+        raise RFactorInputError("Data should all be in the same year.")
+
+    return (
+        df["datetime"] - pd.Timestamp(f"{current_year[0]}-01-01")
+    ).dt.total_seconds().values / 60
+
+
+def _maximum_intensity_matlab_events(minutes, rain, rain_cum, offsets, clone=False):
+    """Maximum 30-min rain intensity of each event according to the Matlab
+    implementation.
+
+    For every record, the rain of the 30 minutes starting at the record is derived
+    by linearly interpolating the cumulative event rain 20 minutes after the record.
+    All interpolations of all events are evaluated at once, restricting each
+    interpolation to the records of its own event. The interpolation applies the
+    same arithmetic as :func:`numpy.interp`, providing the same output as the
+    original loop over the records of each event.
+
+    Parameters
+    ----------
+    minutes : numpy.ndarray
+        Minutes since the start of the year, sorted.
+    rain : numpy.ndarray
+        Rain (mm). No NaN or 0-values allowed
+    rain_cum : numpy.ndarray
+        Cumulative rain of the event (mm)
+    offsets : numpy.ndarray
+        Position of the first record of each event.
+    clone : bool, default False
+        Use the original Matlab handling of events shorter than 30 minutes, see
+        :func:`rfactor.rfactor.maximum_intensity_matlab_clone`, instead of the
+        fixed version of :func:`rfactor.rfactor.maximum_intensity_interpolate`.
+
+    Returns
+    -------
+    maxprecip_30min : numpy.ndarray
+        Maximal 30-minute intensity of each event (in mm/h).
+    """
+    if np.isnan(rain).any():
+        raise Exception(
+            "Matlab intensity method does not support Nan values in rain" "time series."
+        )
+    if len(offsets) == 0:
+        return np.zeros(0)
+
+    stops = np.append(offsets[1:], len(rain))
+    lengths = stops - offsets
+    last = np.repeat(stops - 1, lengths)
+
+    # position j of the interpolation interval [j, j + 1] within the event
+    eind_30min = minutes + 20
+    j = np.minimum(np.searchsorted(minutes, eind_30min, side="right") - 1, last)
+    at_node = (j == last) | (minutes[j] == eind_30min)
+    j_next = np.where(at_node, j, j + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (rain_cum[j_next] - rain_cum[j]) / (minutes[j_next] - minutes[j])
+        eind_rain = np.where(
+            at_node, rain_cum[j], slope * (eind_30min - minutes[j]) + rain_cum[j]
+        )
+    precip_30min = eind_rain - (rain_cum - rain)
+
+    # events shorter than 30 minutes
+    duration = minutes[stops - 1] - minutes[offsets]
+    if clone:
+        maxprecip_30min = np.where(duration <= 30, rain[offsets] * 2, 0.0)
+    else:
+        # sum the rain in the same order as numpy.sum, which is a sequential sum
+        # (as bincount) for less than 8 values
+        short = duration < 30
+        event_ids = np.repeat(np.arange(len(offsets)), lengths)
+        event_rain = np.bincount(event_ids, weights=rain, minlength=len(offsets))
+        for idx in np.flatnonzero(short & (lengths >= 8)):
+            event_rain[idx] = np.sum(rain[offsets[idx] : stops[idx]])
+        maxprecip_30min = np.where(short, event_rain, 0.0)
+
+    return np.maximum(maxprecip_30min, np.maximum.reduceat(precip_30min, offsets)) * 2
 
 
 def maximum_intensity_matlab_clone(df):
@@ -199,39 +365,14 @@ def maximum_intensity_matlab_clone(df):
         "or "
         "'maximum_intensity_interpolate'.)"
     )
-    if np.isnan(df["rain_mm"]).any():
-        raise Exception(
-            "Matlab intensity method does not support Nan values in rain" "time series."
-        )
-
-    current_year = df["datetime"].dt.year.unique()
-    if not len(current_year) == 1:
-        raise RFactorInputError("Data should all be in the same year.")
-
-    df["minutes_since"] = (
-        df["datetime"] - pd.Timestamp(f"{current_year[0]}-01-01")
-    ).dt.total_seconds().values / 60
-
-    timestamps = df["minutes_since"].values
-    rain = df["rain_mm"].values
-    rain_cum = df["event_rain_cum"].values
-
-    maxprecip_30min = 0.0
-
-    if timestamps[-1] - timestamps[0] <= 30:
-        maxprecip_30min = rain[0] * 2  # *2 to mimick matlab
-
-    for idx in range(len(df)):
-        eind_30min = timestamps[idx] + 20
-        begin_rain = rain_cum[idx] - rain[idx]
-
-        eind_rain = np.interp(eind_30min, timestamps, rain_cum)
-        precip_30min = eind_rain - begin_rain
-
-        if precip_30min > maxprecip_30min:
-            maxprecip_30min = precip_30min
-
-    return maxprecip_30min * 2
+    maxprecip_30min = _maximum_intensity_matlab_events(
+        _minutes_since_start_year(df),
+        df["rain_mm"].to_numpy(dtype=np.float64),
+        df["event_rain_cum"].to_numpy(dtype=np.float64),
+        np.zeros(1, dtype=np.int64),
+        clone=True,
+    )
+    return maxprecip_30min[0]
 
 
 def maximum_intensity_interpolate(df):
@@ -266,39 +407,13 @@ def maximum_intensity_interpolate(df):
     The Python and original Matlab implementation linearly interpolate zero and
     NaN-values within one event.
     """
-    if np.isnan(df["rain_mm"]).any():
-        raise Exception(
-            "Matlab intensity method does not support Nan values in rain" "time series."
-        )
-
-    current_year = df["datetime"].dt.year.unique()
-    if not len(current_year) == 1:
-        raise RFactorInputError("Data should all be in the same year.")
-
-    df["minutes_since"] = (
-        df["datetime"] - pd.Timestamp(f"{current_year[0]}-01-01")
-    ).dt.total_seconds().values / 60
-
-    timestamps = df["minutes_since"].values
-    rain = df["rain_mm"].values
-    rain_cum = df["event_rain_cum"].values
-
-    maxprecip_30min = 0.0
-
-    if timestamps[-1] - timestamps[0] < 30:
-        maxprecip_30min = np.sum(rain)
-
-    for idx in range(len(df)):
-        eind_30min = timestamps[idx] + 20
-        begin_rain = rain_cum[idx] - rain[idx]
-
-        eind_rain = np.interp(eind_30min, timestamps, rain_cum)
-        precip_30min = eind_rain - begin_rain
-
-        if precip_30min > maxprecip_30min:
-            maxprecip_30min = precip_30min
-
-    return maxprecip_30min * 2
+    maxprecip_30min = _maximum_intensity_matlab_events(
+        _minutes_since_start_year(df),
+        df["rain_mm"].to_numpy(dtype=np.float64),
+        df["event_rain_cum"].to_numpy(dtype=np.float64),
+        np.zeros(1, dtype=np.int64),
+    )
+    return maxprecip_30min[0]
 
 
 def maximum_intensity(df):
@@ -320,19 +435,130 @@ def maximum_intensity(df):
     maxprecip_30min : float
         Maximal 30-minute intensity during event (in mm/h).
 
+    Notes
+    -----
+    :func:`rfactor.rfactor.compute_erosivity` derives the intensity of all events
+    of a station-year at once, see :func:`rfactor.rfactor.maximum_intensity_batched`.
     """
     # formula requires mm/hr, intensity is derived on half an hour
     return df.rolling("30min", on="datetime")["rain_mm"].sum().max() * 2
 
 
-def _compute_erosivity(
+def _maximum_intensity_events(timestamps, rain, offsets):
+    """Maximum 30-min rain intensity of each event with the rolling window of
+    :func:`rfactor.rfactor.maximum_intensity`, evaluated on all events at once.
+
+    Parameters
+    ----------
+    timestamps : numpy.ndarray
+        Timestamps of the rain records as int64 nanoseconds, sorted within each
+        event.
+    rain : numpy.ndarray
+        Rain (mm)
+    offsets : numpy.ndarray
+        Position of the first record of each event.
+
+    Returns
+    -------
+    maxprecip_30min : numpy.ndarray
+        Maximal 30-minute intensity of each event (in mm/h).
+    """
+    if len(offsets) == 0:
+        return np.zeros(0)
+    rain = np.asarray(rain, dtype=np.float64)
+    positions = np.arange(len(rain))
+
+    # start of the window (t - 30min, t] of each record, searched for within each
+    # sorted run of timestamps and clamped to the start of the event
+    window_start = np.empty(len(rain), dtype=np.int64)
+    runs = np.concatenate(([0], np.flatnonzero(np.diff(timestamps) < 0) + 1))
+    for start, stop in zip(runs, np.append(runs[1:], len(rain))):
+        run = timestamps[start:stop]
+        window_start[start:stop] = start + np.searchsorted(
+            run, run - pd.Timedelta("30min").value, side="right"
+        )
+    is_start = np.zeros(len(rain), dtype=bool)
+    is_start[offsets] = True
+    event_start = np.maximum.accumulate(np.where(is_start, positions, 0))
+    window_start = np.maximum(window_start, event_start)
+
+    # sum of each window [window_start, position] as a segment reduction
+    is_valid = ~np.isnan(rain)
+    bounds = np.empty(2 * len(rain), dtype=np.int64)
+    bounds[0::2] = window_start
+    bounds[1::2] = positions + 1
+    precip_30min = np.add.reduceat(
+        np.append(np.where(is_valid, rain, 0.0), 0.0), bounds
+    )
+    maxprecip_30min = np.maximum.reduceat(precip_30min[0::2], offsets)
+
+    # events without valid rain values have no intensity
+    maxprecip_30min[np.add.reduceat(is_valid, offsets) == 0] = np.nan
+
+    return maxprecip_30min * 2
+
+
+def maximum_intensity_batched(timestamps, rain=None, event_ids=None):
+    """Maximum rain intensity for 30-min interval of multiple events at once
+    expressed as mm/hour
+
+    Provides the same output as :func:`rfactor.rfactor.maximum_intensity` for each
+    event, but derives the rolling 30-min sums of all events of a station-year (or
+    full data set) in a single pass. The window of each record is searched in the
+    sorted timestamps and clamped to the start of its event.
+
+    Parameters
+    ----------
+    timestamps : numpy.ndarray or pandas.Series or pandas.DataFrame
+        Timestamps (datetime64) of the rain records, sorted within each event.
+        When a DataFrame is provided, the columns *datetime* and *rain_mm* are used
+        as a single event (as :func:`rfactor.rfactor.maximum_intensity`).
+    rain : numpy.ndarray or pandas.Series
+        Rain in mm
+    event_ids : numpy.ndarray or pandas.Series, default None
+        Event identifier of each record. The records of an event need to be
+        consecutive. If None, all records are considered a single event.
+
+    Returns
+    -------
+    maxprecip_30min : numpy.ndarray or float
+        Maximal 30-minute intensity of each event (in mm/h), in order of the
+        events. A single float when a DataFrame is provided.
+
+    Notes
+    -----
+    When used as ``intensity_method`` in :func:`rfactor.rfactor.compute_erosivity`,
+    the events of each station-year are processed at once.
+    """
+    if isinstance(timestamps, pd.DataFrame):
+        return maximum_intensity_batched(timestamps["datetime"], timestamps["rain_mm"])[
+            0
+        ]
+
+    timestamps = np.asarray(timestamps, dtype="datetime64[ns]").view(np.int64)
+    rain = np.asarray(rain, dtype=np.float64)
+    if event_ids is None:
+        offsets = np.zeros(min(len(rain), 1), dtype=np.int64)
+    else:
+        event_ids = np.asarray(event_ids)
+        offsets = np.flatnonzero(
+            np.concatenate(([True], event_ids[1:] != event_ids[:-1]))
+        )
+    return _maximum_intensity_events(timestamps, rain, offsets)
+
+
+def _compute_erosivity_pandas(
     rain,
     energy_method,
     intensity_method,
     event_split=TIME_BETWEEN_EVENTS,
     event_threshold=MIN_CUMUL_EVENT,
 ):
-    """Calculate erosivity for a single year/station combination
+    """Calculate erosivity for a single year/station combination (pandas reference)
+
+    Reference implementation deriving the events with pandas groupby operations. The
+    default engine is :func:`rfactor.rfactor._compute_erosivity`, which provides the
+    same output.
 
     Parameters
     ----------
@@ -379,7 +605,12 @@ def _compute_erosivity(
     # add cumulative rain for each event
     rain = rain.assign(event_rain_cum=rain.groupby("event_idx")["rain_mm"].cumsum())
 
-    # add rain energy for each event
+    # add rain energy for each event, the built-in energy methods are called on
+    # the records of each event (independent of the segment reduction)
+    if energy_method not in _BUILTIN_ENERGY_METHODS and getattr(
+        energy_method, "segment_reduction", False
+    ):
+        energy_method = partial(_energy_single_event, energy_method)
     rain = rain.assign(
         event_energy=rain.groupby("event_idx")["rain_mm"].transform(energy_method)
     )
@@ -423,55 +654,576 @@ def _compute_erosivity(
     return events
 
 
-def _apply_rfactor(name, group, energy_method, intensity_method):
-    """Wrapper helper function for parallel execution of erosivity on groups"""
-    df = _compute_erosivity(group, energy_method, intensity_method)
-    df[["station", "year"]] = name
-    return df
+def _event_offsets(timestamps, event_split=TIME_BETWEEN_EVENTS):
+    """Derive the start of each rain event from the time gaps between records
 
+    Parameters
+    ----------
+    timestamps : numpy.ndarray
+        Timestamps of the rain records as int64 nanoseconds.
+    event_split : str
+        Time interval to split into individual rain events
 
-def compute_erosivity(
+    Returns
+    -------
+    offsets : numpy.ndarray
+        Position (int64) of the first record of each event.
+    """
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+    gaps = np.diff(timestamps) >= pd.Timedelta(event_split).value
+    return np.concatenate(([0], np.flatnonzero(gaps) + 1)).astype(np.int64)
+
+
+def _event_cumsum(rain, offsets):
+    """Cumulative rain restarting at each event start
+
+    Uses the (compensated) cumulative sum of pandas in a single call on all events,
+    providing the same values as the pandas reference engine.
+    """
+    event_ids = np.repeat(
+        np.arange(len(offsets)), np.diff(np.append(offsets, len(rain)))
+    )
+    return pd.Series(rain).groupby(event_ids).cumsum().to_numpy()
+
+
+def _energy_single_event(energy_method, rain):
+    """Adapter calling a segment ``energy_method`` on the records of a single event"""
+    return energy_method(np.asarray(rain), np.zeros(1, dtype=np.int64))[0]
+
+
+def _energy_per_event(energy_method, rain, offsets):
+    """Adapter calling a scalar ``energy_method`` on the records of each event"""
+    return np.array(
+        [energy_method(event) for event in np.split(rain, offsets[1:])],
+        dtype=np.float64,
+    )
+
+
+def _event_energy(energy_method, rain, offsets):
+    """Rain energy for each event
+
+    Energy methods marked with :func:`rfactor.rfactor.segment_energy_method` are
+    called once on all records, other energy methods for each event separately.
+    """
+    if getattr(energy_method, "segment_reduction", False):
+        return np.asarray(energy_method(rain, offsets), dtype=np.float64)
+    return _energy_per_event(energy_method, rain, offsets)
+
+
+def _matlab_intensity_events(timestamps, rain, offsets, clone=False):
+    """Matlab intensity methods applied on all events of a single year at once"""
+    if clone:
+        warnings.warn(
+            "This function is no longer supported. Please use 'maximum_intensity' "
+            "or "
+            "'maximum_intensity_interpolate'.)"
+        )
+    if len(offsets) == 0:
+        return np.zeros(0)
+    year = pd.Timestamp(timestamps[0]).year
+    minutes = (timestamps - pd.Timestamp(f"{year}-01-01").value) / 1e9 / 60
+    return _maximum_intensity_matlab_events(
+        minutes, rain, _event_cumsum(rain, offsets), offsets, clone=clone
+    )
+
+
+# intensity methods with an implementation on all events at once
+_EVENT_INTENSITY_METHODS = {
+    maximum_intensity: _maximum_intensity_events,
+    maximum_intensity_batched: _maximum_intensity_events,
+    maximum_intensity_interpolate: _matlab_intensity_events,
+    maximum_intensity_matlab_clone: partial(_matlab_intensity_events, clone=True),
+}
+
+
+def _event_intensity(intensity_method, timestamps, rain, offsets):
+    """Maximal 30-min intensity for each event, calling ``intensity_method`` on
+    a DataFrame with the event records"""
+    if intensity_method in _EVENT_INTENSITY_METHODS:
+        return _EVENT_INTENSITY_METHODS[intensity_method](timestamps, rain, offsets)
+
+    records = pd.DataFrame(
+        {
+            "datetime": timestamps.view("datetime64[ns]"),
+            "rain_mm": rain,
+            "event_rain_cum": _event_cumsum(rain, offsets),
+        }
+    )
+    bounds = np.append(offsets, len(rain))
+    return np.array(
+        [
+            intensity_method(records.iloc[start:stop])
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ],
+        dtype=np.float64,
+    )
+
+
+def _erosivity_events(
+    timestamps,
     rain,
-    energy_method=rain_energy_verstraeten2006,
-    intensity_method=maximum_intensity,
-    **kwargs,
+    energy_method,
+    intensity_method,
+    event_split=TIME_BETWEEN_EVENTS,
+    event_threshold=MIN_CUMUL_EVENT,
+    engine="numpy",
 ):
-    """Calculate erosivity  for each year/station combination
+    """Calculate erosivity of the rain events from rain record arrays
+
+    Events are derived once from the time gaps between the records, after which the
+    event properties are computed as reductions over the event segments of the
+    arrays.
 
     Parameters
     ----------
-    rain : pandas.DataFrame
+    timestamps : numpy.ndarray
+        Timestamps of the rain records as int64 nanoseconds.
+    rain : numpy.ndarray
+        Rain (mm) of the rain records, no NaN or 0-values allowed.
+    energy_method: Callable
+        Function to compute the rain energy per unit depth
+    intensity_method : Callable
+        Function to derive the maximal rain intensity (over 30min)
+    event_split : str
+        Time interval to split into individual rain events
+    event_threshold : float
+        Minimal cumulative rain of an event to take into account for erosivity
+        derivation event_rain_cum
+    engine : {"numpy", "numba"}
+        Derive the events with numpy array operations or with the compiled loop of
+        :func:`rfactor.jit.erosivity_events_numba`. The latter only supports the
+        methods listed in :func:`rfactor.rfactor._numba_energy_code`.
+
+    Returns
+    -------
+    events : dict of numpy.ndarray
+        Event properties of the events above the ``event_threshold``, see
+        :func:`rfactor.rfactor._compute_erosivity`, with the *event_idx* as event
+        identifier and *first_record* as the position of the first record of the
+        event in ``timestamps``.
+    """
+    if engine == "numba":
+        offsets, event_rain, event_energy, max_intensity = jit.erosivity_events_numba(
+            timestamps,
+            rain,
+            pd.Timedelta(event_split).value,
+            _numba_energy_code(energy_method, intensity_method),
+        )
+        return _event_table(
+            offsets, event_rain, event_energy, max_intensity, event_threshold
+        )
+    return _erosivity_events_methods(
+        timestamps,
+        rain,
+        [energy_method],
+        [intensity_method],
+        event_split,
+        event_threshold,
+    )[0]
+
+
+def _erosivity_events_methods(
+    timestamps,
+    rain,
+    energy_methods,
+    intensity_methods,
+    event_split=TIME_BETWEEN_EVENTS,
+    event_threshold=MIN_CUMUL_EVENT,
+):
+    """Calculate erosivity of the rain events for combinations of methods
+
+    The events and the event rain are derived once, the energy and intensity once
+    for each method. These are combined for each pair of energy and intensity
+    method.
+
+    Parameters
+    ----------
+    timestamps : numpy.ndarray
+        Timestamps of the rain records as int64 nanoseconds.
+    rain : numpy.ndarray
+        Rain (mm) of the rain records, no NaN or 0-values allowed.
+    energy_methods: list of Callable
+        Functions to compute the rain energy per unit depth
+    intensity_methods : list of Callable
+        Functions to derive the maximal rain intensity (over 30min)
+    event_split : str
+        Time interval to split into individual rain events
+    event_threshold : float
+        Minimal cumulative rain of an event to take into account for erosivity
+        derivation event_rain_cum
+
+    Returns
+    -------
+    events : list of dict of numpy.ndarray
+        Event properties for each pair of energy and intensity method (in the
+        order of ``itertools.product(energy_methods, intensity_methods)``), see
+        :func:`rfactor.rfactor._erosivity_events`.
+    """
+    offsets = _event_offsets(timestamps, event_split)
+    event_rain = np.add.reduceat(rain, offsets) if len(offsets) else np.zeros(0)
+    event_energies = [
+        _event_energy(energy_method, rain, offsets) for energy_method in energy_methods
+    ]
+    max_intensities = [
+        _event_intensity(intensity_method, timestamps, rain, offsets)
+        for intensity_method in intensity_methods
+    ]
+    return [
+        _event_table(offsets, event_rain, event_energy, max_intensity, event_threshold)
+        for event_energy, max_intensity in product(event_energies, max_intensities)
+    ]
+
+
+def _event_table(
+    offsets, event_rain, event_energy, max_intensity, event_threshold=MIN_CUMUL_EVENT
+):
+    """Erosivity of the events above the ``event_threshold``, see
+    :func:`rfactor.rfactor._erosivity_events`"""
+    # remove events below threshold after cumulating rain over all events
+    all_event_rain_cum = np.cumsum(event_rain)
+    keep = np.round(event_rain, 2) > event_threshold
+    erosivity = event_energy[keep] * max_intensity[keep]
+
+    return {
+        "event_idx": np.flatnonzero(keep) + 1,
+        "first_record": offsets[keep],
+        "event_rain_cum": event_rain[keep],
+        "max_30min_intensity": max_intensity[keep],
+        "event_energy": event_energy[keep],
+        "erosivity": erosivity,
+        "all_event_rain_cum": all_event_rain_cum[keep],
+        "erosivity_cum": np.cumsum(erosivity),
+    }
+
+
+def _compute_erosivity(
+    rain,
+    energy_method,
+    intensity_method,
+    event_split=TIME_BETWEEN_EVENTS,
+    event_threshold=MIN_CUMUL_EVENT,
+    engine="numpy",
+):
+    """Calculate erosivity for a single year/station combination
+
+    Parameters
+    ----------
+    rain : pd.DataFrame
         DataFrame with rainfall time series. Need to contain the following columns:
 
-        - *datetime* (pandas.Timestamp): Time stamp
+        - *datetime* (pd.Timestamp): Time stamp
         - *rain_mm* (float): Rain in mm
-        - *station* (str): Measurement station identifier
-
-    energy_method: Callable, default rain_energy_per_unit_depth_verstraeten2006
+    energy_method: Callable
         Function to compute the rain energy per unit depth
-    intensity_method : Callable, default maximum_intensity
-        Function to derive the maximal rain intensity (over 30min).
+    intensity_method : Callable
+        Function to derive the maximal rain intensity (over 30min)
+    event_split : str
+        Time interval to split into individual rain events
+    event_threshold : float
+        Minimal cumulative rain of an event to take into account for erosivity
+        derivation event_rain_cum
+    engine : {"numpy", "numba"}
+        See :func:`rfactor.rfactor._erosivity_events`
 
     Returns
     -------
-    all_erosivity: pandas.DataFrame
+    events : pd.DataFrame
         DataFrame with erosivity output for each event.
 
-        - *station** (str)
-        - **year** (int)
-        - **tag** (str): unique tag for year, station-couple.
+        - *datetime* (pd.Timestamp): Time stamp
         - *event_rain_cum* (float): Cumulative rain for each event
-        - *all_events_cum* (float): Cumulative rain over the whole timeseries
         - *max_30min_intensity* (float): Maximal 30min intensity for each event
         - *event_energy* (float): Rain energy per unit depth for each event
         - *erosivity* (float): Erosivity for each event
+        - *all_events_cum* (float): Cumulative rain over all events together
         - *erosivity_cum* (float): Cumulative erosivity over all events together
 
     Notes
     -----
-    1. NaN- and 0-values are removed from the input timeseries.
+    Array based implementation of
+    :func:`rfactor.rfactor._compute_erosivity_pandas`, avoiding the groupby
+    operations on the full rain time series.
+    """
+    if len(rain["datetime"].dt.year.unique()) != 1:  # data of a single year
+        raise RFactorInputError("DataFrame should contain data of a single year.")
+
+    events = _erosivity_events(
+        rain["datetime"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        rain["rain_mm"].to_numpy(dtype=np.float64),
+        energy_method,
+        intensity_method,
+        event_split,
+        event_threshold,
+        engine,
+    )
+    first_record = events.pop("first_record")
+    event_idx = events.pop("event_idx")
+    events = pd.DataFrame(
+        {"datetime": rain["datetime"].to_numpy()[first_record], **events},
+        index=pd.Index(event_idx, name="event_idx"),
+    )
+    return events
+
 
+ENGINES = ("numpy", "numba", "pandas")
+
+
+def _numba_energy_code(energy_method, intensity_method):
+    """Energy equation of the numba engine for the given methods
+
+    The numba engine supports the energy methods
+    :func:`rfactor.rfactor.rain_energy_verstraeten2006`,
+    :func:`rfactor.rfactor.rain_energy_brown_and_foster1987` and
+    :func:`rfactor.rfactor.rain_energy_mcgregor1995` in combination with the
+    intensity methods :func:`rfactor.rfactor.maximum_intensity` and
+    :func:`rfactor.rfactor.maximum_intensity_batched`.
+
+    Returns
+    -------
+    energy_code : int or None
+        Energy equation code of :mod:`rfactor.jit`, None when the combination of
+        methods is not supported.
     """
+    energy_codes = {
+        rain_energy_verstraeten2006: jit.ENERGY_VERSTRAETEN2006,
+        rain_energy_brown_and_foster1987: jit.ENERGY_BROWN_AND_FOSTER1987,
+        rain_energy_mcgregor1995: jit.ENERGY_MCGREGOR1995,
+    }
+    if intensity_method not in (maximum_intensity, maximum_intensity_batched):
+        return None
+    return energy_codes.get(energy_method)
+
+
+def _apply_rfactor(name, group, energy_method, intensity_method, engine="numpy"):
+    """Wrapper helper function for parallel execution of erosivity on groups"""
+    if engine == "pandas":
+        df = _compute_erosivity_pandas(group, energy_method, intensity_method)
+    else:
+        df = _compute_erosivity(group, energy_method, intensity_method, engine=engine)
+    df[["station", "year"]] = name
+    return df
+
+
+def _apply_rfactor_segment(
+    timestamps, rain, offset, length, energy_methods, intensity_methods, engine="numpy"
+):
+    """Wrapper helper function for parallel execution of erosivity on the segment
+    ``offset:offset + length`` of the (shared) rain arrays"""
+    timestamps = np.asarray(timestamps[offset : offset + length])
+    rain = np.asarray(rain[offset : offset + length])
+    return _erosivity_segment(
+        timestamps, rain, energy_methods, intensity_methods, engine
+    )
+
+
+def _apply_rfactor_store_segment(
+    data, offset, length, year, energy_methods, intensity_methods, engine="numpy"
+):
+    """Wrapper helper function for parallel execution of erosivity on the block
+    ``offset:offset + 2 * length`` of the (memory mapped) data of a rain store, see
+    :class:`rfactor.rain.RainStore`"""
+    minutes, rain = _store_block(data, offset, length)
+    return _erosivity_segment(
+        _store_timestamps(year, minutes),
+        rain.astype(np.float64),
+        energy_methods,
+        intensity_methods,
+        engine,
+    )
+
+
+def _erosivity_segment(timestamps, rain, energy_methods, intensity_methods, engine):
+    """Erosivity of the events of a segment for each pair of methods"""
+    if engine == "numba":
+        return [
+            _erosivity_events(
+                timestamps, rain, energy_method, intensity_method, engine=engine
+            )
+            for energy_method, intensity_method in product(
+                energy_methods, intensity_methods
+            )
+        ]
+    return _erosivity_events_methods(
+        timestamps, rain, energy_methods, intensity_methods
+    )
+
+
+def _compute_erosivity_segments(
+    rain,
+    energy_methods,
+    intensity_methods,
+    engine="numpy",
+    n_jobs=None,
+    backend="loky",
+):
+    """Calculate erosivity for each year/station combination from shared arrays
+
+    The timestamps and rain of all station/year combinations are stored once in
+    contiguous arrays, ordered by station and year. The workers only receive the
+    ``(offset, length)`` of their segment and return the event properties as
+    arrays for each pair of energy and intensity method, see
+    :func:`rfactor.rfactor._erosivity_events_methods`. The station, year and
+    datetime of the events are added afterwards, see
+    :func:`rfactor.rfactor._station_year_groups`.
+
+    Parameters
+    ----------
+    rain : pandas.DataFrame
+        DataFrame with rainfall time series, see
+        :func:`rfactor.rfactor.compute_erosivity`, including the *year* column.
+    energy_methods: list of Callable
+        Functions to compute the rain energy per unit depth
+    intensity_methods : list of Callable
+        Functions to derive the maximal rain intensity (over 30min)
+    engine : {"numpy", "numba"}
+        See :func:`rfactor.rfactor._erosivity_events`
+    n_jobs : int, default None
+        See :func:`rfactor.parallel.run_batched`
+    backend : str, default "loky"
+        See :func:`rfactor.parallel.run_batched`
+
+    Returns
+    -------
+    all_events : list of pandas.DataFrame
+        Erosivity output for each event, see
+        :func:`rfactor.rfactor._compute_erosivity`, with *station*, *year* and
+        *tag* columns, for each pair of energy and intensity method (in the order of
+        ``itertools.product(energy_methods, intensity_methods)``).
+    """
+    order, offsets, lengths, keys = _station_year_groups(rain)
+
+    datetimes = rain["datetime"].to_numpy()
+    timestamps = rain["datetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    results = run_batched(
+        partial(
+            _apply_rfactor_segment,
+            energy_methods=energy_methods,
+            intensity_methods=intensity_methods,
+            engine=engine,
+        ),
+        list(zip(offsets.tolist(), lengths.tolist())),
+        lengths.tolist(),
+        n_jobs=n_jobs,
+        backend=backend,
+        shared=(
+            timestamps[order],
+            rain["rain_mm"].to_numpy(dtype=np.float64)[order],
+        ),
+    )
+
+    all_events = []
+    for method_results in zip(*results):
+        first_record = np.concatenate(
+            [
+                offset + result["first_record"]
+                for offset, result in zip(offsets, method_results)
+            ]
+        )
+        all_events.append(
+            _segment_events(method_results, datetimes[order[first_record]], keys)
+        )
+    return all_events
+
+
+def _compute_erosivity_store(
+    store,
+    energy_methods,
+    intensity_methods,
+    engine="numpy",
+    n_jobs=None,
+    backend="loky",
+):
+    """Calculate erosivity for each year/station combination of a rain store
+
+    Equal to :func:`rfactor.rfactor._compute_erosivity_segments`, but the workers
+    read the records of their station/year directly from the memory mapped data
+    of the rain store, see :class:`rfactor.rain.RainStore`.
+
+    Parameters
+    ----------
+    store : rfactor.rain.RainStore
+        Rain store, see :func:`rfactor.rain.write_rain_store`.
+    energy_methods: list of Callable
+        Functions to compute the rain energy per unit depth
+    intensity_methods : list of Callable
+        Functions to derive the maximal rain intensity (over 30min)
+    engine : {"numpy", "numba"}
+        See :func:`rfactor.rfactor._erosivity_events`
+    n_jobs : int, default None
+        See :func:`rfactor.parallel.run_batched`
+    backend : str, default "loky"
+        See :func:`rfactor.parallel.run_batched`
+
+    Returns
+    -------
+    all_events : list of pandas.DataFrame
+        See :func:`rfactor.rfactor._compute_erosivity_segments`.
+    """
+    index = store.index
+    if len(index) == 0:
+        raise RFactorInputError("No rainfall data provided.")
+    results = run_batched(
+        partial(
+            _apply_rfactor_store_segment,
+            energy_methods=energy_methods,
+            intensity_methods=intensity_methods,
+            engine=engine,
+        ),
+        list(zip(index["offset"], index["length"], index["year"])),
+        index["length"].tolist(),
+        n_jobs=n_jobs,
+        backend=backend,
+        shared=(store.data,),
+    )
+
+    keys = index[["station", "year"]].assign(
+        tag=index["station"] + "_" + index["year"].astype(str)
+    )
+    all_events = []
+    for method_results in zip(*results):
+        timestamps = np.concatenate(
+            [
+                _store_timestamps(year, store.data[offset + result["first_record"]])
+                for offset, year, result in zip(
+                    index["offset"], index["year"], method_results
+                )
+            ]
+        )
+        all_events.append(
+            _segment_events(method_results, timestamps.view("datetime64[ns]"), keys)
+        )
+    return all_events
+
+
+def _segment_events(method_results, datetimes, keys):
+    """Events of the segments for a pair of methods, with the datetime of the first
+    record of each event and the keys of each segment, see
+    :func:`rfactor.rfactor._station_year_groups`"""
+    columns = [
+        "event_rain_cum",
+        "max_30min_intensity",
+        "event_energy",
+        "erosivity",
+        "all_event_rain_cum",
+        "erosivity_cum",
+    ]
+    n_events = [len(result["event_idx"]) for result in method_results]
+    events = pd.DataFrame(
+        {
+            "datetime": datetimes,
+            **{
+                column: np.concatenate([result[column] for result in method_results])
+                for column in columns
+            },
+        }
+    )
+    return _assign_keys(events, keys, n_events)
+
+
+def _check_rain(rain):
+    """Check the input rain of :func:`rfactor.rfactor.compute_erosivity` and add
+    the *year* and *tag* columns"""
     if not {"station", "rain_mm", "datetime"}.issubset(rain.columns):
         raise RFactorKeyError(
             "DataFrame should contain 'datetime', 'rain_mm' and 'station' columns."
@@ -494,38 +1246,316 @@ def compute_erosivity(
         )
         raise RFactorInputError(msg)
 
-    rain = rain.assign(year=rain["datetime"].dt.year.astype(np.int64))
+    # keep the int16 year of the compact schema, see rfactor.rain.compact_rain
+    year_dtype = np.int16 if _is_compact(rain) else np.int64
+    return rain.assign(year=rain["datetime"].dt.year.astype(year_dtype))
+
+
+def _is_compact(rain):
+    """Rainfall data in the compact schema, see :func:`rfactor.rain.compact_rain`"""
+    return isinstance(rain["station"].dtype, pd.CategoricalDtype)
 
+
+def _station_year_groups(rain):
+    """Records and keys of each station/year combination
+
+    Parameters
+    ----------
+    rain : pandas.DataFrame
+        DataFrame with rainfall time series, see
+        :func:`rfactor.rfactor.compute_erosivity`, including the *year* column.
+
+    Returns
+    -------
+    order : numpy.ndarray
+        Positions of the records ordered by station and year.
+    offsets : numpy.ndarray
+        Position of the first record of each station/year combination in ``order``.
+    lengths : numpy.ndarray
+        Number of records of each station/year combination.
+    keys : pandas.DataFrame
+        The *station*, *year* and *tag* of each station/year combination, with the
+        data types of the rain. If the rain does not contain a *tag* column, the
+        tag is derived from the station and year.
+    """
+    groups = rain.groupby(["station", "year"], observed=True).indices
+    order = np.concatenate(list(groups.values()))
+    lengths = np.array([len(positions) for positions in groups.values()])
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    columns = (
+        ["station", "year", "tag"] if "tag" in rain.columns else ["station", "year"]
+    )
+    keys = rain[columns].iloc[order[offsets]].reset_index(drop=True)
     if "tag" not in rain.columns:
-        rain = rain.assign(
-            tag=rain["station"].astype(str) + "_" + rain["year"].astype(str)
-        )
+        tag = keys["station"].astype(str) + "_" + keys["year"].astype(str)
+        keys["tag"] = tag.astype("category") if _is_compact(rain) else tag
+    return order, offsets, lengths, keys
+
 
-    fun_with_method = partial(
-        _apply_rfactor, energy_method=energy_method, intensity_method=intensity_method
+def _assign_keys(events, keys, n_events):
+    """Add the *station*, *year* and *tag* of the station/year combination to the
+    events, with ``n_events`` the number of events of each combination"""
+    event_keys = keys.iloc[np.repeat(np.arange(len(keys)), n_events)]
+    return events.assign(
+        **{column: event_keys[column].array for column in keys.columns}
     )
-    grouped = rain.groupby(["station", "year"])
-    results = Parallel(n_jobs=mp.cpu_count() - 1)(
-        delayed(fun_with_method)(name, group) for name, group in grouped
+
+
+EROSIVITY_COLUMNS = [
+    "station",
+    "year",
+    "tag",
+    "event_rain_cum",
+    "all_event_rain_cum",
+    "max_30min_intensity",
+    "event_energy",
+    "erosivity",
+    "erosivity_cum",
+]
+
+
+def _method_name(method):
+    """Name of an energy or intensity method"""
+    return getattr(method, "__name__", repr(method))
+
+
+def _format_erosivity(all_erosivity):
+    """Index the erosivity output on datetime"""
+    all_erosivity.index = all_erosivity["datetime"]
+    return all_erosivity
+
+
+def compute_erosivity(
+    rain,
+    energy_method=rain_energy_verstraeten2006,
+    intensity_method=maximum_intensity,
+    engine="numpy",
+    n_jobs=None,
+    backend="loky",
+    **kwargs,
+):
+    """Calculate erosivity  for each year/station combination
+
+    Parameters
+    ----------
+    rain : pandas.DataFrame, Iterable of pandas.DataFrame or rfactor.rain.RainStore
+        DataFrame with rainfall time series. Need to contain the following columns:
+
+        - *datetime* (pandas.Timestamp): Time stamp
+        - *rain_mm* (float): Rain in mm
+        - *station* (str): Measurement station identifier
+
+        An iterable (e.g. :func:`rfactor.rain.iter_rain_folder`) provides the
+        rainfall data in parts, each part containing all records of its
+        station/year combinations. The parts are loaded when a job is available
+        to process them, so only the parts in progress are kept in memory.
+
+        A rain store (see :func:`rfactor.rain.load_rain_store`) is memory mapped,
+        the parallel jobs read the records of their station/year combinations
+        directly from the mapping.
+
+    energy_method: Callable, default rain_energy_per_unit_depth_verstraeten2006
+        Function to compute the rain energy per unit depth. Functions marked with
+        :func:`rfactor.rfactor.segment_energy_method` compute the energy of all
+        events in a single call.
+    intensity_method : Callable, default maximum_intensity
+        Function to derive the maximal rain intensity (over 30min).
+    engine : {"numpy", "numba", "pandas"}, default "numpy"
+        Implementation used to derive the events, see
+        :func:`rfactor.rfactor._compute_erosivity` (array based) and
+        :func:`rfactor.rfactor._compute_erosivity_pandas` (groupby based
+        reference). The "numba" engine derives the events in a single compiled
+        loop, see :func:`rfactor.jit.erosivity_events_numba`. It requires the
+        optional numba dependency and supports the built-in energy methods in
+        combination with ``maximum_intensity`` or ``maximum_intensity_batched``;
+        otherwise, the "numpy" engine is used. All engines provide the same output.
+    n_jobs : int, default None
+        Number of parallel jobs to compute the station/year combinations. By default,
+        all available CPUs (taking into account container CPU quota) but one are
+        used, see :func:`rfactor.parallel.effective_n_jobs`. Small data sets are
+        computed serially, see :func:`rfactor.parallel.run_batched`.
+    backend : str, default "loky"
+        Joblib backend used for the parallel jobs, e.g. "loky" or "threading".
+
+    Returns
+    -------
+    all_erosivity: pandas.DataFrame
+        DataFrame with erosivity output for each event.
+
+        - *station** (str)
+        - **year** (int)
+        - **tag** (str): unique tag for year, station-couple.
+        - *event_rain_cum* (float): Cumulative rain for each event
+        - *all_events_cum* (float): Cumulative rain over the whole timeseries
+        - *max_30min_intensity* (float): Maximal 30min intensity for each event
+        - *event_energy* (float): Rain energy per unit depth for each event
+        - *erosivity* (float): Erosivity for each event
+        - *erosivity_cum* (float): Cumulative erosivity over all events together
+
+    Notes
+    -----
+    1. NaN- and 0-values are removed from the input timeseries.
+
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Engine '{engine}' not supported, use one of {ENGINES}.")
+    if not isinstance(rain, (pd.DataFrame, RainStore)):
+        return _compute_erosivity_parts(
+            rain, energy_method, intensity_method, engine, n_jobs, backend
+        )
+    if engine == "numba":
+        if not jit.NUMBA_AVAILABLE:
+            warnings.warn("Numba is not installed, using the 'numpy' engine instead.")
+            engine = "numpy"
+        elif _numba_energy_code(energy_method, intensity_method) is None:
+            warnings.warn(
+                "The 'numba' engine does not support the combination of "
+                f"'{energy_method.__name__}' and '{intensity_method.__name__}', "
+                "using the 'numpy' engine instead."
+            )
+            engine = "numpy"
+    if isinstance(rain, RainStore):
+        if engine == "pandas":
+            rain = rain.to_frame().astype({"rain_mm": np.float64})
+        else:
+            (all_erosivity,) = _compute_erosivity_store(
+                rain, [energy_method], [intensity_method], engine, n_jobs, backend
+            )
+            all_erosivity = _format_erosivity(all_erosivity)
+            return all_erosivity[EROSIVITY_COLUMNS]
+    rain = _check_rain(rain)
+
+    if engine == "pandas":
+        fun_with_method = partial(
+            _apply_rfactor,
+            energy_method=energy_method,
+            intensity_method=intensity_method,
+            engine=engine,
+        )
+        tasks = list(rain.groupby(["station", "year"], observed=True))
+        results = run_batched(
+            fun_with_method,
+            tasks,
+            [len(group) for _, group in tasks],
+            n_jobs=n_jobs,
+            backend=backend,
+        )
+        *_, keys = _station_year_groups(rain)
+        all_erosivity = _assign_keys(
+            pd.concat(results), keys, [len(result) for result in results]
+        )
+    else:
+        (all_erosivity,) = _compute_erosivity_segments(
+            rain, [energy_method], [intensity_method], engine, n_jobs, backend
+        )
+
+    all_erosivity = _format_erosivity(all_erosivity)
+    return all_erosivity[EROSIVITY_COLUMNS]
+
+
+def _compute_erosivity_parts(
+    rain, energy_method, intensity_method, engine, n_jobs, backend
+):
+    """Calculate erosivity for each part of the rainfall data, see
+    :func:`rfactor.rfactor.compute_erosivity`"""
+    results = run_lazy(
+        partial(
+            compute_erosivity,
+            energy_method=energy_method,
+            intensity_method=intensity_method,
+            engine=engine,
+            n_jobs=1,
+        ),
+        rain,
+        n_jobs=n_jobs,
+        backend=backend,
     )
+    if len(results) == 0:
+        raise RFactorInputError("No rainfall data provided.")
     all_erosivity = pd.concat(results)
+    if isinstance(results[0]["station"].dtype, pd.CategoricalDtype):
+        # categories differ between the parts
+        all_erosivity = all_erosivity.astype({"station": "category", "tag": "category"})
+    return all_erosivity
 
-    # couple tag
-    all_erosivity = all_erosivity.merge(
-        rain[["station", "year", "tag"]].drop_duplicates(), on=["station", "year"]
-    )
-    all_erosivity.index = all_erosivity["datetime"]
 
-    return all_erosivity[
+def compute_erosivity_methods(
+    rain, energy_methods, intensity_methods, n_jobs=None, backend="loky"
+):
+    """Calculate erosivity for each year/station combination and each pair of
+    energy and intensity method
+
+    The rain events, the event rain and the transfer of the rain data to the
+    parallel jobs are shared by all methods, each energy and intensity method is
+    applied once. Equal to (but faster than) calling
+    :func:`rfactor.rfactor.compute_erosivity` for each pair of methods.
+
+    Parameters
+    ----------
+    rain : pandas.DataFrame or rfactor.rain.RainStore
+        DataFrame with rainfall time series or rain store, see
+        :func:`rfactor.rfactor.compute_erosivity`.
+    energy_methods: list of Callable
+        Functions to compute the rain energy per unit depth, see
+        :func:`rfactor.rfactor.compute_erosivity`.
+    intensity_methods : list of Callable
+        Functions to derive the maximal rain intensity (over 30min), see
+        :func:`rfactor.rfactor.compute_erosivity`.
+    n_jobs : int, default None
+        Number of parallel jobs, see :func:`rfactor.rfactor.compute_erosivity`.
+    backend : str, default "loky"
+        Joblib backend used for the parallel jobs, e.g. "loky" or "threading".
+
+    Returns
+    -------
+    all_erosivity: pandas.DataFrame
+        DataFrame with erosivity output for each event and pair of methods, see
+        :func:`rfactor.rfactor.compute_erosivity`, with the additional columns:
+
+        - *energy_method* (str): name of the energy method
+        - *intensity_method* (str): name of the intensity method
+
+    Examples
+    --------
+    Select the events of a single pair of methods with:
+
+    ::
+
+        erosivity = compute_erosivity_methods(
+            rain,
+            [rain_energy_verstraeten2006, rain_energy_mcgregor1995],
+            [maximum_intensity, maximum_intensity_interpolate],
+        )
+        erosivity.groupby(["energy_method", "intensity_method"])
+    """
+    energy_methods = list(energy_methods)
+    intensity_methods = list(intensity_methods)
+    if len(energy_methods) == 0 or len(intensity_methods) == 0:
+        raise ValueError("Provide at least one energy method and one intensity method.")
+    if isinstance(rain, RainStore):
+        all_events = _compute_erosivity_store(
+            rain, energy_methods, intensity_methods, n_jobs=n_jobs, backend=backend
+        )
+    else:
+        all_events = _compute_erosivity_segments(
+            _check_rain(rain),
+            energy_methods,
+            intensity_methods,
+            n_jobs=n_jobs,
+            backend=backend,
+        )
+    all_erosivity = pd.concat(
         [
-            "station",
-            "year",
-            "tag",
-            "event_rain_cum",
-            "all_event_rain_cum",
-            "max_30min_intensity",
-            "event_energy",
-            "erosivity",
-            "erosivity_cum",
+            events.assign(
+                energy_method=_method_name(energy_method),
+                intensity_method=_method_name(intensity_method),
+            )
+            for events, (energy_method, intensity_method) in zip(
+                all_events, product(energy_methods, intensity_methods)
+            )
         ]
-    ]
+    )
+
+    all_erosivity = _format_erosivity(all_erosivity)
+    return all_erosivity[["energy_method", "intensity_method"] + EROSIVITY_COLUMNS]
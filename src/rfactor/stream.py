@@ -0,0 +1,635 @@
+import numpy as np
+import pandas as pd
+
+from rfactor.rfactor import (
+    EROSIVITY_COLUMNS,
+    MIN_CUMUL_EVENT,
+    TIME_BETWEEN_EVENTS,
+    RFactorInputError,
+    RFactorKeyError,
+    RFactorTypeError,
+    _event_energy,
+    _event_intensity,
+    maximum_intensity,
+    rain_energy_verstraeten2006,
+)
+
+
+def _years(timestamps):
+    """Year of int64 nanosecond timestamps"""
+    return timestamps.view("datetime64[ns]").astype("datetime64[Y]").astype(int) + 1970
+
+
+class ErosivityAccumulator:
+    """Compute the erosivity of rain events from time ordered chunks of rain data
+
+    The accumulator keeps the records of the open (not yet finished) rain event of
+    each station and the cumulative rain and erosivity of the current year of
+    each station. An event is closed when a record of the same station arrives
+    after at least ``event_split`` or in another year, or when ``event_split`` has
+    elapsed between the last record of the event and an explicit ``now``, see
+    :meth:`rfactor.stream.ErosivityAccumulator.update`. Stations are closed
+    independently, so the feeds of different stations can lag each other.
+
+    The closed events are identical to the output of
+    :func:`rfactor.rfactor.compute_erosivity` on the complete rain data.
+
+    Parameters
+    ----------
+    energy_method: Callable, default rain_energy_verstraeten2006
+        Function to compute the rain energy per unit depth, see
+        :func:`rfactor.rfactor.compute_erosivity`.
+    intensity_method : Callable, default maximum_intensity
+        Function to derive the maximal rain intensity (over 30min), see
+        :func:`rfactor.rfactor.compute_erosivity`.
+    event_split : str, default TIME_BETWEEN_EVENTS
+        Time interval to split into individual rain events
+    event_threshold : float, default MIN_CUMUL_EVENT
+        Minimal cumulative rain of an event to take into account for erosivity
+        derivation
+
+    Examples
+    --------
+    ::
+
+        accumulator = ErosivityAccumulator()
+        for chunk in rain_feed:
+            events = accumulator.update(chunk)
+
+        # store the state and resume later on
+        state = accumulator.get_state()
+        accumulator = ErosivityAccumulator.from_state(state)
+    """
+
+    def __init__(
+        self,
+        energy_method=rain_energy_verstraeten2006,
+        intensity_method=maximum_intensity,
+        event_split=TIME_BETWEEN_EVENTS,
+        event_threshold=MIN_CUMUL_EVENT,
+    ):
+        self.energy_method = energy_method
+        self.intensity_method = intensity_method
+        self.event_split = event_split
+        self.event_threshold = event_threshold
+        self._split = pd.Timedelta(event_split).value
+        self._now = None
+        self._stations = {}
+
+    def update(self, rain, now=None):
+        """Add a chunk of rain records and return the closed events
+
+        Parameters
+        ----------
+        rain : pandas.DataFrame
+            DataFrame with rainfall time series. Need to contain the following
+            columns:
+
+            - *datetime* (pandas.Timestamp): Time stamp
+            - *rain_mm* (float): Rain in mm
+            - *station* (str): Measurement station identifier
+
+            The records of each station need to be later than the records of
+            the station in the previous chunks. Zero and NaN rain records are
+            ignored.
+        now : pandas.Timestamp, default None
+            Time up to which the rain data of all stations is complete, i.e. no
+            records before ``now`` will be added. Open events without records
+            during ``event_split`` before ``now`` are closed and later records
+            of these stations before ``now`` are rejected. By default, the
+            events of each station are only closed by the records of the station
+            itself.
+
+        Returns
+        -------
+        events : pandas.DataFrame
+            The closed events above the ``event_threshold``, see
+            :func:`rfactor.rfactor.compute_erosivity`.
+        """
+        if not {"station", "rain_mm", "datetime"}.issubset(rain.columns):
+            raise RFactorKeyError(
+                "DataFrame should contain 'datetime', 'rain_mm' and 'station' columns."
+            )
+        if not pd.core.dtypes.common.is_datetime64_any_dtype(rain["datetime"]):
+            raise RFactorTypeError(
+                "The 'datetime' column needs to be of a datetime data type."
+            )
+        rain = rain[rain["rain_mm"] > 0]
+
+        events = []
+        for station, records in rain.groupby("station", sort=True):
+            timestamps = records["datetime"].to_numpy(dtype="datetime64[ns]")
+            timestamps = timestamps.view(np.int64)
+            state = self._station_state(station)
+            previous = state["timestamps"][-1:] if state["timestamps"] else []
+            if np.any(np.diff(np.concatenate((previous, timestamps))) <= 0):
+                raise RFactorInputError(
+                    f"Rain records of station '{station}' should be time ordered and "
+                    "later than the records of the previous chunks."
+                )
+            if state["closed_until"] is not None and (
+                timestamps[0] < state["closed_until"]
+            ):
+                raise RFactorInputError(
+                    f"Rain records of station '{station}' should be later than the "
+                    f"time up to which its events were closed "
+                    f"({pd.Timestamp(state['closed_until'])})."
+                )
+            events += self._add_records(
+                station, state, timestamps, records["rain_mm"].to_numpy(np.float64)
+            )
+
+        if now is not None:
+            now = pd.Timestamp(now).value
+            self._now = now if self._now is None else max(self._now, now)
+            events += self._close_events(self._now)
+        return self._to_frame(events)
+
+    def flush(self):
+        """Close the open events of all stations, e.g. at the end of the data
+
+        Returns
+        -------
+        events : pandas.DataFrame
+            The closed events above the ``event_threshold``, see
+            :func:`rfactor.rfactor.compute_erosivity`.
+        """
+        return self._to_frame(self._close_events())
+
+    @property
+    def totals(self):
+        """Cumulative rain and erosivity of the closed events of the current year
+        of each station
+
+        Returns
+        -------
+        totals : pandas.DataFrame
+            DataFrame with columns *station*, *year*, *tag*, *all_event_rain_cum*
+            and *erosivity_cum*.
+        """
+        totals = pd.DataFrame(
+            [
+                {
+                    "station": station,
+                    "year": state["year"],
+                    "tag": f"{station}_{state['year']}",
+                    "all_event_rain_cum": state["all_event_rain_cum"],
+                    "erosivity_cum": state["erosivity_cum"],
+                }
+                for station, state in self._stations.items()
+                if state["year"] is not None
+            ],
+            columns=["station", "year", "tag", "all_event_rain_cum", "erosivity_cum"],
+        )
+        return totals.astype({"year": np.int64})
+
+    def get_state(self):
+        """State of the accumulator as a JSON serializable dictionary
+
+        The energy and intensity method are not part of the state, these need to
+        be provided again to :meth:`rfactor.stream.ErosivityAccumulator.from_state`.
+
+        Returns
+        -------
+        state : dict
+            Event split (nanoseconds), event threshold, time up to which the data
+            is complete (nanoseconds) and the open event, cumulative values and
+            time up to which the events were closed (nanoseconds) of each station.
+        """
+        return {
+            "event_split": self._split,
+            "event_threshold": self.event_threshold,
+            "now": self._now,
+            "stations": {
+                station: {
+                    key: list(value) if isinstance(value, list) else value
+                    for key, value in state.items()
+                }
+                for station, state in self._stations.items()
+            },
+        }
+
+    @classmethod
+    def from_state(
+        cls,
+        state,
+        energy_method=rain_energy_verstraeten2006,
+        intensity_method=maximum_intensity,
+    ):
+        """Create an accumulator from a state
+
+        Parameters
+        ----------
+        state : dict
+            State, see :meth:`rfactor.stream.ErosivityAccumulator.get_state`.
+        energy_method: Callable, default rain_energy_verstraeten2006
+            Function to compute the rain energy per unit depth
+        intensity_method : Callable, default maximum_intensity
+            Function to derive the maximal rain intensity (over 30min)
+
+        Returns
+        -------
+        accumulator : rfactor.stream.ErosivityAccumulator
+        """
+        accumulator = cls(
+            energy_method,
+            intensity_method,
+            pd.Timedelta(state["event_split"]),
+            state["event_threshold"],
+        )
+        accumulator._now = state["now"]
+        accumulator._stations = {
+            station: {
+                "year": station_state["year"],
+                "n_events": int(station_state["n_events"]),
+                "all_event_rain_cum": float(station_state["all_event_rain_cum"]),
+                "erosivity_cum": float(station_state["erosivity_cum"]),
+                "timestamps": [int(value) for value in station_state["timestamps"]],
+                "rain_mm": [float(value) for value in station_state["rain_mm"]],
+                "closed_until": station_state.get("closed_until"),
+            }
+            for station, station_state in state["stations"].items()
+        }
+        return accumulator
+
+    def _station_state(self, station):
+        """Open event and cumulative values of the current year of a station"""
+        if station not in self._stations:
+            self._stations[station] = {
+                "year": None,
+                "n_events": 0,
+                "all_event_rain_cum": 0.0,
+                "erosivity_cum": 0.0,
+                "timestamps": [],
+                "rain_mm": [],
+                "closed_until": None,
+            }
+        return self._stations[station]
+
+    def _add_records(self, station, state, timestamps, rain):
+        """Add the records to the open event and close the finished events"""
+        timestamps = np.concatenate(
+            (np.array(state["timestamps"], dtype=np.int64), timestamps)
+        )
+        rain = np.concatenate((np.array(state["rain_mm"], dtype=np.float64), rain))
+        years = _years(timestamps)
+        starts = np.flatnonzero(
+            (np.diff(timestamps) >= self._split) | (np.diff(years) != 0)
+        )
+        offsets = np.concatenate(([0], starts + 1))
+
+        # all but the last event are closed, the year of events can differ
+        events = []
+        for year in np.unique(years[offsets[:-1]]):
+            closed = offsets[:-1][years[offsets[:-1]] == year]
+            stop = offsets[np.searchsorted(offsets, closed[-1]) + 1]
+            events += self._event_properties(
+                station,
+                state,
+                timestamps[closed[0] : stop],
+                rain[closed[0] : stop],
+                closed - closed[0],
+            )
+        state["timestamps"] = timestamps[offsets[-1] :].tolist()
+        state["rain_mm"] = rain[offsets[-1] :].tolist()
+        return events
+
+    def _close_events(self, now=None):
+        """Close the open events finished before ``now``, all if None"""
+        events = []
+        for station, state in sorted(self._stations.items()):
+            if not state["timestamps"]:
+                continue
+            last = state["timestamps"][-1]
+            if (
+                now is None
+                or now - last >= self._split
+                or _years(np.array([now])) > _years(np.array([last]))
+            ):
+                events += self._event_properties(
+                    station,
+                    state,
+                    np.array(state["timestamps"], dtype=np.int64),
+                    np.array(state["rain_mm"], dtype=np.float64),
+                    np.zeros(1, dtype=np.int64),
+                )
+                state["timestamps"] = []
+                state["rain_mm"] = []
+                state["closed_until"] = now
+        return events
+
+    def _event_properties(self, station, state, timestamps, rain, offsets):
+        """Properties of closed events of a single year, updating the cumulative
+        values of the station"""
+        year = int(_years(timestamps[:1])[0])
+        if state["year"] != year:
+            state.update(
+                year=year, n_events=0, all_event_rain_cum=0.0, erosivity_cum=0.0
+            )
+
+        event_rain = np.add.reduceat(rain, offsets)
+        event_energy = _event_energy(self.energy_method, rain, offsets)
+        max_intensity = _event_intensity(
+            self.intensity_method, timestamps, rain, offsets
+        )
+
+        events = []
+        for idx, offset in enumerate(offsets):
+            state["n_events"] += 1
+            state["all_event_rain_cum"] += event_rain[idx]
+            if np.round(event_rain[idx], 2) > self.event_threshold:
+                erosivity = event_energy[idx] * max_intensity[idx]
+                state["erosivity_cum"] += erosivity
+                events.append(
+                    {
+                        "datetime": timestamps[offset],
+                        "station": station,
+                        "year": year,
+                        "tag": f"{station}_{year}",
+                        "event_rain_cum": event_rain[idx],
+                        "all_event_rain_cum": state["all_event_rain_cum"],
+                        "max_30min_intensity": max_intensity[idx],
+                        "event_energy": event_energy[idx],
+                        "erosivity": erosivity,
+                        "erosivity_cum": state["erosivity_cum"],
+                    }
+                )
+        return events
+
+    @staticmethod
+    def _to_frame(events):
+        """Closed events in the output format of compute_erosivity"""
+        events = pd.DataFrame(events, columns=["datetime"] + EROSIVITY_COLUMNS)
+        dtypes = dict.fromkeys(EROSIVITY_COLUMNS, np.float64)
+        dtypes.update(
+            {"datetime": "datetime64[ns]", "station": str, "year": np.int64, "tag": str}
+        )
+        events = events.astype(dtypes)
+        events.index = events.pop("datetime")
+        return events
+
+
+class RainfallStatistics:
+    """Mergeable statistics of rainfall data computed from chunks of rain data
+
+    Keeps the number of records, minimum, maximum, years and the distribution of
+    the rain of each station, so the statistics of
+    :func:`rfactor.process.compute_rainfall_statistics` can be computed while
+    loading the rain files (see :func:`rfactor.rain.load_rain_folder`), without
+    keeping all records in memory. Statistics of different chunks, jobs or runs
+    are combined with :meth:`rfactor.stream.RainfallStatistics.merge`.
+
+    The distribution is stored as the count of each rain value (``exact=True``)
+    or as a quantile sketch with logarithmic bins, in which each value is
+    represented by the center of its bin. The median of the sketch has a relative
+    error of at most ``relative_accuracy``, with a number of bins that only
+    depends on the range of the rain values.
+
+    Parameters
+    ----------
+    exact : bool, default False
+        Count each rain value instead of a quantile sketch. For rain values with a
+        fixed precision (e.g. 0.01 mm), the number of distinct values is limited as
+        well.
+    relative_accuracy : float, default 0.01
+        Maximal relative error of the median of the quantile sketch.
+
+    Examples
+    --------
+    ::
+
+        statistics = RainfallStatistics()
+        for rain in iter_rain_folder(folder, load_rain_file_matlab_legacy):
+            statistics.update(rain)
+        statistics.to_frame()
+
+        # combine with the statistics of another run
+        statistics.merge(RainfallStatistics.from_state(state))
+    """
+
+    def __init__(self, exact=False, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("The relative accuracy should be between 0 and 1.")
+        self.exact = exact
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._stations = {}
+
+    def _keys(self, rain):
+        """Rain value or center of the bin of the quantile sketch"""
+        if self.exact:
+            return rain
+        keys = rain.copy()
+        positive = rain > 0
+        bins = np.ceil(np.log(rain[positive]) / np.log(self._gamma))
+        keys[positive] = 2 * self._gamma**bins / (self._gamma + 1)
+        return keys
+
+    def update(self, rain):
+        """Add a chunk of rain records
+
+        Parameters
+        ----------
+        rain : pandas.DataFrame
+            DataFrame with rainfall time series with the *datetime*, *station*
+            and *rain_mm* columns. NaN rain records only count for the years of
+            the station.
+        """
+        if not {"station", "rain_mm", "datetime"}.issubset(rain.columns):
+            raise RFactorKeyError(
+                "DataFrame should contain 'datetime', 'rain_mm' and 'station' columns."
+            )
+        station_codes, stations = pd.factorize(rain["station"])
+        years = rain["datetime"].dt.year.to_numpy()
+        rain_mm = rain["rain_mm"].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(rain_mm)
+        for code, station in enumerate(stations):
+            records = station_codes == code
+            state = self._station_state(str(station))
+            state["years"].update(np.unique(years[records]).tolist())
+            values = rain_mm[records & valid]
+            if len(values) == 0:
+                continue
+            state["records"] += len(values)
+            state["min"] = min(state["min"], float(values.min()))
+            state["max"] = max(state["max"], float(values.max()))
+            keys, counts = np.unique(self._keys(values), return_counts=True)
+            _add_counts(state["counts"], keys.tolist(), counts.tolist())
+
+    def merge(self, other):
+        """Add the statistics of another instance, e.g. of another job or run
+
+        Parameters
+        ----------
+        other : rfactor.stream.RainfallStatistics
+            Statistics with the same ``exact`` and ``relative_accuracy``.
+
+        Returns
+        -------
+        statistics : rfactor.stream.RainfallStatistics
+            The updated statistics (self).
+        """
+        if (other.exact, other.relative_accuracy) != (
+            self.exact,
+            self.relative_accuracy,
+        ):
+            raise ValueError(
+                "Only statistics with the same 'exact' and 'relative_accuracy' can "
+                "be merged."
+            )
+        for station, other_state in other._stations.items():
+            state = self._station_state(station)
+            state["years"].update(other_state["years"])
+            state["records"] += other_state["records"]
+            state["min"] = min(state["min"], other_state["min"])
+            state["max"] = max(state["max"], other_state["max"])
+            _add_counts(
+                state["counts"],
+                list(other_state["counts"]),
+                list(other_state["counts"].values()),
+            )
+        return self
+
+    def quantile(self, station, q):
+        """Quantile of the rain of a station
+
+        Parameters
+        ----------
+        station : str
+        q : float
+            Quantile, between 0 and 1. The value is interpolated between the two
+            nearest ranks, see :meth:`pandas.Series.quantile`.
+
+        Returns
+        -------
+        quantile : float
+            NaN if the station has no (non-NaN) records.
+        """
+        counts = self._stations[station]["counts"]
+        if not counts:
+            return np.nan
+        keys = np.array(sorted(counts))
+        cumulative = np.cumsum([counts[key] for key in keys])
+        rank = q * (cumulative[-1] - 1)
+        lower, upper = np.searchsorted(
+            cumulative, [np.floor(rank) + 1, np.ceil(rank) + 1]
+        )
+        if lower == upper:
+            return float(keys[lower])
+        if rank % 1 == 0.5:
+            # mean of the middle values, as numpy.median
+            return float((keys[lower] + keys[upper]) / 2)
+        return float(keys[lower] + (keys[upper] - keys[lower]) * (rank % 1))
+
+    def to_frame(self, df_station_metadata=None):
+        """Statistics of each station
+
+        Parameters
+        ----------
+        df_station_metadata : pandas.DataFrame, default None
+            Station metadata, see
+            :func:`rfactor.process.compute_rainfall_statistics`.
+
+        Returns
+        -------
+        df_statistics : pandas.DataFrame
+            See :func:`rfactor.process.compute_rainfall_statistics`.
+        """
+        stations = sorted(self._stations)
+        df_statistics = pd.DataFrame(
+            {
+                "year": [
+                    sorted(self._stations[station]["years"]) for station in stations
+                ],
+                "station": stations,
+                "records": [self._stations[station]["records"] for station in stations],
+                "min": [self._stations[station]["min"] for station in stations],
+                "median": [self.quantile(station, 0.5) for station in stations],
+                "max": [self._stations[station]["max"] for station in stations],
+            }
+        ).astype({"records": np.int64, "station": str})
+        df_statistics[["min", "max"]] = df_statistics[["min", "max"]].replace(
+            [np.inf, -np.inf], np.nan
+        )
+
+        if df_station_metadata is not None:
+            df_statistics = df_statistics.merge(
+                df_station_metadata, on="station", how="left"
+            )
+            return df_statistics[
+                ["year", "station", "x", "y", "records", "min", "median", "max"]
+            ]
+        return df_statistics[["year", "records", "min", "median", "max"]]
+
+    def get_state(self):
+        """State of the statistics as a JSON serializable dictionary
+
+        Returns
+        -------
+        state : dict
+            Mode, relative accuracy and the statistics of each station.
+        """
+        return {
+            "exact": self.exact,
+            "relative_accuracy": self.relative_accuracy,
+            "stations": {
+                station: {
+                    "years": sorted(state["years"]),
+                    "records": state["records"],
+                    "min": state["min"],
+                    "max": state["max"],
+                    "keys": list(state["counts"]),
+                    "counts": list(state["counts"].values()),
+                }
+                for station, state in self._stations.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Create statistics from a state
+
+        Parameters
+        ----------
+        state : dict
+            State, see :meth:`rfactor.stream.RainfallStatistics.get_state`.
+
+        Returns
+        -------
+        statistics : rfactor.stream.RainfallStatistics
+        """
+        statistics = cls(state["exact"], state["relative_accuracy"])
+        statistics._stations = {
+            station: {
+                "years": {int(year) for year in station_state["years"]},
+                "records": int(station_state["records"]),
+                "min": float(station_state["min"]),
+                "max": float(station_state["max"]),
+                "counts": dict(
+                    zip(
+                        map(float, station_state["keys"]),
+                        map(int, station_state["counts"]),
+                    )
+                ),
+            }
+            for station, station_state in state["stations"].items()
+        }
+        return statistics
+
+    def _station_state(self, station):
+        """Statistics of a station"""
+        if station not in self._stations:
+            self._stations[station] = {
+                "years": set(),
+                "records": 0,
+                "min": np.inf,
+                "max": -np.inf,
+                "counts": {},
+            }
+        return self._stations[station]
+
+
+def _add_counts(counts, keys, values):
+    """Add the counts of the keys to a dictionary of counts"""
+    for key, value in zip(keys, values):
+        counts[key] = counts.get(key, 0) + value
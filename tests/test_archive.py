@@ -0,0 +1,79 @@
+import gzip
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from rfactor.archive import (
+    find_rain_files,
+    is_compressed,
+    open_rain_file,
+    rain_file_stat,
+    split_archive_path,
+    strip_compression_suffix,
+)
+
+RAIN_DATA = b"1 1.00\n2 0.20\n"
+
+
+@pytest.fixture()
+def rain_archive_folder(tmp_path):
+    """Folder with plain, compressed and archived rain files"""
+    (tmp_path / "A_2020.txt").write_bytes(RAIN_DATA)
+    (tmp_path / "B_2020.txt.gz").write_bytes(gzip.compress(RAIN_DATA))
+    (tmp_path / "notes.md").write_text("no rain data")
+    with zipfile.ZipFile(tmp_path / "network.zip", "w") as bundle:
+        bundle.writestr("stations/C_2020.txt", RAIN_DATA)
+        bundle.writestr("D_2020.txt.gz", gzip.compress(RAIN_DATA))
+        bundle.writestr("readme.md", "no rain data")
+    with tarfile.open(tmp_path / "network.tar.gz", "w:gz") as bundle:
+        (tmp_path / "E_2020.txt").write_bytes(RAIN_DATA)
+        bundle.add(tmp_path / "E_2020.txt", "E_2020.txt")
+        (tmp_path / "E_2020.txt").unlink()
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "file_name,expected",
+    [
+        ("KMI_6414_2004.txt", "KMI_6414_2004.txt"),
+        ("KMI_6414_2004.txt.gz", "KMI_6414_2004.txt"),
+        ("KMI_6414_2004.txt.zst", "KMI_6414_2004.txt"),
+    ],
+)
+def test_strip_compression_suffix(file_name, expected):
+    """Compression suffixes are removed from the file name"""
+    assert strip_compression_suffix(Path("folder") / file_name) == expected
+
+
+def test_find_rain_files(rain_archive_folder):
+    """Plain, compressed and archived rain files are found"""
+    files = find_rain_files(rain_archive_folder)
+    assert [file_path.relative_to(rain_archive_folder) for file_path in files] == [
+        Path("A_2020.txt"),
+        Path("B_2020.txt.gz"),
+        Path("network.tar.gz/E_2020.txt"),
+        Path("network.zip/D_2020.txt.gz"),
+        Path("network.zip/stations/C_2020.txt"),
+    ]
+    assert [is_compressed(file_path) for file_path in files] == [
+        False,
+        True,
+        True,
+        True,
+        True,
+    ]
+    archive, member = split_archive_path(files[-1])
+    assert archive == rain_archive_folder / "network.zip"
+    assert member == str(PurePosixPath("stations", "C_2020.txt"))
+
+
+def test_open_rain_file(rain_archive_folder):
+    """Rain files are decompressed while reading"""
+    for file_path in find_rain_files(rain_archive_folder):
+        with open_rain_file(file_path) as stream:
+            assert stream.read() == RAIN_DATA
+        size, _ = rain_file_stat(file_path)
+        if file_path.name.endswith(".txt"):
+            assert size == len(RAIN_DATA)
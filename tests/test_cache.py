@@ -0,0 +1,217 @@
+import json
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from rfactor.cache import RainCache, loader_key
+from rfactor.rain import (
+    iter_rain_folder,
+    load_rain_file_matlab_legacy,
+    load_rain_folder,
+    update_rain_folder,
+)
+
+pytest.importorskip("pyarrow")
+
+
+def _counting_loader(calls):
+    """Load function registering the loaded files"""
+
+    def load_fun(file_path, **kwargs):
+        calls.append(file_path.name)
+        return load_rain_file_matlab_legacy(file_path, **kwargs)
+
+    return load_fun
+
+
+def test_loader_key():
+    """Loader key contains the function name and sorted keyword arguments"""
+    key = loader_key(load_rain_file_matlab_legacy, {"mmap": True, "engine": "numpy"})
+    assert key == (
+        "rfactor.rain.load_rain_file_matlab_legacy"
+        '({"engine": "numpy", "mmap": true})'
+    )
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_load_rain_folder_cache(
+    rain_data_folder_matlab, tmp_path, file_format, compact
+):
+    """Cached files are not parsed again and provide the same rainfall data"""
+    calls = []
+    load_fun = _counting_loader(calls)
+    rain = load_rain_folder(rain_data_folder_matlab, load_fun, compact=compact)
+
+    cache = RainCache(tmp_path / "cache", file_format=file_format)
+    rain_parsed = load_rain_folder(
+        rain_data_folder_matlab, load_fun, compact=compact, cache=cache
+    )
+    assert len(calls) == 2 * len(cache) == 4
+    assert (tmp_path / "cache" / "manifest.json").exists()
+
+    rain_cached = load_rain_folder(
+        rain_data_folder_matlab,
+        load_fun,
+        compact=compact,
+        cache=RainCache(tmp_path / "cache", file_format=file_format),
+    )
+    assert len(calls) == 4
+    pd.testing.assert_frame_equal(rain, rain_parsed)
+    pd.testing.assert_frame_equal(rain, rain_cached)
+
+
+def test_load_rain_folder_cache_modified(rain_data_folder_matlab, tmp_path):
+    """Modified files and other loader arguments are parsed again"""
+    calls = []
+    load_fun = _counting_loader(calls)
+    cache = RainCache(tmp_path / "cache")
+    load_rain_folder(rain_data_folder_matlab, load_fun, cache=cache)
+
+    file_path = rain_data_folder_matlab / "station_0_2020.txt"
+    file_path.write_text("1 0.50\n2 0.30\n")
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    calls.clear()
+    rain = load_rain_folder(rain_data_folder_matlab, load_fun, cache=cache)
+    assert calls == ["station_0_2020.txt"]
+    assert rain.loc[rain["tag"] == "station_0_2020", "rain_mm"].tolist() == [0.5, 0.3]
+
+    calls.clear()
+    load_rain_folder(rain_data_folder_matlab, load_fun, cache=cache, engine="pandas")
+    assert len(calls) == len(cache) == 2
+
+
+@pytest.mark.parametrize("n_groups", [1, 2])
+def test_iter_rain_folder_cache(rain_data_folder_matlab, tmp_path, n_groups):
+    """The manifest is saved once, when the iterator is exhausted or closed"""
+    cache = RainCache(tmp_path / "cache")
+    saves = []
+    save = cache.save
+    cache.save = lambda: saves.append(save())
+
+    rain_parts = iter_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy, cache=cache
+    )
+    for _ in range(n_groups):
+        next(rain_parts)
+    assert saves == []
+    rain_parts.close()
+    assert len(saves) == 1
+    assert len(RainCache(tmp_path / "cache")) == n_groups
+
+
+def test_cache_eviction(rain_data_folder_matlab, tmp_path):
+    """Least recently used entries are removed above the maximal size"""
+    files = sorted(rain_data_folder_matlab.glob("*.txt"))
+    cache = RainCache(tmp_path / "cache")
+    for file_path in files:
+        key = cache.key(file_path, load_rain_file_matlab_legacy)
+        cache.put(file_path, key, load_rain_file_matlab_legacy(file_path))
+    key = cache.key(files[0], load_rain_file_matlab_legacy)
+    assert cache.get(files[0], key) is not None
+
+    cache.max_size = cache.size - 1
+    cache.save()
+    assert len(cache) == 1
+    assert cache.get(files[0], key) is not None
+    assert RainCache(tmp_path / "cache").size == cache.size
+
+
+def test_cache_invalidate(rain_data_folder_matlab, tmp_path):
+    """Cache entries of a file, folder or all files are removed"""
+    cache = RainCache(tmp_path / "cache")
+    load_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy, cache=cache)
+
+    cache.invalidate(rain_data_folder_matlab / "station_0_2020.txt")
+    assert len(cache) == 1
+    cache.invalidate(rain_data_folder_matlab)
+    assert len(cache) == 0
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == ["manifest.json"]
+
+
+def test_update_rain_folder(rain_data_folder_matlab, tmp_path):
+    """Only new or changed files are parsed and the changes are reported"""
+    calls = []
+    load_fun = _counting_loader(calls)
+    cache = RainCache(tmp_path / "cache")
+    _, changes = update_rain_folder(rain_data_folder_matlab, load_fun, cache)
+    assert [path.name for path in changes["added"]] == [
+        "station_0_2020.txt",
+        "station_1_2021.txt",
+    ]
+
+    # modification time changed, content unchanged
+    file_path = rain_data_folder_matlab / "station_0_2020.txt"
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    calls.clear()
+    _, changes = update_rain_folder(rain_data_folder_matlab, load_fun, cache)
+    assert calls == []
+    assert changes == {"added": [], "updated": [], "removed": []}
+
+    file_path.write_text("1 0.50\n2 0.30\n")
+    (rain_data_folder_matlab / "station_1_2021.txt").rename(
+        rain_data_folder_matlab / "station_2_2021.txt"
+    )
+    rain, changes = update_rain_folder(rain_data_folder_matlab, load_fun, cache)
+    assert calls == ["station_0_2020.txt", "station_2_2021.txt"]
+    assert changes["added"] == [rain_data_folder_matlab / "station_2_2021.txt"]
+    assert changes["updated"] == [file_path]
+    assert [path.name for path in changes["removed"]] == ["station_1_2021.txt"]
+    pd.testing.assert_frame_equal(
+        rain, load_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy)
+    )
+    assert len(cache) == 2
+
+
+def test_update_rain_folder_nested(rain_data_folder_matlab, tmp_path):
+    """Files of a subfolder in the same cache are not removed when updating the
+    parent folder, the files of a removed archive are"""
+    subfolder = rain_data_folder_matlab / "sub"
+    subfolder.mkdir()
+    file_2021 = rain_data_folder_matlab / "station_1_2021.txt"
+    (subfolder / "station_3_2021.txt").write_bytes(file_2021.read_bytes())
+    with zipfile.ZipFile(rain_data_folder_matlab / "network.zip", "w") as bundle:
+        bundle.write(file_2021, "station_4_2021.txt")
+
+    cache = RainCache(tmp_path / "cache")
+    update_rain_folder(subfolder, load_rain_file_matlab_legacy, cache)
+    _, changes = update_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy, cache
+    )
+    assert len(changes["added"]) == 3
+    assert changes["removed"] == []
+    assert len(cache) == 4
+
+    (rain_data_folder_matlab / "network.zip").unlink()
+    _, changes = update_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy, cache
+    )
+    assert changes["removed"] == [
+        rain_data_folder_matlab.resolve() / "network.zip" / "station_4_2021.txt"
+    ]
+    _, changes = update_rain_folder(subfolder, load_rain_file_matlab_legacy, cache)
+    assert changes == {"added": [], "updated": [], "removed": []}
+    assert len(cache) == 3
+
+
+def test_cache_file_hash(rain_data_folder_matlab, tmp_path):
+    """The content hash is only computed when comparing the cache with a folder"""
+    cache = RainCache(tmp_path / "cache")
+    load_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy, cache=cache)
+    manifest = json.loads((tmp_path / "cache" / "manifest.json").read_text())
+    assert not any("sha256" in entry for entry in manifest["files"].values())
+
+    update_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy, cache)
+    manifest = json.loads((tmp_path / "cache" / "manifest.json").read_text())
+    assert all("sha256" in entry for entry in manifest["files"].values())
+
+
+def test_cache_file_format(tmp_path):
+    """Unsupported file formats raise an error"""
+    with pytest.raises(ValueError) as excinfo:
+        RainCache(tmp_path, file_format="csv")
+    assert "File format 'csv' not supported" in str(excinfo.value)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rfactor import parallel
+from rfactor.parallel import (
+    balanced_batches,
+    effective_n_jobs,
+    run_batched,
+    run_lazy,
+)
+
+
+@pytest.mark.parametrize(
+    "n_jobs,expected", [(None, 3), (1, 1), (6, 6), (-1, 4), (-2, 3), (-10, 1)]
+)
+def test_effective_n_jobs(monkeypatch, n_jobs, expected):
+    """Default and negative number of jobs are relative to the available CPUs"""
+    monkeypatch.setattr(parallel, "cpu_count", lambda: 4)
+    assert effective_n_jobs(n_jobs) == expected
+
+
+def test_effective_n_jobs_single_cpu(monkeypatch):
+    """Default number of jobs is at least one job"""
+    monkeypatch.setattr(parallel, "cpu_count", lambda: 1)
+    assert effective_n_jobs() == 1
+    with pytest.raises(ValueError) as excinfo:
+        effective_n_jobs(0)
+    assert "'n_jobs' == 0 has no meaning" in str(excinfo.value)
+
+
+def test_balanced_batches():
+    """Tasks are packed into batches of similar cost, most costly batch first"""
+    costs = [10, 1, 1, 7, 3, 3, 2, 5]
+    batches = balanced_batches(costs, 3)
+
+    assert sorted(idx for batch in batches for idx in batch) == list(range(8))
+    loads = [sum(costs[idx] for idx in batch) for batch in batches]
+    assert loads == sorted(loads, reverse=True)
+    assert max(loads) - min(loads) <= 1
+
+    # no empty batches
+    assert balanced_batches([1, 2], 4) == [[1], [0]]
+
+
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_run_batched(monkeypatch, backend):
+    """Results are returned in the order of the tasks for serial and parallel
+    execution"""
+    tasks = [(idx, pd.Series(range(idx))) for idx in range(12)]
+    costs = [idx for idx, _ in tasks]
+    expected = [series.sum() + idx for idx, series in tasks]
+
+    assert run_batched(_add, tasks, costs, n_jobs=1) == expected
+
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    assert run_batched(_add, tasks, costs, n_jobs=2, backend=backend) == expected
+
+
+@pytest.mark.parametrize("backend,memmap", [("loky", True), ("threading", False)])
+def test_run_batched_shared(monkeypatch, backend, memmap):
+    """Shared arrays are passed to the workers as memory mapped file for process
+    based backends"""
+    values = np.arange(100.0)
+    tasks = [(offset, 10) for offset in range(0, 100, 10)]
+    expected = [(values[offset : offset + 10].sum(), False) for offset, _ in tasks]
+
+    results = run_batched(_segment_sum, tasks, [10] * 10, n_jobs=1, shared=(values,))
+    assert results == expected
+
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    results = run_batched(
+        _segment_sum, tasks, [10] * 10, n_jobs=2, backend=backend, shared=(values,)
+    )
+    assert results == [(total, memmap) for total, _ in expected]
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_run_lazy(n_jobs):
+    """Tasks of an iterator are consumed lazily, returning the results in order"""
+    consumed = []
+
+    def tasks():
+        for idx in range(12):
+            consumed.append(idx)
+            yield pd.Series(range(idx))
+
+    results = run_lazy(np.sum, tasks(), n_jobs=n_jobs, backend="threading")
+    assert results == [sum(range(idx)) for idx in range(12)]
+    assert consumed == list(range(12))
+
+
+def _add(idx, series):
+    """Test function for parallel execution"""
+    return series.sum() + idx
+
+
+def _segment_sum(values, offset, length):
+    """Test function for parallel execution on shared arrays"""
+    return values[offset : offset + length].sum(), isinstance(values, np.memmap)
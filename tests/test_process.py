@@ -5,8 +5,13 @@ import numpy as np
 import pandas as pd
 import pytest
 
+from rfactor import parallel
 from rfactor.process import (
+    ErosivityStore,
     _days_since_start_year,
+    bootstrap_rfactor,
+    compute_diagnostics,
+    compute_erosivity_distribution,
     compute_rainfall_statistics,
     get_rfactor_station_year,
     write_erosivity_data,
@@ -68,6 +73,108 @@ def test_write_erosivity(dummy_erosivity, tmpdir):
     )
 
 
+def test_compute_diagnostics():
+    """Coverage and no-rain months for each year/station, months without records
+    for a year/station are NaN"""
+    rain = pd.DataFrame(
+        {
+            "datetime": pd.to_datetime(
+                [
+                    "2018-01-01 00:10",
+                    "2018-01-01 00:20",
+                    "2018-03-05 10:00",
+                    "2019-02-01 00:00",
+                    "2018-05-01 00:00",
+                ]
+            ),
+            "station": ["P01", "P01", "P01", "P01", "P02"],
+            "rain_mm": [0.1, np.nan, 0.0, 0.2, np.nan],
+        }
+    )
+    diagnostics = compute_diagnostics(rain)
+    assert diagnostics.columns.tolist() == ["station", "year", "coverage"] + list(
+        range(1, 13)
+    )
+    assert diagnostics["station"].tolist() == ["P01", "P02", "P01"]
+    assert diagnostics["year"].tolist() == [2018, 2018, 2019]
+    np.testing.assert_allclose(diagnostics["coverage"], [2 / 3, 0.0, 1.0])
+    # records in January, March (P01, 2018), May (P02, 2018) and February (P01,
+    # 2019), the other months have no records for any station/year
+    norain = diagnostics[list(range(1, 13))].to_numpy()
+    nan = np.nan
+    expected = [
+        [0, nan, 1, 1, nan, 1, 1, 1, 1, 1, 1, 1],
+        [nan, nan, nan, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [nan, 0, nan, 1, nan, 1, 1, 1, 1, 1, 1, 1],
+    ]
+    np.testing.assert_array_equal(norain, expected)
+
+
+def test_compute_diagnostics_grid():
+    """Coverage of dense time series relative to the time steps of the year"""
+    datetimes = pd.date_range("2020-01-01", "2020-12-31 23:50", freq="10min")
+    rain = pd.DataFrame({"datetime": datetimes, "station": "P01", "rain_mm": 0.0})
+    rain.loc[: len(rain) // 4 - 1, "rain_mm"] = np.nan
+    rain = rain.iloc[: len(rain) // 2]
+
+    diagnostics = compute_diagnostics(rain, grid="10min")
+    assert diagnostics["coverage"].tolist() == [0.25]
+    assert compute_diagnostics(rain)["coverage"].tolist() == [0.5]
+
+
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_write_erosivity_legacy_format(dummy_erosivity, tmp_path, monkeypatch, backend):
+    """Legacy output equals the formatting of each value, for serial and parallel
+    writing"""
+    write_erosivity_data(dummy_erosivity, tmp_path / "serial")
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    write_erosivity_data(
+        dummy_erosivity, tmp_path / "parallel", n_jobs=2, backend=backend
+    )
+
+    for (station, year), group in dummy_erosivity.groupby(["station", "year"]):
+        days_since = _days_since_start_year(group["datetime"])
+        expected = "".join(
+            f"{days:.3f} {erosivity:.2f} {rain:.1f}\n"
+            for days, erosivity, rain in zip(
+                days_since, group["erosivity_cum"], group["all_event_rain_cum"]
+            )
+        )
+        for folder in ["serial", "parallel"]:
+            file_path = tmp_path / folder / f"{station}_{year}.csv"
+            assert file_path.read_text() == expected
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+def test_write_erosivity_file_format(dummy_erosivity, tmp_path, file_format):
+    """Erosivity is written to a single Parquet or Feather file"""
+    pytest.importorskip("pyarrow")
+    write_erosivity_data(dummy_erosivity, tmp_path, file_format=file_format)
+    written = getattr(pd, f"read_{file_format}")(tmp_path / f"erosivity.{file_format}")
+    assert written.columns.tolist() == [
+        "station",
+        "year",
+        "datetime",
+        "days_since",
+        "erosivity_cum",
+        "all_event_rain_cum",
+    ]
+    days_since = dummy_erosivity.groupby("year")["datetime"].transform(
+        _days_since_start_year
+    )
+    np.testing.assert_allclose(written["days_since"], days_since)
+    pd.testing.assert_series_equal(
+        written["erosivity_cum"], dummy_erosivity["erosivity_cum"]
+    )
+
+
+def test_write_erosivity_file_format_unknown(dummy_erosivity, tmp_path):
+    """Unsupported output formats raise an error"""
+    with pytest.raises(ValueError) as excinfo:
+        write_erosivity_data(dummy_erosivity, tmp_path, file_format="csv")
+    assert "File format 'csv' not supported" in str(excinfo.value)
+
+
 def test_rfactor_from_erosivity(dummy_erosivity):
     """Latest erosivity of a station at the end of the year returns station/year
     sorted output of rfactor values"""
@@ -79,6 +186,18 @@ def test_rfactor_from_erosivity(dummy_erosivity):
     pd.testing.assert_frame_equal(get_rfactor_station_year(dummy_erosivity), reference)
 
 
+def test_rfactor_from_erosivity_compact(dummy_erosivity, tmp_path):
+    """Categorical station and int16 year are preserved"""
+    erosivity = dummy_erosivity.astype({"station": "category", "year": np.int16})
+    rfactor = get_rfactor_station_year(erosivity, stations=["P01_001", "P01_003"])
+    assert isinstance(rfactor["station"].dtype, pd.CategoricalDtype)
+    assert rfactor["year"].dtype == np.int16
+    assert len(rfactor) == 2
+
+    write_erosivity_data(erosivity, tmp_path)
+    assert len(list(tmp_path.glob("*.csv"))) == 5
+
+
 def test_rfactor_from_erosivity_subset(dummy_erosivity):
     """Only a given subset of stations/years as output"""
 
@@ -107,6 +226,218 @@ def test_rfactor_from_erosivity_subset_not_existing(dummy_erosivity):
     assert "1991" in str(excinfo.value)
 
 
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize(
+    "stations,years",
+    [(None, None), (["P01_003", "P01_001"], None), (None, [2005, 2009])],
+)
+def test_erosivity_store(dummy_erosivity, compact, stations, years):
+    """Subset queries of the erosivity store equal get_rfactor_station_year"""
+    erosivity = dummy_erosivity
+    if compact:
+        erosivity = erosivity.astype({"station": "category", "year": np.int16})
+    store = ErosivityStore(erosivity)
+    pd.testing.assert_frame_equal(
+        store.rfactor_station_year(stations, years),
+        get_rfactor_station_year(erosivity, stations, years),
+    )
+
+
+def test_erosivity_store_queries(dummy_erosivity):
+    """Events of a station/year, statistics per station and unknown keys"""
+    store = ErosivityStore(dummy_erosivity)
+    events = store.station_year_events("P01_003", 2005)
+    pd.testing.assert_frame_equal(events, dummy_erosivity.iloc[2:4])
+
+    statistics = store.station_statistics(years=[2005])
+    assert statistics.columns.tolist() == ["station", "years", "mean", "median"]
+    assert statistics["station"].tolist() == ["P01_003", "P01_010", "P01_015"]
+    assert statistics["mean"].tolist() == [3.467279, 2.419160, 4.406269]
+
+    with pytest.raises(KeyError) as excinfo:
+        store.rfactor_station_year(stations=["UNEXISTING STATION"])
+    assert "UNEXISTING STATION" in str(excinfo.value)
+    with pytest.raises(KeyError) as excinfo:
+        store.rfactor_station_year(years=[1991])
+    assert "1991" in str(excinfo.value)
+    with pytest.raises(KeyError) as excinfo:
+        store.station_year_events("P01_003", 2018)
+    assert "not part of data set" in str(excinfo.value)
+
+
+@pytest.fixture()
+def annual_rfactor():
+    """Annual R-factor of three stations, one station without data in 2002"""
+    rng = np.random.default_rng(0)
+    rfactor = pd.DataFrame(
+        {
+            "year": np.tile(np.arange(2000, 2012), 3),
+            "station": np.repeat(["P01_001", "P01_003", "P01_010"], 12),
+            "erosivity_cum": rng.gamma(4, 250, 36),
+        }
+    )
+    return rfactor.drop(index=14).reset_index(drop=True)
+
+
+def test_bootstrap_rfactor(annual_rfactor):
+    """Bootstrap equals a loop over the resampled years of each station"""
+    intervals = bootstrap_rfactor(
+        annual_rfactor,
+        n_resamples=200,
+        networks={"P01": ["P01_001", "P01_003"]},
+        seed=1,
+    )
+    assert intervals["station"].tolist() == ["P01_001", "P01_003", "P01_010", "P01"]
+    assert intervals["years"].tolist() == [12, 11, 12, 12]
+
+    annual = annual_rfactor.pivot(index="year", columns="station")["erosivity_cum"]
+    annual["P01"] = annual[["P01_001", "P01_003"]].mean(axis=1)
+    indices = np.random.default_rng(1).integers(0, 12, size=(200, 12))
+    means = np.array([annual.iloc[rows].mean().to_numpy() for rows in indices])
+    np.testing.assert_allclose(intervals["mean"], annual.mean())
+    np.testing.assert_allclose(intervals["std_error"], means.std(axis=0, ddof=1))
+    np.testing.assert_allclose(intervals["ci_lower"], np.percentile(means, 2.5, axis=0))
+    np.testing.assert_allclose(
+        intervals["ci_upper"], np.percentile(means, 97.5, axis=0)
+    )
+
+
+def test_bootstrap_rfactor_options(annual_rfactor):
+    """Seeded resamples are reproducible, network of all stations by default"""
+    intervals = bootstrap_rfactor(annual_rfactor, block_size=3, seed=42)
+    pd.testing.assert_frame_equal(
+        intervals, bootstrap_rfactor(annual_rfactor, block_size=3, seed=42)
+    )
+    assert intervals["station"].iloc[-1] == "all"
+    assert (intervals["ci_lower"] < intervals["mean"]).all()
+    assert (intervals["mean"] < intervals["ci_upper"]).all()
+    assert len(bootstrap_rfactor(annual_rfactor, networks={})) == 3
+
+    with pytest.raises(KeyError) as excinfo:
+        bootstrap_rfactor(annual_rfactor, networks={"P02": ["P02_001"]})
+    assert "P02_001" in str(excinfo.value)
+    with pytest.raises(ValueError) as excinfo:
+        bootstrap_rfactor(annual_rfactor, networks={"P01_010": ["P01_001"]})
+    assert "Network name 'P01_010' is a station" in str(excinfo.value)
+    with pytest.raises(ValueError):
+        bootstrap_rfactor(annual_rfactor, block_size=13)
+    with pytest.raises(ValueError):
+        bootstrap_rfactor(annual_rfactor, confidence=1.5)
+
+
+@pytest.fixture()
+def event_erosivity():
+    """Erosivity of events of two stations, indexed on the event start"""
+    dates = [
+        "2018-01-10 14:30",
+        "2018-01-20 16:30",
+        "2018-05-16 00:10",
+        "2018-10-01 12:00",
+        "2019-03-02 08:40",
+        "2018-02-01 19:00",
+    ]
+    erosivity = pd.DataFrame(
+        {
+            "station": ["P01_001"] * 5 + ["P01_003"],
+            "year": [2018, 2018, 2018, 2018, 2019, 2018],
+            "erosivity": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        },
+        index=pd.DatetimeIndex(pd.to_datetime(dates), name="datetime"),
+    )
+    return erosivity
+
+
+def test_erosivity_distribution(event_erosivity):
+    """Erosivity and fraction of the annual erosivity per half-month"""
+    distribution, average = compute_erosivity_distribution(event_erosivity)
+    assert distribution.columns.tolist() == [
+        "station",
+        "year",
+        "period",
+        "erosivity",
+        "fraction",
+    ]
+    assert len(distribution) == 3 * 24
+    assert distribution["period"].tolist()[:25] == list(range(1, 25)) + [1]
+    rfactor = distribution.groupby(["station", "year"])["erosivity"].sum()
+    assert rfactor.tolist() == [10.0, 5.0, 6.0]
+    np.testing.assert_allclose(
+        distribution.groupby(["station", "year"])["fraction"].sum(), 1.0
+    )
+    subset = distribution.set_index(["station", "year", "period"])["erosivity"]
+    assert subset.loc[("P01_001", 2018, 1)] == 1.0
+    assert subset.loc[("P01_001", 2018, 2)] == 2.0
+    assert subset.loc[("P01_001", 2018, 10)] == 3.0
+    assert subset.loc[("P01_001", 2018, 19)] == 4.0
+    assert subset.loc[("P01_003", 2018, 3)] == 6.0
+
+    assert average["period"].tolist() == list(range(1, 25))
+    assert average.loc[0, "erosivity"] == pytest.approx(1.0 / 3)
+    assert average["fraction"].sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "periods,rfactor",
+    [
+        ("month", [("P01_001", 2018, 10.0), ("P01_001", 2019, 5.0)]),
+        ("hydrological-year", [("P01_001", 2017, 6.0), ("P01_001", 2018, 9.0)]),
+        ("growing-season", [("P01_001", 2017, 3.0), ("P01_001", 2018, 12.0)]),
+        ([(10, 1), (4, 1)], [("P01_001", 2017, 3.0), ("P01_001", 2018, 12.0)]),
+    ],
+)
+def test_erosivity_distribution_periods(event_erosivity, periods, rfactor):
+    """Years start with the first period, events before the first period belong
+    to the last period of the previous year"""
+    distribution, _ = compute_erosivity_distribution(
+        event_erosivity, periods, complete_years=False
+    )
+    annual = distribution.groupby(["station", "year"])["erosivity"].sum()
+    assert [(*key, value) for key, value in annual.items()] == rfactor + [
+        ("P01_003", rfactor[0][1], 6.0)
+    ]
+
+
+def test_erosivity_distribution_growing_season(event_erosivity):
+    """Erosivity within and outside the growing season"""
+    distribution, _ = compute_erosivity_distribution(
+        event_erosivity, "growing-season", complete_years=False
+    )
+    station = distribution[distribution["station"] == "P01_001"]
+    assert station["year"].tolist() == [2017, 2017, 2018, 2018]
+    assert station["period"].tolist() == [1, 2, 1, 2]
+    assert station["erosivity"].tolist() == [0.0, 3.0, 3.0, 9.0]
+
+
+def test_erosivity_distribution_complete_years(event_erosivity):
+    """Hydrological years partially covered by the calendar years are removed"""
+    distribution, average = compute_erosivity_distribution(
+        event_erosivity, "hydrological-year"
+    )
+    assert distribution[["station", "year"]].values.tolist() == [["P01_001", 2018]]
+    assert distribution["erosivity"].tolist() == [4.0 + 5.0]
+    assert average["erosivity"].tolist() == [4.0 + 5.0]
+
+    # calendar years are complete
+    distribution, _ = compute_erosivity_distribution(event_erosivity, "month")
+    annual = distribution.groupby(["station", "year"])["erosivity"].sum()
+    assert annual.index.tolist() == [
+        ("P01_001", 2018),
+        ("P01_001", 2019),
+        ("P01_003", 2018),
+    ]
+
+
+def test_erosivity_distribution_unknown_period(event_erosivity):
+    """Unknown or invalid periods raise an error"""
+    with pytest.raises(KeyError) as excinfo:
+        compute_erosivity_distribution(event_erosivity, "week")
+    assert "Period 'week' not supported" in str(excinfo.value)
+    with pytest.raises(ValueError):
+        compute_erosivity_distribution(event_erosivity, [(4, 1), (4, 1)])
+    with pytest.raises(ValueError):
+        compute_erosivity_distribution(event_erosivity, [(2, 30)])
+
+
 def test_rainfall_statistics(rain_data_folder_matlab):
     """"""
     rainfall_data = load_rain_folder(
@@ -1,17 +1,28 @@
+import gzip
+import io
+import tarfile
 import textwrap
+import zipfile
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import pytest
 
+from rfactor import parallel
+from rfactor.archive import find_rain_files, rain_file_stat
 from rfactor.rain import (
     _check_path,
     _extract_metadata_from_file_path,
+    _remove_long_gaps,
+    compact_rain,
+    iter_rain_folder,
     load_rain_file,
     load_rain_file_flanders,
     load_rain_file_matlab_legacy,
     load_rain_folder,
+    load_rain_store,
+    write_rain_store,
 )
 
 
@@ -22,6 +33,8 @@ from rfactor.rain import (
         ("U_K_K_E_L_1998.txt", "U_K_K_E_L", "1998"),
         ("U_K_K_E_L_1998.txt", "U_K_K_E_L", "1998"),
         ("UK-KEL_1998.txt", "UK-KEL", "1998"),
+        ("UKKEL_2002.txt.gz", "UKKEL", "2002"),
+        ("UKKEL_2002.txt.zst", "UKKEL", "2002"),
     ],
 )
 def test_extract_metadata_from_file_path(file_name, station, year):
@@ -186,6 +199,75 @@ class TestLoadRainFlandersSanitize:
         )
         pd.testing.assert_frame_equal(rainfall_data.reset_index(drop=True), expected)
 
+    def test_rain_flanders_datetime_format(self, tmp_path):
+        """Datetime format is derived from the first value or set explicitly."""
+        example_rain_path = tmp_path / "D1_2021.txt"
+        example_rain_data = """\
+            01-02-2021 00:00:00\t1.0
+            13-02-2021 00:10:00\t2.0
+            """
+        with open(example_rain_path, "w") as rain:
+            rain.write(textwrap.dedent(example_rain_data))
+
+        with pytest.raises(ValueError) as excinfo:
+            load_rain_file_flanders(example_rain_path)
+        assert "doesn't match format" in str(excinfo.value)
+
+        rainfall_data = load_rain_file_flanders(
+            example_rain_path, datetime_format="%d-%m-%Y %H:%M:%S"
+        )
+        assert rainfall_data["datetime"].tolist() == [
+            pd.Timestamp("2021-02-01 00:00:00"),
+            pd.Timestamp("2021-02-13 00:10:00"),
+        ]
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 3, 5, 100])
+@pytest.mark.parametrize(
+    "interpolate,interval", [(None, np.inf), ("pad", 2), ("linear", 1), ("index", 3)]
+)
+def test_load_rain_file_flanders_chunks(tmp_path, chunksize, interpolate, interval):
+    """Reading in chunks provides the same rainfall data as reading the complete
+    file, also for NaN-gaps crossing the chunk boundaries"""
+    example_rain_path = tmp_path / "D1_2021.txt"
+    rain = ["", "1.0", "", "", "5.", "0.0", "", "", "", "2.0", "-1", "", "3.5", ""]
+    dates = pd.date_range("2021-01-01", periods=len(rain), freq="10min")
+    example_rain_path.write_text(
+        "".join(
+            f"{date:%Y-%m-%d %H:%M:%S}\t{value}\n" for date, value in zip(dates, rain)
+        )
+    )
+
+    rainfall_data = load_rain_file_flanders(
+        example_rain_path, interpolate=interpolate, interval=interval
+    )
+    rainfall_data_chunks = load_rain_file_flanders(
+        example_rain_path,
+        interpolate=interpolate,
+        interval=interval,
+        chunksize=chunksize,
+    )
+    pd.testing.assert_frame_equal(rainfall_data_chunks, rainfall_data)
+
+    with pytest.raises(ValueError) as excinfo:
+        load_rain_file_flanders(example_rain_path, interpolate="cubic", chunksize=2)
+    assert "'cubic' is not supported when reading in chunks" in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    "interval,expected",
+    [
+        (np.inf, [True] * 9),
+        (2, [False, False, False, True, True, True, False, False, False]),
+        (3, [True] * 9),
+        (0, [False, False, False, True, False, True, False, False, False]),
+    ],
+)
+def test_remove_long_gaps(interval, expected):
+    """Records of NaN-runs longer than the interval are removed"""
+    rain = np.array([np.nan] * 3 + [1.0, np.nan, 2.0] + [np.nan] * 3)
+    np.testing.assert_array_equal(_remove_long_gaps(rain, interval), expected)
+
 
 def test_load_rain_file_with_folder(rain_data_folder_matlab):
     """When input is a file, should return ValueError to user"""
@@ -240,6 +322,277 @@ def test_load_rain_folder(
     )
 
 
+@pytest.mark.parametrize("float32", [False, True])
+def test_load_rain_folder_compact(rain_data_folder_matlab, float32):
+    """Compact schema provides the same rainfall data with categorical station and
+    tag"""
+    rainfall_data = load_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy
+    )
+    compact_data = load_rain_folder(
+        rain_data_folder_matlab,
+        load_rain_file_matlab_legacy,
+        compact=True,
+        float32=float32,
+    )
+    assert isinstance(compact_data["station"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact_data["tag"].dtype, pd.CategoricalDtype)
+    assert compact_data["year"].dtype == np.int16
+    assert compact_data["rain_mm"].dtype == (np.float32 if float32 else np.float64)
+    assert list(compact_data["tag"].cat.categories) == [
+        "station_0_2020",
+        "station_1_2021",
+    ]
+    pd.testing.assert_frame_equal(
+        compact_data, rainfall_data, check_dtype=False, check_categorical=False
+    )
+
+
+def test_compact_rain(dummy_rain):
+    """Tag of the compact schema is derived from the station and year"""
+    rain = pd.concat(
+        [
+            dummy_rain.assign(station="B"),
+            dummy_rain.assign(datetime=dummy_rain["datetime"] + pd.DateOffset(years=1)),
+        ]
+    )
+    compact = compact_rain(rain)
+    assert list(compact["station"].cat.categories) == ["B", "P01_001"]
+    assert list(compact["tag"].unique()) == ["B_2018", "P01_001_2019"]
+    assert compact["tag"].iloc[0] == "B_2018"
+    assert compact["tag"].iloc[-1] == "P01_001_2019"
+
+
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_load_rain_folder_parallel(rain_data_folder_matlab, monkeypatch, backend):
+    """Parallel loading of the files provides the same rainfall data"""
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    rainfall_data = load_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy
+    )
+    rainfall_data_parallel = load_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy, n_jobs=2, backend=backend
+    )
+    pd.testing.assert_frame_equal(rainfall_data, rainfall_data_parallel)
+
+
+def test_load_rain_folder_order(tmp_path):
+    """Rainfall data is ordered by station and datetime, also for unordered files
+    and files of a station overlapping in time"""
+    example_data = {
+        "b_2020.txt": "5 1.0\n1 0.5\n",
+        "a_2021.txt": "3 1.0\n",
+        "a_2020.txt": "2 1.0\n4 2.0\n",
+    }
+    for file_name, data in example_data.items():
+        (tmp_path / file_name).write_text(data)
+    rainfall_data = load_rain_folder(tmp_path, load_rain_file_matlab_legacy)
+    assert list(rainfall_data["tag"]) == [
+        "a_2020",
+        "a_2020",
+        "a_2021",
+        "b_2020",
+        "b_2020",
+    ]
+    assert rainfall_data["rain_mm"].tolist() == [1.0, 2.0, 1.0, 0.5, 1.0]
+
+    # files of station 'a' overlapping in time
+    def load_fun(file_path):
+        rain = load_rain_file_matlab_legacy(file_path)
+        if file_path.stem == "a_2021":
+            rain["datetime"] = rain["datetime"] - pd.DateOffset(years=1)
+        return rain
+
+    rainfall_data = load_rain_folder(tmp_path, load_fun)
+    assert rainfall_data["tag"].tolist() == ["a_2020"] * 3 + ["b_2020"] * 2
+    assert rainfall_data["rain_mm"].tolist() == [1.0, 1.0, 2.0, 0.5, 1.0]
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_load_rain_file_matlab_legacy_engines(rain_data_file_matlab, mmap):
+    """Fast parser provides the same rainfall data as pandas"""
+    rain = load_rain_file_matlab_legacy(rain_data_file_matlab, engine="pandas")
+    rain_fast = load_rain_file_matlab_legacy(rain_data_file_matlab, mmap=mmap)
+    pd.testing.assert_frame_equal(rain, rain_fast, check_exact=True)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "10 0.1\n20 12.25\n525600 0.001",
+        "10 0.1\r\n20 .25\r\n",
+        "10 0.1\n\n20 0.2\n",
+        "10.0 0.1\n20 0.2\n",
+        "10 1\n20 2\n",
+        "10 nan\n",
+        "",
+    ],
+)
+@pytest.mark.parametrize("mmap", [False, True])
+def test_load_rain_file_matlab_legacy_irregular(tmp_path, data, mmap):
+    """Fast parser falls back to pandas for files not in the regular format"""
+    file_path = tmp_path / "P01_001_2019.txt"
+    file_path.write_bytes(data.encode())
+    rain = load_rain_file_matlab_legacy(file_path, engine="pandas")
+    rain_fast = load_rain_file_matlab_legacy(file_path, mmap=mmap)
+    pd.testing.assert_frame_equal(rain, rain_fast, check_exact=True)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "pandas"])
+def test_load_rain_file_matlab_legacy_errors(tmp_path, engine):
+    """Both engines raise the same errors for invalid files"""
+    file_path = tmp_path / "P01_001_2019.txt"
+    file_path.write_text(" 0.1\n10 0.2\n")
+    with pytest.raises(IOError) as excinfo:
+        load_rain_file_matlab_legacy(file_path, engine=engine)
+    assert "column contains NaN-values" in str(excinfo.value)
+
+    file_path.write_text("10\t0.1\n")
+    with pytest.raises(ValueError) as excinfo:
+        load_rain_file_matlab_legacy(file_path, engine=engine)
+    assert "Unable to parse string" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        load_rain_file_matlab_legacy(file_path, engine="fortran")
+    assert "Engine 'fortran' not supported" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_iter_rain_folder(tmp_path, compact):
+    """Rainfall data of a folder is provided per station/year, equal to the
+    rainfall data of the complete folder"""
+    example_data = {
+        "b_2020.txt": "5 1.0\n1 0.5\n",
+        "a_2021.txt": "3 1.0\n",
+        "a_2020.txt": "2 1.0\n4 2.0\n",
+    }
+    for file_name, data in example_data.items():
+        (tmp_path / file_name).write_text(data)
+    rain_parts = iter_rain_folder(tmp_path, load_rain_file_matlab_legacy, compact)
+    assert not isinstance(rain_parts, pd.DataFrame)
+
+    rain_parts = list(rain_parts)
+    assert [part["tag"].unique().tolist() for part in rain_parts] == [
+        ["a_2020"],
+        ["a_2021"],
+        ["b_2020"],
+    ]
+    rain = load_rain_folder(tmp_path, load_rain_file_matlab_legacy, compact)
+    # the categories of the compact schema differ between the parts
+    pd.testing.assert_frame_equal(
+        pd.concat(rain_parts, ignore_index=True),
+        rain,
+        check_dtype=not compact,
+        check_categorical=False,
+    )
+
+
+def test_iter_rain_folder_non_existing(data_folder_non_existing):
+    """Folder is checked when creating the iterator"""
+    with pytest.raises(FileNotFoundError) as excinfo:
+        iter_rain_folder(data_folder_non_existing, load_rain_file_matlab_legacy)
+    assert "does not exists" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "pandas"])
+def test_load_rain_folder_compressed(rain_data_folder_matlab, tmp_path, engine):
+    """Compressed files and files in archives are loaded without extracting"""
+    folder = tmp_path / "compressed"
+    folder.mkdir()
+    file_2020, file_2021 = sorted(rain_data_folder_matlab.glob("*.txt"))
+    (folder / f"{file_2020.name}.gz").write_bytes(gzip.compress(file_2020.read_bytes()))
+    with zipfile.ZipFile(folder / "network.zip", "w") as bundle:
+        bundle.write(file_2021, file_2021.name)
+
+    rainfall_data = load_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy
+    )
+    rainfall_data_compressed = load_rain_folder(
+        folder, load_rain_file_matlab_legacy, engine=engine
+    )
+    pd.testing.assert_frame_equal(rainfall_data_compressed, rainfall_data)
+
+
+def test_load_rain_folder_tar_single_pass(tmp_path, monkeypatch):
+    """A tar archive with multiple rain files is indexed once and read once"""
+    folder = tmp_path / "tar"
+    folder.mkdir()
+    rain_data = b"1 1.00\n2 0.20\n525599 10.00\n"
+    with tarfile.open(folder / "network.tar.gz", "w:gz") as bundle:
+        for idx in range(20):
+            info = tarfile.TarInfo(f"station_{idx}_2020.txt")
+            info.size = len(rain_data)
+            bundle.addfile(info, io.BytesIO(rain_data))
+
+    opened = []
+    tar_open = tarfile.open
+    monkeypatch.setattr(
+        tarfile,
+        "open",
+        lambda name, *args, **kw: opened.append(name) or tar_open(name, *args, **kw),
+    )
+    files = find_rain_files(folder)
+    assert len(files) == 20
+    assert [rain_file_stat(file_path)[0] for file_path in files] == [
+        len(rain_data)
+    ] * 20
+    assert len(opened) == 1
+
+    rain = load_rain_folder(folder, load_rain_file_matlab_legacy)
+    assert len(opened) == 2
+    assert rain["station"].nunique() == 20
+    assert rain["rain_mm"].sum() == pytest.approx(20 * 11.2)
+
+
+def test_rain_store(rain_data_folder_matlab, tmp_path):
+    """Rain store provides the records of each station/year as memory mapped
+    views, equal to the (float32) rainfall data of the folder"""
+    rain = load_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy)
+    write_rain_store(
+        iter_rain_folder(rain_data_folder_matlab, load_rain_file_matlab_legacy),
+        tmp_path / "store",
+    )
+    store = load_rain_store(tmp_path / "store")
+    assert len(store) == 2
+    assert store.index.columns.tolist() == ["station", "year", "offset", "length"]
+    assert ("station_0", 2020) in store
+
+    minutes, rain_mm = store.arrays("station_1", 2021)
+    assert minutes.dtype == np.int32 and rain_mm.dtype == np.float32
+    assert np.shares_memory(minutes, store.data)
+    assert np.shares_memory(rain_mm, store.data)
+    expected = rain[["datetime", "station", "rain_mm"]].astype(
+        {"datetime": "datetime64[ns]", "rain_mm": np.float32}
+    )
+    pd.testing.assert_frame_equal(store.to_frame(), expected)
+    pd.testing.assert_frame_equal(
+        store.get("station_1", 2021),
+        expected[expected["station"] == "station_1"].reset_index(drop=True),
+    )
+    with pytest.raises(KeyError) as excinfo:
+        store.arrays("station_1", 2020)
+    assert "Station 'station_1' and year 2020 not in rain store" in str(excinfo.value)
+
+
+def test_rain_store_invalid(dummy_rain, tmp_path):
+    """Records of a rain store are in whole minutes, non-zero and of a single
+    part"""
+    with pytest.raises(ValueError) as excinfo:
+        write_rain_store(
+            dummy_rain.assign(datetime=dummy_rain["datetime"] + pd.Timedelta("1s")),
+            tmp_path,
+        )
+    assert "requires whole minutes" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        write_rain_store(dummy_rain.assign(rain_mm=0.0), tmp_path)
+    assert "Can only store non-zero/non-NULL timeseries" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        write_rain_store([dummy_rain, dummy_rain], tmp_path)
+    assert "are part of multiple parts" in str(excinfo.value)
+
+
 def test_load_rain_folder_with_file(rain_data_file_matlab):
     """When input is a file, should return ValueError to user"""
     with pytest.raises(ValueError) as excinfo:
@@ -3,20 +3,33 @@ import pandas as pd
 import pytest
 from pytest import approx
 
+import rfactor.rfactor
 from rfactor import (
     compute_erosivity,
+    compute_erosivity_methods,
+    jit,
     maximum_intensity,
+    maximum_intensity_batched,
+    maximum_intensity_interpolate,
     maximum_intensity_matlab_clone,
+    parallel,
     rain_energy_brown_and_foster1987,
     rain_energy_mcgregor1995,
     rain_energy_verstraeten2006,
+    segment_energy_method,
 )
+from rfactor.rain import compact_rain, write_rain_store
 from rfactor.rfactor import (
+    _EVENT_INTENSITY_METHODS,
     RFactorInputError,
     RFactorKeyError,
     RFactorTypeError,
     _apply_rfactor,
     _compute_erosivity,
+    _compute_erosivity_pandas,
+    _event_offsets,
+    _maximum_intensity_matlab_events,
+    _minutes_since_start_year,
 )
 
 
@@ -35,6 +48,86 @@ def test_rain_energy_per_unit_depth(rain, energy):
     assert energy == approx(rain_energy_verstraeten2006(rain), nan_ok=True, abs=1e-5)
 
 
+@pytest.mark.parametrize(
+    "energy_method",
+    [
+        rain_energy_verstraeten2006,
+        rain_energy_mcgregor1995,
+        rain_energy_brown_and_foster1987,
+    ],
+)
+def test_rain_energy_segments(energy_method):
+    """Energy of all events at once equals the energy of each event separately"""
+    rain = np.array([0.1, 1.5, 0.2, 3.0, 0.7, 0.4, 2.2, 0.9, 1.1, 0.3, 0.5, 4.0])
+    offsets = np.array([0, 1, 3, 10])
+    expected = [energy_method(event) for event in np.split(rain, offsets[1:])]
+
+    energy = energy_method(rain, offsets)
+    np.testing.assert_allclose(energy, expected, rtol=1e-12)
+    assert energy_method(rain, np.zeros(0, dtype=np.int64)).shape == (0,)
+    assert energy_method.segment_reduction
+
+
+@pytest.mark.parametrize("engine", ["numpy", "pandas"])
+def test_compute_erosivity_energy_contracts(dummy_rain, engine):
+    """User defined scalar and segment energy methods provide the same output"""
+
+    def energy_scalar(rain):
+        return (0.29 * rain).sum()
+
+    @segment_energy_method
+    def energy_segments(rain, offsets):
+        return np.add.reduceat(0.29 * rain, offsets)
+
+    erosivity = compute_erosivity(dummy_rain, energy_scalar, engine=engine)
+    erosivity_segments = compute_erosivity(dummy_rain, energy_segments, engine=engine)
+    pd.testing.assert_frame_equal(erosivity, erosivity_segments)
+    np.testing.assert_allclose(erosivity["event_energy"], [0.29 * 2.27])
+
+
+def test_compute_erosivity_default_intensity(dummy_rain):
+    """The batched default intensity method equals calling it for each event"""
+    rain = pd.concat(
+        [
+            dummy_rain.assign(
+                datetime=dummy_rain["datetime"] + pd.Timedelta(days=2 * idx),
+                rain_mm=dummy_rain["rain_mm"] * (1 + idx / 4),
+            )
+            for idx in range(8)
+        ],
+        ignore_index=True,
+    )
+    assert maximum_intensity in _EVENT_INTENSITY_METHODS
+
+    erosivity = compute_erosivity(rain, intensity_method=maximum_intensity)
+    erosivity_per_event = compute_erosivity(
+        rain, intensity_method=lambda df: maximum_intensity(df)
+    )
+    assert len(erosivity) == 15
+    pd.testing.assert_frame_equal(erosivity, erosivity_per_event, rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "energy_method",
+    [
+        rain_energy_verstraeten2006,
+        rain_energy_mcgregor1995,
+        rain_energy_brown_and_foster1987,
+    ],
+)
+def test_compute_erosivity_pandas_energy(dummy_rain, energy_method, monkeypatch):
+    """The reference engine calls the built-in energy methods for each event,
+    independent of their segment reduction"""
+
+    def _segment_reduction(*args):
+        raise AssertionError("segment reduction called")
+
+    erosivity = compute_erosivity(dummy_rain, energy_method)
+    monkeypatch.setattr(rfactor.rfactor, "_energy_single_event", _segment_reduction)
+    erosivity_pandas = compute_erosivity(dummy_rain, energy_method, engine="pandas")
+    pd.testing.assert_frame_equal(erosivity, erosivity_pandas)
+
+
 @pytest.mark.parametrize(
     "rain_mm,intensity",
     [(np.ones(30), 6.0), (np.zeros(30), 0.0), (np.arange(30), 168.0)],
@@ -51,6 +144,7 @@ def test_maximum_intensity(rain_mm, intensity):
         }
     )
     assert intensity == approx(maximum_intensity(df), nan_ok=True, abs=1e-5)
+    assert intensity == approx(maximum_intensity_batched(df), nan_ok=True, abs=1e-5)
     assert intensity == approx(
         maximum_intensity_matlab_clone(df), nan_ok=True, abs=1e-5
     )
@@ -72,6 +166,7 @@ def test_maximum_intensity_nan():
         }
     )
     assert 168.0 == approx(maximum_intensity(df), abs=1e-5)
+    assert 168.0 == approx(maximum_intensity_batched(df), abs=1e-5)
     with pytest.raises(Exception) as excinfo:
         maximum_intensity_matlab_clone(df)
     assert "does not support Nan values" in str(excinfo.value)
@@ -86,6 +181,7 @@ def test_maximum_intensity_nan():
         }
     )
     assert np.nan == approx(maximum_intensity(df), nan_ok=True, abs=1e-5)
+    assert np.nan == approx(maximum_intensity_batched(df), nan_ok=True, abs=1e-5)
 
 
 def test_maximum_intensity_matlab_multiple_years():
@@ -117,9 +213,64 @@ def test_maximum_intensity_short():
         }
     )
     assert 4.0 == approx(maximum_intensity(df), abs=1e-5)
+    assert 4.0 == approx(maximum_intensity_batched(df), abs=1e-5)
     assert 4.0 == approx(maximum_intensity_matlab_clone(df), abs=1e-5)
 
 
+@pytest.mark.parametrize(
+    "intensity_method", [maximum_intensity_interpolate, maximum_intensity_matlab_clone]
+)
+def test_maximum_intensity_matlab_input_unchanged(intensity_method):
+    """Matlab intensity methods do not add columns to the input DataFrame"""
+    df = pd.DataFrame(
+        {
+            "datetime": pd.date_range(
+                start="2021-01-01 00:00", periods=30, freq="10min"
+            ),
+            "rain_mm": np.ones(30),
+            "event_rain_cum": np.cumsum(np.ones(30)),
+        }
+    )
+    intensity_method(df)
+    assert list(df.columns) == ["datetime", "rain_mm", "event_rain_cum"]
+
+
+@pytest.mark.parametrize(
+    "intensity_method,clone",
+    [(maximum_intensity_interpolate, False), (maximum_intensity_matlab_clone, True)],
+)
+def test_maximum_intensity_matlab_events(dummy_rain, intensity_method, clone):
+    """Matlab intensity of all events at once equals the intensity per event"""
+    dummy_rain["datetime"] = dummy_rain["datetime"] + pd.to_timedelta(
+        np.repeat([0, 1, 2], [5, 2, 7]), unit="D"
+    )
+    offsets = np.array([0, 5, 7])
+    event_ids = np.repeat([0, 1, 2], [5, 2, 7])
+    dummy_rain["event_rain_cum"] = dummy_rain.groupby(event_ids)["rain_mm"].cumsum()
+
+    intensity = _maximum_intensity_matlab_events(
+        _minutes_since_start_year(dummy_rain),
+        dummy_rain["rain_mm"].to_numpy(),
+        dummy_rain["event_rain_cum"].to_numpy(),
+        offsets,
+        clone=clone,
+    )
+    reference = [intensity_method(event) for _, event in dummy_rain.groupby(event_ids)]
+    np.testing.assert_array_equal(intensity, reference)
+
+
+def test_maximum_intensity_batched(dummy_rain):
+    """Batched maximum intensity of all events equals the intensity per event"""
+    # two stations with overlapping timestamps
+    rain = pd.concat([dummy_rain, dummy_rain.assign(station="P01_002")])
+    event_ids = np.tile(np.repeat([0, 1, 2], [5, 2, 7]), 2) + np.repeat([0, 3], 14)
+    rain["rain_mm"] = rain["rain_mm"] * (1 + event_ids)
+
+    intensity = maximum_intensity_batched(rain["datetime"], rain["rain_mm"], event_ids)
+    reference = [maximum_intensity(event) for _, event in rain.groupby(event_ids)]
+    np.testing.assert_allclose(intensity, reference)
+
+
 def test_compute_erosivity_wrong_df():
     """Erosivity input DataFrame should contain 'datetime' and 'rain_mm' columns."""
     df = pd.DataFrame(
@@ -305,6 +456,245 @@ def test_rfactor_benchmark_single_year(
     ]
     pd.testing.assert_frame_equal(erosivity[cols], erosivity_support_func[cols])
 
+    # pandas reference engine provides the same output
+    erosivity_pandas = compute_erosivity(
+        rain, energy_method, intensity_method, engine="pandas"
+    )
+    pd.testing.assert_frame_equal(erosivity, erosivity_pandas)
+
+
+@pytest.mark.parametrize(
+    "energy_method",
+    [
+        rain_energy_verstraeten2006,
+        rain_energy_mcgregor1995,
+        rain_energy_brown_and_foster1987,
+    ],
+)
+@pytest.mark.parametrize(
+    "station,year", [("P01_001", 2018), ("P05_038", 2018), ("P11_024", 2012)]
+)
+def test_rfactor_benchmark_single_year_batched(
+    station, year, energy_method, rain_benchmark_closure, erosivity_benchmark_closure
+):
+    """Batched maximum intensity reproduces the benchmark of maximum_intensity"""
+    rain = rain_benchmark_closure(station, year)
+    eros_benchmark = erosivity_benchmark_closure(energy_method, maximum_intensity)
+    erosivity_reference = eros_benchmark[
+        (eros_benchmark["year"] == year) & (eros_benchmark["station"] == station)
+    ]
+
+    erosivity = compute_erosivity(rain, energy_method, maximum_intensity_batched)
+    cols = ["event_rain_cum", "max_30min_intensity", "erosivity", "erosivity_cum"]
+    pd.testing.assert_frame_equal(erosivity[cols], erosivity_reference[cols])
+
+
+@pytest.mark.parametrize(
+    "intensity_method",
+    [
+        maximum_intensity,
+        maximum_intensity_batched,
+        maximum_intensity_interpolate,
+        maximum_intensity_matlab_clone,
+    ],
+)
+@pytest.mark.parametrize(
+    "energy_method",
+    [
+        rain_energy_verstraeten2006,
+        rain_energy_mcgregor1995,
+        rain_energy_brown_and_foster1987,
+    ],
+)
+def test_compute_erosivity_engines(dummy_rain, energy_method, intensity_method):
+    """Array based and pandas reference engine provide the same events"""
+    erosivity = _compute_erosivity(dummy_rain, energy_method, intensity_method)
+    erosivity_pandas = _compute_erosivity_pandas(
+        dummy_rain, energy_method, intensity_method
+    )
+    pd.testing.assert_frame_equal(erosivity, erosivity_pandas)
+
+
+def test_compute_erosivity_event_threshold(dummy_rain):
+    """Events below the threshold are removed after the cumulative rain of all
+    events is derived"""
+    erosivity = _compute_erosivity(
+        dummy_rain, rain_energy_verstraeten2006, maximum_intensity
+    )
+    assert list(erosivity.index) == [2]
+    np.testing.assert_allclose(erosivity["event_rain_cum"], [2.27])
+    np.testing.assert_allclose(erosivity["all_event_rain_cum"], [3.35])
+    np.testing.assert_allclose(
+        erosivity["erosivity_cum"], erosivity["erosivity"].cumsum()
+    )
+
+
+def test_event_offsets():
+    """Events start at the first record and after each gap of at least 6 hours"""
+    timestamps = pd.to_datetime(
+        [
+            "2018-01-01 00:00",
+            "2018-01-01 00:10",
+            "2018-01-01 06:10",
+            "2018-01-01 12:09",
+            "2018-01-02 00:00",
+        ]
+    ).to_numpy(dtype="datetime64[ns]")
+    np.testing.assert_array_equal(
+        _event_offsets(timestamps.view(np.int64)), np.array([0, 2, 4])
+    )
+    assert len(_event_offsets(np.zeros(0, dtype=np.int64))) == 0
+
+
+@pytest.mark.parametrize(
+    "energy_method",
+    [
+        rain_energy_verstraeten2006,
+        rain_energy_mcgregor1995,
+        rain_energy_brown_and_foster1987,
+    ],
+)
+def test_compute_erosivity_numba(dummy_rain, energy_method):
+    """Numba engine provides the same events as the numpy engine"""
+    pytest.importorskip("numba")
+    erosivity = _compute_erosivity(
+        dummy_rain, energy_method, maximum_intensity, engine="numba"
+    )
+    erosivity_numpy = _compute_erosivity(dummy_rain, energy_method, maximum_intensity)
+    pd.testing.assert_frame_equal(erosivity, erosivity_numpy)
+
+
+def test_compute_erosivity_numba_fallback(dummy_rain, monkeypatch):
+    """Numba engine falls back to the numpy engine for unsupported methods or when
+    numba is not available"""
+    reference = compute_erosivity(dummy_rain)
+
+    monkeypatch.setattr(jit, "NUMBA_AVAILABLE", False)
+    with pytest.warns(UserWarning, match="Numba is not installed"):
+        erosivity = compute_erosivity(dummy_rain, engine="numba")
+    pd.testing.assert_frame_equal(erosivity, reference)
+
+    monkeypatch.setattr(jit, "NUMBA_AVAILABLE", True)
+    with pytest.warns(UserWarning, match="does not support the combination"):
+        compute_erosivity(
+            dummy_rain, intensity_method=maximum_intensity_interpolate, engine="numba"
+        )
+
+
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_compute_erosivity_parallel(dummy_rain, monkeypatch, backend):
+    """Parallel execution provides the same output as serial execution"""
+    rain = pd.concat(
+        [dummy_rain.assign(station=f"P01_00{idx}") for idx in range(1, 6)]
+        + [dummy_rain.assign(datetime=dummy_rain["datetime"] + pd.DateOffset(years=1))]
+    )
+    erosivity = compute_erosivity(rain, n_jobs=1)
+
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    erosivity_parallel = compute_erosivity(rain, n_jobs=2, backend=backend)
+    pd.testing.assert_frame_equal(erosivity, erosivity_parallel)
+    assert erosivity[["station", "year"]].drop_duplicates().shape[0] == 6
+
+
+def test_compute_erosivity_methods(dummy_rain):
+    """Erosivity of multiple methods equals erosivity of each pair of methods"""
+    rain = pd.concat(
+        [
+            dummy_rain,
+            dummy_rain.assign(station="P01_002", rain_mm=dummy_rain["rain_mm"] * 3),
+        ]
+    )
+    energy_methods = [rain_energy_verstraeten2006, rain_energy_mcgregor1995]
+    intensity_methods = [maximum_intensity, maximum_intensity_interpolate]
+    erosivity = compute_erosivity_methods(rain, energy_methods, intensity_methods)
+
+    assert erosivity.groupby(["energy_method", "intensity_method"]).ngroups == 4
+    for energy_method in energy_methods:
+        for intensity_method in intensity_methods:
+            expected = compute_erosivity(rain, energy_method, intensity_method)
+            selection = (erosivity["energy_method"] == energy_method.__name__) & (
+                erosivity["intensity_method"] == intensity_method.__name__
+            )
+            pd.testing.assert_frame_equal(
+                erosivity.loc[selection, expected.columns], expected
+            )
+
+    with pytest.raises(ValueError):
+        compute_erosivity_methods(rain, [], intensity_methods)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "pandas"])
+def test_compute_erosivity_compact(dummy_rain, engine):
+    """Compact schema of the rain is preserved in the erosivity output"""
+    rain = pd.concat([dummy_rain, dummy_rain.assign(station="P01_002")])
+    erosivity = compute_erosivity(rain, engine=engine)
+    erosivity_compact = compute_erosivity(compact_rain(rain), engine=engine)
+
+    assert isinstance(erosivity_compact["station"].dtype, pd.CategoricalDtype)
+    assert isinstance(erosivity_compact["tag"].dtype, pd.CategoricalDtype)
+    assert erosivity_compact["year"].dtype == np.int16
+    pd.testing.assert_frame_equal(
+        erosivity_compact, erosivity, check_dtype=False, check_categorical=False
+    )
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+@pytest.mark.parametrize("compact", [False, True])
+def test_compute_erosivity_parts(dummy_rain, n_jobs, compact):
+    """Erosivity of rainfall data provided in parts equals the erosivity of the
+    complete rainfall data"""
+    rain = pd.concat([dummy_rain, dummy_rain.assign(station="P01_002")])
+    if compact:
+        rain = compact_rain(rain)
+    erosivity = compute_erosivity(rain)
+    parts = (group for _, group in rain.groupby("station", observed=True))
+    erosivity_parts = compute_erosivity(parts, n_jobs=n_jobs, backend="threading")
+    pd.testing.assert_frame_equal(
+        erosivity_parts, erosivity, check_exact=True, check_categorical=False
+    )
+
+    with pytest.raises(RFactorInputError) as excinfo:
+        compute_erosivity(iter([]))
+    assert "No rainfall data provided" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba", "pandas"])
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_compute_erosivity_store(dummy_rain, tmp_path, monkeypatch, engine, backend):
+    """Erosivity of a rain store equals the erosivity of the float32 rainfall
+    data"""
+    if engine == "numba":
+        pytest.importorskip("numba")
+    rain = pd.concat(
+        [
+            dummy_rain,
+            dummy_rain.assign(station="P01_002", rain_mm=dummy_rain["rain_mm"] * 3),
+            dummy_rain.assign(datetime=dummy_rain["datetime"] + pd.DateOffset(years=1)),
+        ]
+    )
+    store = write_rain_store(rain, tmp_path)
+    expected = compute_erosivity(rain.astype({"rain_mm": np.float32}), n_jobs=1)
+
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_COST", 0)
+    erosivity = compute_erosivity(store, engine=engine, n_jobs=2, backend=backend)
+    pd.testing.assert_frame_equal(erosivity, expected, check_index_type=False)
+
+    erosivity = compute_erosivity_methods(
+        store, [rain_energy_verstraeten2006], [maximum_intensity]
+    )
+    pd.testing.assert_frame_equal(
+        erosivity.drop(columns=["energy_method", "intensity_method"]),
+        expected,
+        check_index_type=False,
+    )
+
+
+def test_compute_erosivity_engine_unknown(dummy_rain):
+    """Unknown engine names are not accepted"""
+    with pytest.raises(ValueError) as excinfo:
+        compute_erosivity(dummy_rain, engine="unknown")
+    assert "Engine 'unknown' not supported" in str(excinfo.value)
+
 
 @pytest.mark.skip(reason="only works with full data set (not in package")
 def test_rfactor_full_benchmark(rain_benchmark_data, erosivity_benchmark_data):
@@ -0,0 +1,177 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rfactor import (
+    compute_erosivity,
+    maximum_intensity_interpolate,
+    rain_energy_mcgregor1995,
+)
+from rfactor.process import compute_rainfall_statistics
+from rfactor.rain import load_rain_file_matlab_legacy, load_rain_folder
+from rfactor.rfactor import RFactorInputError
+from rfactor.stream import ErosivityAccumulator, RainfallStatistics
+
+
+@pytest.fixture()
+def rain_feed(dummy_rain):
+    """Rain of two stations and two years, ordered by time"""
+    rain = pd.concat(
+        [
+            dummy_rain,
+            dummy_rain.assign(station="P01_002", rain_mm=dummy_rain["rain_mm"] * 2),
+            dummy_rain.assign(datetime=dummy_rain["datetime"] + pd.DateOffset(days=2)),
+            dummy_rain.assign(datetime=dummy_rain["datetime"] - pd.DateOffset(hours=3)),
+        ]
+    )
+    return rain.sort_values("datetime", kind="stable").reset_index(drop=True)
+
+
+def _sorted(erosivity):
+    """Sort erosivity output on station and datetime"""
+    erosivity = erosivity.reset_index()
+    erosivity["datetime"] = erosivity["datetime"].astype("datetime64[ns]")
+    return erosivity.sort_values(["station", "datetime"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 100])
+def test_accumulator(rain_feed, chunk_size):
+    """Events of the accumulator are equal to the erosivity of the complete data"""
+    accumulator = ErosivityAccumulator(
+        rain_energy_mcgregor1995, maximum_intensity_interpolate
+    )
+    events = [
+        accumulator.update(rain_feed.iloc[start : start + chunk_size])
+        for start in range(0, len(rain_feed), chunk_size)
+    ]
+    events.append(accumulator.flush())
+
+    expected = compute_erosivity(
+        rain_feed, rain_energy_mcgregor1995, maximum_intensity_interpolate
+    )
+    pd.testing.assert_frame_equal(_sorted(pd.concat(events)), _sorted(expected))
+
+    # cumulative values of the last year of each station
+    totals = expected.groupby("station").last()
+    np.testing.assert_allclose(
+        accumulator.totals.set_index("station")["erosivity_cum"],
+        totals["erosivity_cum"],
+    )
+
+
+def test_accumulator_close_events(dummy_rain):
+    """Events are closed when the event split has elapsed"""
+    accumulator = ErosivityAccumulator()
+    assert accumulator.update(dummy_rain.iloc[:8]).empty
+    assert accumulator.update(dummy_rain.iloc[8:]).empty
+    events = accumulator.update(dummy_rain.iloc[:0], now="2018-01-01 21:50:00")
+    pd.testing.assert_frame_equal(
+        _sorted(events), _sorted(compute_erosivity(dummy_rain))
+    )
+    assert accumulator.flush().empty
+
+
+def test_accumulator_lagging_stations(rain_feed):
+    """Feeds of stations lagging each other do not close the events of the
+    other stations"""
+    lag = pd.Timedelta(hours=7)
+    lagging = rain_feed["station"] == "P01_002"
+    arrival = rain_feed["datetime"] + lag * lagging
+    feed = rain_feed.iloc[np.argsort(arrival.to_numpy(), kind="stable")]
+
+    accumulator = ErosivityAccumulator()
+    events = [
+        accumulator.update(feed.iloc[start : start + 3])
+        for start in range(0, len(feed), 3)
+    ]
+    events.append(accumulator.flush())
+    pd.testing.assert_frame_equal(
+        _sorted(pd.concat(events)), _sorted(compute_erosivity(rain_feed))
+    )
+
+
+def test_accumulator_closed_until(dummy_rain):
+    """Records before the time up to which the events were closed are rejected"""
+    accumulator = ErosivityAccumulator()
+    accumulator.update(dummy_rain.iloc[:8])
+    accumulator.update(dummy_rain.iloc[:0], now="2018-01-01 23:00:00")
+    with pytest.raises(RFactorInputError) as excinfo:
+        accumulator.update(dummy_rain.iloc[8:])
+    assert "later than the time up to which its events were closed" in str(
+        excinfo.value
+    )
+
+
+def test_accumulator_state(rain_feed):
+    """Accumulator resumes from a serialized state"""
+    accumulator = ErosivityAccumulator()
+    events = [accumulator.update(rain_feed.iloc[:20])]
+    state = json.loads(json.dumps(accumulator.get_state()))
+
+    accumulator = ErosivityAccumulator.from_state(state)
+    events += [accumulator.update(rain_feed.iloc[20:]), accumulator.flush()]
+    pd.testing.assert_frame_equal(
+        _sorted(pd.concat(events)), _sorted(compute_erosivity(rain_feed))
+    )
+
+
+def test_accumulator_time_order(dummy_rain):
+    """Records of a station need to be time ordered"""
+    accumulator = ErosivityAccumulator()
+    accumulator.update(dummy_rain.iloc[5:])
+    with pytest.raises(RFactorInputError) as excinfo:
+        accumulator.update(dummy_rain.iloc[:5])
+    assert "should be time ordered" in str(excinfo.value)
+
+
+def test_rainfall_statistics(rain_feed):
+    """Exact statistics equal pandas, merged from partial updates"""
+    statistics = RainfallStatistics(exact=True)
+    statistics.update(rain_feed.iloc[:25])
+    other = RainfallStatistics(exact=True)
+    other.update(rain_feed.iloc[25:])
+    statistics.merge(other)
+
+    rain = rain_feed.groupby("station")["rain_mm"]
+    stats = statistics.to_frame()
+    assert stats["median"].tolist() == rain.median().tolist()
+    assert stats["records"].tolist() == rain.count().tolist()
+    assert stats["min"].tolist() == rain.min().tolist()
+    assert stats["max"].tolist() == rain.max().tolist()
+    assert stats["year"].tolist() == [[2017, 2018], [2018]]
+    for q in [0.0, 0.3, 0.5, 1.0]:
+        assert statistics.quantile("P01_002", q) == rain.get_group("P01_002").quantile(
+            q
+        )
+
+
+def test_rainfall_statistics_sketch(rain_feed):
+    """Estimated median within the relative accuracy, resumed from a state"""
+    statistics = RainfallStatistics(exact=False, relative_accuracy=0.01)
+    statistics.update(rain_feed.iloc[:25])
+    state = json.loads(json.dumps(statistics.get_state()))
+
+    statistics = RainfallStatistics.from_state(state)
+    statistics.update(rain_feed.iloc[25:])
+    median = statistics.to_frame()["median"]
+    expected = rain_feed.groupby("station")["rain_mm"].median()
+    np.testing.assert_allclose(median, expected, rtol=0.01)
+
+
+def test_rainfall_statistics_merge_mode():
+    """Exact and estimated statistics can not be merged"""
+    with pytest.raises(ValueError):
+        RainfallStatistics(exact=True).merge(RainfallStatistics(exact=False))
+
+
+def test_rainfall_statistics_load_folder(rain_data_folder_matlab):
+    """Statistics collected while loading files equal the rainfall statistics"""
+    statistics = RainfallStatistics(exact=True)
+    rain = load_rain_folder(
+        rain_data_folder_matlab, load_rain_file_matlab_legacy, statistics=statistics
+    )
+    pd.testing.assert_frame_equal(
+        statistics.to_frame(), compute_rainfall_statistics(rain)
+    )